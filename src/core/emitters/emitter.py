@@ -23,7 +23,10 @@ class Emitter:
 		('n_triangles', np.int32),
 		('transformation', np.float32, (4, 4)),
 		('envmapID', np.int32),
-		('isTwosided', np.int32)
+		('isTwosided', np.int32),
+		('triangle_cdf_buffer_id', np.int32),
+		('envmap_marginal_cdf_id', np.int32),
+		('envmap_conditional_cdf_id', np.int32)
 	])
 
 	def __init__(self, props):
@@ -8,6 +8,9 @@ class EnvironmentMap(Emitter):
 		self.filename = load_value(props, "filename", default=None)
 		self.transform = load_value(props, "toWorld")
 		self.envmapID = None
+		# importance sampling tables (see Scene.load_envmap_cached)
+		self.marginal_cdf_buffer = None
+		self.conditional_cdf_buffer = None
 
 	def __str__(self):
 		logs = [
@@ -19,7 +22,10 @@ class EnvironmentMap(Emitter):
 
 	def __array__(self):
 		np_array = np.zeros(1, dtype=Emitter.dtype)
-		np_array["lightType"] = 5
+		np_array["lightType"] = 7
 		np_array["transformation"] = np.array(self.transform.transpose(), dtype=np.float32)
-		np_array["envmapID"] = 1
+		np_array["envmapID"] = self.envmapID if self.envmapID is not None else 1
+		if self.marginal_cdf_buffer is not None:
+			np_array["envmap_marginal_cdf_id"] = self.marginal_cdf_buffer.get_id()
+			np_array["envmap_conditional_cdf_id"] = self.conditional_cdf_buffer.get_id()
 		return np_array
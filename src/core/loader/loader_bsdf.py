@@ -1,4 +1,22 @@
 from core.bsdfs.bsdf import BSDF
+from core.loader.plugin_registry import load_plugin_class
+
+# bsdf type -> (module, class), imported on first use
+BSDF_PLUGINS = {
+    "diffuse": ("core.bsdfs.diffuse", "SmoothDiffuse"),
+    "dielectric": ("core.bsdfs.dielectric", "Dielectric"),
+    "thindielectric": ("core.bsdfs.dielectric", "Dielectric"),
+    "roughdielectric": ("core.bsdfs.rough_dielectric", "RoughDielectric"),
+    "conductor": ("core.bsdfs.conductor", "Conductor"),
+    "roughconductor": ("core.bsdfs.rough_conductor", "RoughConductor"),
+    "plastic": ("core.bsdfs.plastic", "Plastic"),
+    "mask": ("core.bsdfs.mask", "Mask"),
+    "twosided": ("core.bsdfs.two_sided", "TwoSided"),
+    "bump": ("core.bsdfs.bump_map", "BumpMap"),
+    "bumpmap": ("core.bsdfs.bump_map", "BumpMap"),
+    "coating": ("core.bsdfs.coating", "Coating"),
+    "roughplastic": ("core.bsdfs.rough_plastic", "RoughPlastic"),
+}
 
 
 def load_bsdf(node) -> BSDF:
@@ -7,42 +25,8 @@ def load_bsdf(node) -> BSDF:
     :param node: bsdf node
     :return: BSDF instance
     """
-    from core.bsdfs.diffuse import SmoothDiffuse
-    from core.bsdfs.dielectric import Dielectric
-    from core.bsdfs.rough_dielectric import RoughDielectric
-    from core.bsdfs.conductor import Conductor
-    from core.bsdfs.rough_conductor import RoughConductor
-    from core.bsdfs.plastic import Plastic
-    from core.bsdfs.rough_plastic import RoughPlastic
-    from core.bsdfs.mask import Mask
-    from core.bsdfs.bump_map import BumpMap
-    from core.bsdfs.two_sided import TwoSided
-    from core.bsdfs.coating import Coating
-
     bsdf_type = node.attrib['type']
-
-    if bsdf_type == "diffuse":
-        return SmoothDiffuse(node)
-    elif bsdf_type == "dielectric" or bsdf_type == "thindielectric":
-        return Dielectric(node)
-    elif bsdf_type == "roughdielectric":
-        return RoughDielectric(node)
-    elif bsdf_type == "conductor":
-        return Conductor(node)
-    elif bsdf_type == "roughconductor":
-        return RoughConductor(node)
-    elif bsdf_type == "plastic":
-        return Plastic(node)
-    elif bsdf_type == "mask":
-        return Mask(node)
-    elif bsdf_type == "twosided":
-        return TwoSided(node)
-    elif bsdf_type == "bump" or bsdf_type == "bumpmap":
-        return BumpMap(node)
-    elif bsdf_type == "coating":
-        return Coating(node)
-    elif bsdf_type == "roughplastic":
-        return RoughPlastic(node)
-    else:
+    bsdf_class = load_plugin_class(BSDF_PLUGINS, bsdf_type)
+    if bsdf_class is None:
         raise NotImplementedError("BSDF type %s is not implemented!!" % bsdf_type)
-
+    return bsdf_class(node)
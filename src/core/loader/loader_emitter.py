@@ -1,4 +1,13 @@
 from core.emitters.emitter import Emitter
+from core.loader.plugin_registry import load_plugin_class
+
+# emitter type -> (module, class), imported on first use
+EMITTER_PLUGINS = {
+    "point": ("core.emitters.point", "PointLight"),
+    "area": ("core.emitters.area", "AreaLight"),
+    "spot": ("core.emitters.spot", "SpotEmitter"),
+    "envmap": ("core.emitters.envmap", "EnvironmentMap"),
+}
 
 
 def load_emitter(node) -> Emitter:
@@ -7,20 +16,8 @@ def load_emitter(node) -> Emitter:
     :param node: sensor node
     :return: Camera object
     """
-    from core.emitters.point import PointLight
-    from core.emitters.area import AreaLight
-    from core.emitters.spot import SpotEmitter
-    from core.emitters.envmap import EnvironmentMap
-
     emitter_type = node.attrib['type']
-    if emitter_type == "point":
-        return PointLight(node)
-    elif emitter_type == "area":
-        return AreaLight(node)
-    elif emitter_type == "spot":
-        return SpotEmitter(node)
-    elif emitter_type == "envmap":
-        return EnvironmentMap(node)
-    else:
+    emitter_class = load_plugin_class(EMITTER_PLUGINS, emitter_type)
+    if emitter_class is None:
         raise NotImplementedError("Emitter type %s is not implemented" % emitter_type)
-
+    return emitter_class(node)
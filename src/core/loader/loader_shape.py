@@ -1,4 +1,14 @@
 from core.shapes.shape import Shape
+from core.loader.plugin_registry import load_plugin_class
+
+# shape type -> (module, class), imported on first use
+SHAPE_PLUGINS = {
+    "rectangle": ("core.shapes.rectangle", "Rectangle"),
+    "cube": ("core.shapes.cube", "Cube"),
+    "sphere": ("core.shapes.sphere", "Sphere"),
+    "disk": ("core.shapes.disk", "Disk"),
+    "obj": ("core.shapes.objmesh", "OBJMesh"),
+}
 
 
 def load_single_shape(node) -> Shape:
@@ -7,20 +17,6 @@ def load_single_shape(node) -> Shape:
     :param node: shape node
     :return: shape
     """
-    from core.shapes.rectangle import Rectangle
-    from core.shapes.cube import Cube
-    from core.shapes.sphere import Sphere
-    from core.shapes.disk import Disk
-    from core.shapes.objmesh import OBJMesh
-
-    shape_type = node.attrib['type']
-    if shape_type == "rectangle":
-        return Rectangle(node)
-    elif shape_type == "cube":
-        return Cube(node)
-    elif shape_type == "sphere":
-        return Sphere(node)
-    elif shape_type == "disk":
-        return Disk(node)
-    elif shape_type == "obj":
-        return OBJMesh(node)
+    shape_class = load_plugin_class(SHAPE_PLUGINS, node.attrib['type'])
+    if shape_class is not None:
+        return shape_class(node)
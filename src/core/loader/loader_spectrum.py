@@ -1,11 +1,11 @@
 import numpy as np
 from core.loader.loader_simple import *
-from PIL import ImageColor
 
 
 def load_spectrum(node, key="value", default=1):
     str_val = node.attrib[key]
     if str_val.startswith("#"):
+        from PIL import ImageColor
         hex_to_rgb = ImageColor.getcolor(str_val, "RGB")
         rgb = np.array(list(hex_to_rgb), dtype=np.float32)
         rgb /= 255.0
@@ -1,17 +1,17 @@
 from core.textures.texture import Texture
+from core.loader.plugin_registry import load_plugin_class
 
+# texture type -> (module, class), imported on first use
+TEXTURE_PLUGINS = {
+    "bitmap": ("core.textures.bitmap", "BitmapTexture"),
+    "checkerboard": ("core.textures.checkerboard", "CheckerBoard"),
+    "scale": ("core.textures.scale", "ScalingTexture"),
+}
 
-def load_texture(node) -> Texture:
-    from core.textures.bitmap import BitmapTexture
-    from core.textures.checkerboard import CheckerBoard
-    from core.textures.scale import ScalingTexture
 
+def load_texture(node) -> Texture:
     texture_type = node.attrib['type']
-    if texture_type == "bitmap":
-        return BitmapTexture(node)
-    elif texture_type == "checkerboard":
-        return CheckerBoard(node)
-    elif texture_type == "scale":
-        return ScalingTexture(node)
-    else:
+    texture_class = load_plugin_class(TEXTURE_PLUGINS, texture_type)
+    if texture_class is None:
         raise NotImplementedError("Texture type %s is not implemented!!" % texture_type)
+    return texture_class(node)
@@ -0,0 +1,19 @@
+import importlib
+
+_plugin_classes = {}
+
+
+def load_plugin_class(registry, plugin_type):
+    """
+    Import plugin module on first use and return its class.
+    :param registry: dict of plugin type -> (module name, class name)
+    :param plugin_type: plugin type in scene file
+    :return: plugin class, None if the type is not registered
+    """
+    if plugin_type not in registry:
+        return None
+    module_name, class_name = registry[plugin_type]
+    key = (module_name, class_name)
+    if key not in _plugin_classes:
+        _plugin_classes[key] = getattr(importlib.import_module(module_name), class_name)
+    return _plugin_classes[key]
@@ -1,6 +1,8 @@
 import numpy as np
 from pyoptix import Buffer, Geometry
 from core.utils.math_utils import BoundingBox
+from core.utils.mesh_simplification import simplify_mesh_with_report
+from core.utils.mesh_preprocess import preprocess_mesh
 
 
 class OptixMesh:
@@ -16,69 +18,47 @@ class OptixMesh:
         self.texcoord_buffer = Buffer.from_array([], dtype=np.dtype('f4, f4'), buffer_type='i')
         self.material_buffer = Buffer.from_array([], dtype=np.dtype('i4'), buffer_type='i')
         self.bbox = BoundingBox()
+        self.decimation_report = None
+        self.preprocess_report = []
 
-    def load_from_file(self, filename):
-        vertices = []
-        textures = []
-        normals = []
-        index_dictionary = {}
-        vertices_reordered = []
-        textures_reordered = []
-        normals_reordered = []
-        indices = []
-
-        def add_face(triangle_info):
-            tri_indices = []
-            for v in triangle_info:
-                w = v.split('/')
-                w_tuple = tuple(w)
-                if w_tuple not in index_dictionary:
-                    index_dictionary[w_tuple] = len(index_dictionary)
-                    vertices_reordered.append(vertices[int(w[0]) - 1])
-                    if(len(textures) > 0):
-                        textures_reordered.append(textures[int(w[1]) - 1])
-                    else:
-                        textures_reordered.append([1, 1])
-                    normals_reordered.append(normals[int(w[2]) - 1])
-                index = index_dictionary[w_tuple]
-                tri_indices.append(index)
-            return tri_indices
-
-        for line in open(filename, 'r'):
-            if line.startswith('#'): continue
-            values = line.split()
-            if not values: continue
-
-            if values[0] == 'v':
-                vertices.append(values[1:4])
-            if values[0] == 'vt':
-                textures.append(values[1:3])
-            if values[0] == 'vn':
-                normals.append(values[1:4])
-            if values[0] == 'f':
-                if len(values) == 5:
-                    tri_indices = add_face(values[1:4])
-                    indices.append(tri_indices)
-                    tri_indices = add_face([values[3], values[4], values[1]])
-                    indices.append(tri_indices)
-                else:
-                    tri_indices = add_face(values[1:4])
-                    indices.append(tri_indices)
+    def load_from_file(self, filename, decimation=None, preprocess=None):
+        """
+        Load OBJ file and upload it to optix buffers.
+        :param filename: OBJ file name
+        :param decimation: None or dict with target_triangles / max_error for quadric simplification
+        :param preprocess: dict of mesh preprocessing options (see DEFAULT_MESH_PREPROCESS)
+        """
+        vertices_np, normals_np, textures_np, indices_np = load_obj_arrays(filename)
 
-        vertices_np = np.asarray(vertices_reordered, dtype=np.float32)
-        normals_np = np.asarray(normals_reordered, dtype=np.float32)
-        textures_np = np.asarray(textures_reordered, dtype=np.float32)
-        indices_np = np.asarray(indices, dtype=np.int32)
+        if decimation is not None:
+            vertices_np, indices_np, vertex_map, self.decimation_report = simplify_mesh_with_report(
+                vertices_np, indices_np,
+                target_triangles=decimation.get("target_triangles", None),
+                max_error=decimation.get("max_error", None),
+                name=filename
+            )
+            normals_np = None if normals_np is None else normals_np[vertex_map]
+            textures_np = textures_np[vertex_map]
+
+        vertices_np, normals_np, textures_np, indices_np, self.preprocess_report = preprocess_mesh(
+            vertices_np, normals_np, textures_np, indices_np, options=preprocess, name=filename
+        )
+        self.load_from_arrays(vertices_np, normals_np, textures_np, indices_np)
 
-        self.bbox.bbox_max = np.amax(vertices_np, 0)
-        self.bbox.bbox_max = np.amin(vertices_np, 0)
+    def load_from_arrays(self, vertices_np, normals_np, textures_np, indices_np):
+        self.bbox = BoundingBox(np.amax(vertices_np, 0), np.amin(vertices_np, 0))
 
         self.n_triangles = indices_np.shape[0]
         self.n_vertices = vertices_np.shape[0]
+        # host copies for triangle area tables of mesh lights
+        self.vertices = vertices_np
+        self.indices = indices_np
 
         self.positions_buffer = Buffer.from_array(vertices_np, buffer_type='i', drop_last_dim=True)
         self.tri_indices = Buffer.from_array(indices_np, buffer_type='i', drop_last_dim=True)
-        self.normals_buffer = Buffer.from_array(normals_np, buffer_type='i', drop_last_dim=True)
+        # without normals, an empty buffer makes the intersection program use geometric normals
+        if normals_np is not None:
+            self.normals_buffer = Buffer.from_array(normals_np, buffer_type='i', drop_last_dim=True)
         self.texcoord_buffer = Buffer.from_array(textures_np, buffer_type='i', drop_last_dim=True)
 
         self.material_indices = np.zeros(self.n_triangles, np.int32)
@@ -89,4 +69,72 @@ class OptixMesh:
         self.geometry["index_buffer"] = self.tri_indices
         self.geometry["normal_buffer"] = self.normals_buffer
         self.geometry["texcoord_buffer"] = self.texcoord_buffer
-        self.geometry["material_buffer"] = self.material_buffer
\ No newline at end of file
+        self.geometry["material_buffer"] = self.material_buffer
+
+
+def load_obj_arrays(filename):
+    """
+    Parse OBJ file into numpy arrays.
+    Vertices are split by (position, texcoord, normal) index tuples.
+    :param filename: OBJ file name
+    :return: vertices, normals (None if missing), texcoords, triangle indices
+    """
+    vertices = []
+    textures = []
+    normals = []
+    index_dictionary = {}
+    vertices_reordered = []
+    textures_reordered = []
+    normals_reordered = []
+    indices = []
+
+    def add_face(triangle_info):
+        tri_indices = []
+        for v in triangle_info:
+            w = v.split('/')
+            w_tuple = tuple(w)
+            if w_tuple not in index_dictionary:
+                index_dictionary[w_tuple] = len(index_dictionary)
+                vertices_reordered.append(vertices[int(w[0]) - 1])
+                if len(textures) > 0 and len(w) > 1 and w[1] != '':
+                    textures_reordered.append(textures[int(w[1]) - 1])
+                else:
+                    textures_reordered.append([1, 1])
+                if len(normals) > 0 and len(w) > 2 and w[2] != '':
+                    normals_reordered.append(normals[int(w[2]) - 1])
+                else:
+                    normals_reordered.append(None)
+            index = index_dictionary[w_tuple]
+            tri_indices.append(index)
+        return tri_indices
+
+    for line in open(filename, 'r'):
+        if line.startswith('#'): continue
+        values = line.split()
+        if not values: continue
+
+        if values[0] == 'v':
+            vertices.append(values[1:4])
+        if values[0] == 'vt':
+            textures.append(values[1:3])
+        if values[0] == 'vn':
+            normals.append(values[1:4])
+        if values[0] == 'f':
+            if len(values) == 5:
+                tri_indices = add_face(values[1:4])
+                indices.append(tri_indices)
+                tri_indices = add_face([values[3], values[4], values[1]])
+                indices.append(tri_indices)
+            else:
+                tri_indices = add_face(values[1:4])
+                indices.append(tri_indices)
+
+    vertices_np = np.asarray(vertices_reordered, dtype=np.float32)
+    # normals are generated later if any vertex misses it
+    if any(n is None for n in normals_reordered):
+        normals_np = None
+    else:
+        normals_np = np.asarray(normals_reordered, dtype=np.float32)
+    textures_np = np.asarray(textures_reordered, dtype=np.float32)
+    indices_np = np.asarray(indices, dtype=np.int32)
+    return vertices_np, normals_np, textures_np, indices_np
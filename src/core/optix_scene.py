@@ -1,21 +1,40 @@
+import os
 from core.scene import Scene
-from pyoptix import Context, Program, Material, Group, Acceleration, Buffer
+from pyoptix import Context, Program, Material, Group, Acceleration
 import numpy as np
+from core.utils.context_utils import ContextState
+from core.utils.compile_cache import hash_program
+from core.utils.light_utils import light_selection_cdf, envmap_light_index
 from core.textures.texture import Texture
 from core.bsdfs.bsdf import BSDF
 from core.emitters.emitter import Emitter
 from core.renderer_constants import *
 
+# directory added with Compiler.add_program_directory
+PROGRAM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RAY_GENERATION_PROGRAM = 'optix/programs/path_trace_camera.cu'
+
+
 class OptiXSceneContext:
-    def __init__(self, context: Context):
+    def __init__(self, context: Context, buffer_pool_budget=None):
         """
         This is never changed during rendering same scene.
+        :param buffer_pool_budget: size in bytes above which unused pooled buffers are freed (None : no limit)
         """
         self.context = context
+        # structural changes since the last compile and buffer pool, shared with the renderer
+        self.context_state = ContextState(context, buffer_pool_budget)
 
         self.program_dictionary = {}
         self.material_dict = {}
 
+        # NEE light selection, "power" or "uniform"
+        self.light_selection = "power"
+
+        # top level accelerations, marked dirty when instance transforms change
+        self.top_acceleration = None
+        self.shadow_acceleration = None
+
         # Common optix context setting/programs/materials
         self.init_optix_context()
         self.init_optix_programs()
@@ -40,14 +59,29 @@ class OptiXSceneContext:
         context['bad_color'] = np.array([1000000., 0., 1000000.], dtype=np.float32)
         context['bg_color'] = np.zeros(3, dtype=np.float32)
 
+    def ray_generation_hash(self):
+        program_hash, _ = hash_program(os.path.join(PROGRAM_DIR, RAY_GENERATION_PROGRAM), [PROGRAM_DIR])
+        return program_hash
+
     def update_program(self):
-        self.program_dictionary["ray_generation"] = Program('optix/programs/path_trace_camera.cu', 'pathtrace_camera')
+        """
+        Replace the ray generation program only if its source or one of its headers changed,
+        a new program object changes the context layout and forces a recompile.
+        :return: whether the program was replaced
+        """
+        program_hash = self.ray_generation_hash()
+        if program_hash == self.program_hashes.get("ray_generation", None):
+            return False
+        self.program_hashes["ray_generation"] = program_hash
+        self.program_dictionary["ray_generation"] = Program(RAY_GENERATION_PROGRAM, 'pathtrace_camera')
         self.context.set_ray_generation_program(0, self.program_dictionary['ray_generation'])
+        self.context_state.mark_dirty("ray_generation program")
+        return True
 
     def init_optix_programs(self):
         program_dictionary = {}
         # renderer
-        target_program = 'optix/programs/path_trace_camera.cu'
+        target_program = RAY_GENERATION_PROGRAM
         program_dictionary["ray_generation"] = Program(target_program, 'pathtrace_camera')
         program_dictionary["exception"] = Program(target_program, 'exception')
 
@@ -79,6 +113,7 @@ class OptiXSceneContext:
         program_dictionary["any_hit_shadow_cutout"] = Program(any_hit_hit_program, 'any_hit_shadow_cutout')
 
         self.program_dictionary = program_dictionary
+        self.program_hashes = {"ray_generation": self.ray_generation_hash()}
 
         self.context.set_ray_generation_program(0, self.program_dictionary['ray_generation'])
         self.context.set_exception_program(0, self.program_dictionary['exception'])
@@ -114,6 +149,7 @@ class OptiXSceneContext:
         # self.context.set_ray_generation_program(0, self.program_dictionary['ray_generation'])
         # self.context.set_exception_program(0, self.program_dictionary['exception'])
         self.context.set_miss_program(0, miss_program)
+        self.context_state.mark_dirty("miss program")
         # self.context.set_ray_generation_program(1, self.program_dictionary["quad_tree_updater"])
 
     def init_optix_scene(self, scene:Scene):
@@ -135,32 +171,75 @@ class OptiXSceneContext:
         self.load_scene_lights(scene)
         self.load_scene_materials(scene)
 
+    def reload_scene(self, old_scene: Scene, new_scene: Scene):
+        """
+        Update optix objects from old scene to new scene, keeping everything that did not change.
+        Only transforms changed : update the transforms and mark top level accelerations dirty.
+        Otherwise (or if a mesh file changed on disk) geometry instances and top level groups are rebuilt, reusing unchanged meshes and textures.
+        Material, light and camera parameters are small and always uploaded again.
+        :return: dict report of what was reused or updated
+        """
+        context = self.context
+        report = {}
+        if old_scene.has_envmap != new_scene.has_envmap:
+            self.init_entry_point(new_scene.has_envmap)
+
+        new_scene.optix_load_textures(reuse_from=old_scene)
+        reused_meshes = new_scene.optix_load_objs(self.program_dictionary, reuse_from=old_scene)
+        report["meshes_reused"] = len(reused_meshes)
+        report["meshes_loaded"] = len(new_scene.obj_name_list) - len(reused_meshes)
+
+        # instances and bboxes of old scene refer to the old geometry of reloaded meshes
+        if report["meshes_loaded"] == 0 and new_scene.same_geometry_structure(old_scene):
+            changed = new_scene.adopt_geometry_instances(old_scene)
+            if len(changed) > 0:
+                self.top_acceleration.mark_dirty()
+                self.shadow_acceleration.mark_dirty()
+            report["geometry"] = "transforms updated (%d shapes)" % len(changed) if len(changed) > 0 else "unchanged"
+        else:
+            new_scene.optix_create_geometry_instances(self.program_dictionary, self.material_dict, False)
+            self.load_scene_geometry_group(new_scene)
+            report["geometry"] = "rebuilt"
+
+        report["materials_changed"] = len(old_scene.material_list) != len(new_scene.material_list) or any(
+            np.array(a).tobytes() != np.array(b).tobytes() for a, b in zip(old_scene.material_list, new_scene.material_list))
+        self.load_scene_lights(new_scene)
+        self.load_scene_materials(new_scene)
+        self.init_camera(new_scene)
+        return report
+
     def load_scene_geometry_group(self, scene: Scene):
         shadow_group = Group(children=scene.geometry_instances)
-        shadow_group.set_acceleration(Acceleration("Trbvh"))
-        self.context['top_shadower'] = shadow_group
+        self.shadow_acceleration = Acceleration("Trbvh")
+        shadow_group.set_acceleration(self.shadow_acceleration)
+        self.context_state.set_object('top_shadower', shadow_group)
 
         group = Group(children=(scene.geometry_instances + scene.light_instances))
-        group.set_acceleration(Acceleration("Trbvh"))
-        self.context['top_object'] = group
+        self.top_acceleration = Acceleration("Trbvh")
+        group.set_acceleration(self.top_acceleration)
+        self.context_state.set_object('top_object', group)
 
     def load_scene_lights(self, scene: Scene):
         np_lights = np.array([np.array(x) for x in scene.light_list])
-        self.context["sysLightParameters"] = \
-            Buffer.from_array(np_lights, dtype=Emitter.dtype, buffer_type='i', drop_last_dim=True)
+        self.context_state.upload("sysLightParameters", np_lights, dtype=Emitter.dtype, drop_last_dim=True)
+        self.context_state.upload("sysLightSelectionCdf", light_selection_cdf(np_lights, self.light_selection))
+        self.context['envmap_light_index'] = np.array(envmap_light_index(np_lights), dtype=np.int32)
+
+    def set_light_selection(self, light_selection, scene: Scene):
+        if light_selection != self.light_selection:
+            self.light_selection = light_selection
+            self.load_scene_lights(scene)
 
     def load_scene_materials(self, scene: Scene):
         np_materials = np.array([np.array(x) for x in scene.material_list])
-        self.context["sysMaterialParameters"] = \
-            Buffer.from_array(np_materials, dtype=BSDF.dtype, buffer_type='i', drop_last_dim=True)
+        self.context_state.upload("sysMaterialParameters", np_materials, dtype=BSDF.dtype, drop_last_dim=True)
 
         if len(scene.texture_list) > 0:
             np_textures = np.array([np.array(x) for x in scene.texture_list])
-            self.context["sysTextureParameters"] = \
-                Buffer.from_array(np_textures, dtype=Texture.dtype, buffer_type='i', drop_last_dim=True)
+            self.context_state.upload("sysTextureParameters", np_textures, dtype=Texture.dtype, drop_last_dim=True)
         else:
-            self.context["sysTextureParameters"] =\
-                Buffer.empty((1, 1), Texture.dtype, buffer_type='i', drop_last_dim=True)
+            self.context_state.allocate("sysTextureParameters", (1, 1), Texture.dtype, buffer_type='i',
+                                        drop_last_dim=True, clear=False)
 
     def init_camera(self, scene):
         aspect_ratio = float(scene.width) / float(scene.height)
@@ -1,10 +1,9 @@
 import copy
 
-from pyoptix import Context, Buffer
+from pyoptix import Context
 from core.scene import Scene
 import time
 from core.utils.math_utils import *
-import matplotlib.pyplot as plt
 
 from core.renderer_constants import *
 from utils.logging_utils import *
@@ -12,6 +11,9 @@ from utils.timing_utils import *
 import gc
 from core.optix_scene import OptiXSceneContext
 from core.loader.loader_general import load_camera
+from core.utils.transient_utils import make_bounce_layout, label_histogram_columns, compute_time_window, \
+    HistogramAccumulator
+from core.utils.checkpoint_utils import hash_render_state, hash_file, save_checkpoint, load_checkpoint
 
 
 class Renderer:
@@ -27,33 +29,77 @@ class Renderer:
         self.width = 0
         self.height = 0
         self.scale = kwargs.get("scale", 1)
+        # unused device buffers kept for reuse are freed above this size
+        self.buffer_pool_budget = int(kwargs.get("buffer_pool_budget_mb", 1024) * (1 << 20))
 
         self.scene = None
         self.scene_name = None
+        self.scene_file_path = None
         self.reference_image = None
         self.scene_octree = None
         self.context = None
 
+        # number of receivers in multi-receiver array mode (0 : single receiver at the camera)
+        self.receiver_count = 0
+
+        # bounce index -> histogram column
+        self.bounce_column_map = None
+        self.bounce_labels = []
+
+        # transient histogram bins
+        self.transient_bin_num = 0
+        self.transient_bin_edges = None
+
+        # render state used for checkpoint validation
+        self.camera_position = None
+        self.receiver_positions = None
+        self.receiver_sample_count = 0
+
+        # float64 host accumulation of the histogram (reused while its shape does not change)
+        self.histogram_accumulator = None
+
+        # headless progressive preview (created on first render with preview_port)
+        self.preview_server = None
+
         self.render_load_logger = load_logger('Render load logger')
         self.render_logger = load_logger('Render logger')
         self.render_logger.setLevel(logging.INFO)
 
-    def init_scene_config(self, scene_name, scene_file_path=None):
+    def init_scene_config(self, scene_name, scene_file_path=None, mesh_decimation=None, mesh_preprocess=None):
         # load scene info (non optix)
         self.scene = Scene(scene_name)
         self.scene_name = scene_name
+        if mesh_decimation is not None:
+            self.scene.mesh_decimation = mesh_decimation
+        self.scene.mesh_preprocess = mesh_preprocess
 
         if scene_file_path == None:
             scene_file_path = "../../scenes/%s/scene.xml" % scene_name
 
+        self.scene_file_path = scene_file_path
         self.scene.load_scene_from(scene_file_path)
         self.width = self.scene.width // self.scale
         self.height = self.scene.height // self.scale
 
-    def reset_output_buffers(self, width, height):
-        self.context['output_buffer'] = Buffer.empty((height, width, 4), dtype=np.float32, buffer_type='o', drop_last_dim=True)
+    @property
+    def context_state(self):
+        return self.optix_context.context_state
+
+    def reset_output_buffers(self, width, height, clear=True):
+        # same size : existing buffer is cleared instead of reallocated
+        self.context_state.allocate('output_buffer', (height, width, 4), np.float32, drop_last_dim=True, clear=clear)
         
-    def load_scene(self, scene_name, forced=False, scene_file_path=None):
+    def load_scene(self, scene_name, forced=False, scene_file_path=None, mesh_decimation=None, mesh_preprocess=None,
+                   reload=False):
+        """
+        Load scene. Same scene is skipped, unless another scene file is given or reload is set,
+        in which case it is reloaded incrementally.
+        :return: whether a new context was created
+        """
+        if self.scene_name == scene_name and not forced and \
+                (reload or (scene_file_path is not None and scene_file_path != self.scene_file_path)):
+            self.reload_scene(scene_file_path, mesh_decimation, mesh_preprocess)
+            return False
         if self.scene_name != scene_name or forced:
             del self.optix_context
             del self.scene
@@ -61,10 +107,10 @@ class Renderer:
             self.context = Context()
 
             with time_measure("[1] Optix Context Create", self.render_load_logger):
-                self.optix_context = OptiXSceneContext(self.context)
+                self.optix_context = OptiXSceneContext(self.context, self.buffer_pool_budget)
 
             with time_measure("[2] Scene Config Load", self.render_load_logger):
-                self.init_scene_config(scene_name, scene_file_path)
+                self.init_scene_config(scene_name, scene_file_path, mesh_decimation, mesh_preprocess)
 
             with time_measure("[3] OptiX Load", self.render_load_logger):
                 self.optix_context.load_scene(self.scene)
@@ -73,7 +119,27 @@ class Renderer:
             self.render_load_logger.info("Skipped loading scene because it has been already loaded")
             return False
 
-    def update_camera_and_emitter_position(self, camera_position, emitter_position):
+    def reload_scene(self, scene_file_path=None, mesh_decimation=None, mesh_preprocess=None):
+        """
+        Reload scene file of the loaded scene incrementally (see OptiXSceneContext.reload_scene),
+        instead of recreating the context as load_scene(forced=True) does.
+        Camera and emitters are taken from the scene file, so poses need to be set again.
+        :return: dict report of what was reused or updated
+        """
+        old_scene = self.scene
+        old_size = (self.width, self.height)
+        with time_measure("[1] Scene Config Load", self.render_load_logger):
+            self.init_scene_config(self.scene_name, scene_file_path or self.scene_file_path,
+                                   mesh_decimation if mesh_decimation is not None else old_scene.mesh_decimation,
+                                   mesh_preprocess if mesh_preprocess is not None else old_scene.mesh_preprocess)
+        with time_measure("[2] OptiX Incremental Load", self.render_load_logger):
+            report = self.optix_context.reload_scene(old_scene, self.scene)
+        if (self.width, self.height) != old_size:
+            self.reset_output_buffers(self.width, self.height)
+        self.render_load_logger.info("Incremental reload : %s" % str(report))
+        return report
+
+    def update_camera_position(self, camera_position):
         sensor_node_original = self.scene.sensor_node
 
         sensor_node_new = copy.deepcopy(sensor_node_original)
@@ -82,10 +148,151 @@ class Renderer:
         lookat_node.set("origin", ",".join(map(str, camera_position.tolist())))
         new_camera = load_camera(sensor_node_new)
         self.scene.camera = new_camera
+        self.camera_position = np.asarray(camera_position, dtype=np.float64)
         self.optix_context.init_camera(self.scene)
 
+    def update_camera_and_emitter_position(self, camera_position, emitter_position):
+        self.update_camera_position(camera_position)
+
         self.scene.light_list[0].position = emitter_position
         self.optix_context.load_scene_lights(self.scene)
+        self.set_receiver_array(None)
+
+    def update_receiver_array(self, receiver_positions, transmitter_position, receiver_sample_count=0):
+        """
+        Render K receivers of one transmitter in a single launch.
+        The camera is placed at the transmitter (its frustum acts as transmit beam) and every path vertex
+        is connected to the receivers, which are treated as omnidirectional points.
+        :param receiver_positions: (K, 3) receiver positions
+        :param transmitter_position: (3,) transmitter position
+        :param receiver_sample_count: if in (0, K), connect only to this many randomly chosen receivers
+        """
+        self.update_camera_position(np.asarray(transmitter_position, dtype=float))
+        self.set_receiver_array(receiver_positions, receiver_sample_count)
+
+    def set_receiver_array(self, receiver_positions, receiver_sample_count=0):
+        context = self.context
+        if receiver_positions is None:
+            self.receiver_count = 0
+            self.context_state.upload('receiver_positions', np.zeros((1, 3), dtype=np.float32), drop_last_dim=True)
+            context['receiver_intensity'] = np.zeros(3, dtype=np.float32)
+        else:
+            receiver_positions = np.asarray(receiver_positions, dtype=np.float32).reshape((-1, 3))
+            self.receiver_count = receiver_positions.shape[0]
+            self.context_state.upload('receiver_positions', receiver_positions, drop_last_dim=True)
+            intensity = getattr(self.scene.light_list[0], "intensity", [1, 1, 1])
+            context['receiver_intensity'] = np.array(intensity, dtype=np.float32)
+        self.receiver_positions = receiver_positions
+        self.receiver_sample_count = receiver_sample_count
+        context['receiver_count'] = np.array(self.receiver_count, dtype=np.uint32)
+        context['receiver_sample_count'] = np.array(receiver_sample_count, dtype=np.uint32)
+
+    def set_transient_range(self, transient_dist_min, transient_dist_max, transient_bin_num, transient_bin_edges=None):
+        """
+        Set path length range of the transient histogram.
+        :param transient_bin_edges: (n_bins + 1,) bin edges for non-uniform binning (None : uniform bins)
+        """
+        context = self.context
+        uniform_bins = transient_bin_edges is None
+        if uniform_bins:
+            transient_bin_edges = np.linspace(transient_dist_min, transient_dist_max, transient_bin_num + 1)
+        else:
+            transient_bin_edges = np.asarray(transient_bin_edges, dtype=np.float64)
+            transient_dist_min = transient_bin_edges[0]
+            transient_dist_max = transient_bin_edges[-1]
+            transient_bin_num = transient_bin_edges.shape[0] - 1
+        self.transient_bin_num = int(transient_bin_num)
+        self.transient_bin_edges = transient_bin_edges
+        context['transient_dist_max'] = np.array(transient_dist_max, dtype=np.float32)
+        context['transient_dist_min'] = np.array(transient_dist_min, dtype=np.float32)
+        context['transient_bin_num'] = np.array(transient_bin_num, dtype=np.uint32)
+        context['transient_uniform_bins'] = np.array(1 if uniform_bins else 0, dtype=np.uint32)
+        self.context_state.upload('transient_bin_edges', transient_bin_edges, dtype=np.float32)
+
+    def compute_time_window(self, camera_positions, emitter_positions, max_depth, bin_width=None, bin_num=None, margin=0.0):
+        """
+        Tightest transient range for given poses from per-shape bounds of the loaded scene.
+        :param camera_positions: (n_poses, 3) receiver positions
+        :param emitter_positions: (n_poses, 3) transmitter positions
+        :return: dict of (n_poses,) transient_dist_min, transient_dist_max, transient_bin_num
+        """
+        bbox_min = np.array([bbox.bbox_min for bbox in self.scene.shape_bbox_list])
+        bbox_max = np.array([bbox.bbox_max for bbox in self.scene.shape_bbox_list])
+        return compute_time_window(emitter_positions, camera_positions, bbox_min, bbox_max, max_depth,
+                                   bin_width=bin_width, bin_num=bin_num, margin=margin)
+
+    def set_bounce_layout(self, bounce_layout, max_depth):
+        self.bounce_column_map, self.bounce_labels = make_bounce_layout(bounce_layout, max_depth)
+        self.context_state.upload('bounce_column_map', self.bounce_column_map, dtype=np.int32)
+
+    def create_transient_histogram_buffer(self, clear=True):
+        histogram_shape = (max(self.receiver_count, 1), self.transient_bin_num, len(self.bounce_labels))
+        # same shape : existing buffer is cleared instead of reallocated
+        self.context_state.allocate('transient_radiance_histogram', histogram_shape, np.float32, clear=clear)
+
+    def get_histogram_accumulator(self, kahan=False):
+        histogram_shape = (max(self.receiver_count, 1), self.transient_bin_num, len(self.bounce_labels))
+        accumulator = self.histogram_accumulator
+        if accumulator is None or accumulator.shape != histogram_shape or accumulator.kahan != kahan:
+            accumulator = HistogramAccumulator(histogram_shape, kahan)
+            self.histogram_accumulator = accumulator
+        accumulator.reset()
+        return accumulator
+
+    def read_histogram(self, histogram_accumulator=None):
+        """
+        Accumulated histogram, flushing the device histogram to the host accumulator if given.
+        """
+        if histogram_accumulator is None:
+            return self.context['transient_radiance_histogram'].to_array()
+        histogram_accumulator.flush(self.context['transient_radiance_histogram'])
+        return histogram_accumulator.total()
+
+    def render_state_hash(self, max_depth, rr_begin_depth, sample_begin=0):
+        """
+        Hash of everything that changes the accumulated buffers except the number of samples.
+        """
+        emitter_position = getattr(self.scene.light_list[0], "position", None) if len(self.scene.light_list) > 0 else None
+        state = {
+            "scene_name": self.scene_name,
+            "width": self.width,
+            "height": self.height,
+            "max_depth": max_depth,
+            "rr_begin_depth": rr_begin_depth,
+            "transient_bin_edges": np.asarray(self.transient_bin_edges, dtype=np.float32),
+            "bounce_labels": self.bounce_labels,
+            "camera_position": self.camera_position,
+            "emitter_position": emitter_position,
+            "receiver_positions": self.receiver_positions,
+            "receiver_sample_count": self.receiver_sample_count,
+            "sample_begin": sample_begin
+        }
+        return hash_render_state(state)
+
+    def save_checkpoint(self, checkpoint_file, completed_samples, n_pass, config_hash, scene_hash, save_output_buffer=False,
+                        histogram_accumulator=None):
+        output_buffer = self.context['output_buffer'].to_array() if save_output_buffer else None
+        save_checkpoint(checkpoint_file, self.read_histogram(histogram_accumulator),
+                        completed_samples, n_pass, config_hash, scene_hash, output_buffer)
+        self.render_logger.info("Saved checkpoint %s (%d samples, %d passes)" % (checkpoint_file, completed_samples, n_pass))
+
+    def restore_checkpoint(self, checkpoint, histogram_accumulator=None):
+        """
+        Upload accumulated buffers of a checkpoint, so that following launches add to them.
+        With host accumulation the histogram goes to the host accumulator instead.
+        :return: whether the output buffer was restored
+        """
+        if histogram_accumulator is not None:
+            histogram_accumulator.add(checkpoint["transient_histogram"])
+        else:
+            self.context_state.upload('transient_radiance_histogram', checkpoint["transient_histogram"],
+                                      dtype=np.float32, buffer_type='io')
+        if "output_buffer" in checkpoint:
+            self.context_state.upload('output_buffer', checkpoint["output_buffer"],
+                                      dtype=np.float32, buffer_type='io', drop_last_dim=True)
+            return True
+        self.render_logger.warning("Checkpoint has no output buffer, image only contains resumed samples")
+        return False
 
     def init(
         self,
@@ -103,9 +310,13 @@ class Renderer:
         **kwargs
     ):
         self.scale = kwargs.get("scale", 1)
-        optix_created = self.load_scene(scene_name, scene_file_path=scene_file_path)
+        optix_created = self.load_scene(scene_name, scene_file_path=scene_file_path,
+                                        mesh_decimation=kwargs.get("mesh_decimation", None),
+                                        mesh_preprocess=kwargs.get("mesh_preprocess", None),
+                                        reload=kwargs.get("reload_scene", False))
         if not optix_created:
             self.optix_context.update_program()
+        self.optix_context.set_light_selection(kwargs.get("light_selection", "power"), self.scene)
 
         # just for shorter name
         context = self.context
@@ -114,18 +325,31 @@ class Renderer:
         height = self.height
 
         # Transient Related
-        context['transient_dist_max'] = np.array(kwargs.get("transient_dist_max"), dtype=np.float32)
-        context['transient_dist_min'] = np.array(kwargs.get("transient_dist_min"), dtype=np.float32)
-        context['transient_bin_num'] = np.array(kwargs.get("transient_bin_num"), dtype=np.uint32)
-        context['transient_radiance_histogram'] = Buffer.empty((kwargs.get("transient_bin_num"), max_depth), dtype=np.float32, buffer_type='o', drop_last_dim=False)
+        self.set_transient_range(kwargs.get("transient_dist_min"), kwargs.get("transient_dist_max"),
+                                 kwargs.get("transient_bin_num"), kwargs.get("transient_bin_edges", None))
+        if optix_created:
+            self.set_receiver_array(None)
+        self.set_bounce_layout(kwargs.get("bounce_layout", "all"), max_depth)
+        # buffers are cleared by render before the first launch
+        self.create_transient_histogram_buffer(clear=False)
 
         # path tracing related
         context['rr_begin_depth'] = np.array(rr_begin_depth, dtype=np.uint32)
         context['max_depth'] = np.array(max_depth, dtype=np.uint32)
+        context['accumulate_output_buffer'] = np.array(0, dtype=np.uint32)
 
-        self.reset_output_buffers(width, height)
-        context.validate()
-        context.compile()
+        self.reset_output_buffers(width, height, clear=False)
+        # validate / compile only if programs, groups or buffer layout changed,
+        # scalar variables (max_depth, transient range ...) do not need it
+        self.context_state.compile_if_dirty(self.render_load_logger)
+
+    def get_preview_server(self, port, interval_sec=1.0, max_image_size=256):
+        if self.preview_server is None:
+            from core.utils.preview_server import PreviewServer
+            self.preview_server = PreviewServer(port, interval_sec=interval_sec, max_image_size=max_image_size)
+        self.preview_server.interval_sec = interval_sec
+        self.preview_server.max_image_size = max_image_size
+        return self.preview_server
 
     def render(
         self,
@@ -148,18 +372,59 @@ class Renderer:
         scene = self.scene
         width = self.width
         height = self.height
-        self.reset_output_buffers(width, height)
-        context['transient_radiance_histogram'] = Buffer.empty((kwargs.get("transient_bin_num"), max_depth), dtype=np.float32, buffer_type='o', drop_last_dim=False)
+        # output buffer is overwritten by the first launch instead of cleared (accumulate_output_buffer)
+        self.reset_output_buffers(width, height, clear=False)
+        output_buffer_valid = False
+        self.create_transient_histogram_buffer()
+        # e.g. receiver count changed since init, otherwise compile time is counted in the first launch
+        self.context_state.compile_if_dirty(self.render_load_logger)
+
+        # render only sample indices [s0, s1) (partial render, merged with merge_partial_results)
+        sample_range = kwargs.get("sample_range", None)
+        sample_begin = 0
+        if sample_range is not None:
+            sample_begin = int(sample_range[0])
+            spp = int(sample_range[1]) - sample_begin
 
         current_samples_per_pass = samples_per_pass
         if samples_per_pass == -1:
             current_samples_per_pass = spp
 
         list_time_optix_launch = []
-        left_samples = spp
         completed_samples = 0
         n_pass = 0
 
+        # float64 host accumulation : device histogram is flushed to the host every host_accumulation_passes passes
+        host_accumulation_passes = kwargs.get("host_accumulation_passes", 0)
+        histogram_accumulator = None
+        if host_accumulation_passes > 0:
+            histogram_accumulator = self.get_histogram_accumulator(kwargs.get("host_accumulation_kahan", False))
+
+        # checkpoint / resume
+        checkpoint_file = kwargs.get("checkpoint_file", None)
+        checkpoint_interval_sec = kwargs.get("checkpoint_interval_sec", 600)
+        checkpoint_output_buffer = kwargs.get("checkpoint_output_buffer", False)
+        if checkpoint_file is not None:
+            config_hash = self.render_state_hash(max_depth, rr_begin_depth, sample_begin)
+            scene_hash = hash_file(self.scene_file_path)
+            if kwargs.get("resume", False):
+                checkpoint = load_checkpoint(checkpoint_file, config_hash, scene_hash)
+                if checkpoint is not None:
+                    output_buffer_valid = self.restore_checkpoint(checkpoint, histogram_accumulator)
+                    # continue completed_sample_number sequence of the interrupted run
+                    completed_samples = checkpoint["completed_samples"]
+                    n_pass = checkpoint["n_pass"]
+                    self.render_logger.info("Resumed from %s (%d samples, %d passes)" % (checkpoint_file, completed_samples, n_pass))
+        last_checkpoint_time = time.time()
+
+        preview_server = None
+        if kwargs.get("preview_port", None) is not None:
+            preview_server = self.get_preview_server(kwargs["preview_port"], kwargs.get("preview_interval_sec", 1.0),
+                                                     kwargs.get("preview_max_size", 256))
+
+        left_samples = spp - completed_samples
+        current_samples_per_pass = min(current_samples_per_pass, max(left_samples, 0))
+
         '''
         Main Render Loop
         '''
@@ -167,11 +432,13 @@ class Renderer:
             with timeout(time_limit_in_sec):
                 while left_samples > 0:
                     context["samples_per_pass"] = np.array(current_samples_per_pass, dtype=np.uint32)
-                    context["completed_sample_number"] = np.array(completed_samples, dtype=np.uint32)
+                    context["completed_sample_number"] = np.array(sample_begin + completed_samples, dtype=np.uint32)
+                    context["accumulate_output_buffer"] = np.array(output_buffer_valid, dtype=np.uint32)
 
                     # Run OptiX program
                     with record_elapsed_time("OptiX Launch", list_time_optix_launch, self.render_logger):
                         context.launch(0, width, height)
+                    output_buffer_valid = True
 
                     completed_samples += current_samples_per_pass
 
@@ -181,19 +448,46 @@ class Renderer:
                     current_samples_per_pass = min(current_samples_per_pass, left_samples)
                     n_pass += 1
 
+                    if histogram_accumulator is not None and n_pass % host_accumulation_passes == 0:
+                        histogram_accumulator.flush(context['transient_radiance_histogram'])
+
+                    if checkpoint_file is not None and time.time() - last_checkpoint_time >= checkpoint_interval_sec:
+                        self.save_checkpoint(checkpoint_file, completed_samples, n_pass, config_hash, scene_hash,
+                                             checkpoint_output_buffer, histogram_accumulator)
+                        last_checkpoint_time = time.time()
+
+                    # buffers are read back only when a snapshot is due, independent of the number of viewers
+                    if preview_server is not None and preview_server.should_submit():
+                        preview_server.submit(context['output_buffer'].to_array(),
+                                              self.read_histogram(histogram_accumulator)[0],
+                                              completed_samples, spp, n_pass)
+
         except TimeoutError:
             self.render_logger.info("%f sec is over" % time_limit_in_sec)
 
+        if not output_buffer_valid:
+            # nothing was launched, output buffer still holds the previous render
+            self.reset_output_buffers(width, height, clear=True)
+
+        if checkpoint_file is not None:
+            self.save_checkpoint(checkpoint_file, completed_samples, n_pass, config_hash, scene_hash,
+                                 checkpoint_output_buffer, histogram_accumulator)
+        self.render_logger.debug("Buffer pool : %s" % str(self.context_state.buffer_pool.stats()))
+
         # histogram
-        transient_signal_histogram = self.context['transient_radiance_histogram'].to_array()
+        # (float64 with host accumulation, normalized in float64)
+        transient_signal_histogram = self.read_histogram(histogram_accumulator)
+        if histogram_accumulator is not None:
+            transient_signal_histogram = transient_signal_histogram.copy()
         transient_signal_histogram /= (completed_samples * width * height)
+        if self.receiver_count == 0:
+            transient_signal_histogram = transient_signal_histogram[0]
 
         if show_picture:
-            transient_dist_min = kwargs.get("transient_dist_min", 10)
-            transient_dist_max = kwargs.get("transient_dist_max", 10)
-            transient_bin_num = kwargs.get("transient_bin_num", 10)
-            
-            ts = np.linspace(transient_dist_min, transient_dist_max, transient_bin_num)
+            import matplotlib.pyplot as plt
+
+            # bin centers
+            ts = 0.5 * (self.transient_bin_edges[1:] + self.transient_bin_edges[:-1])
 
             # (1) Image
             final_raw_image = self.context['output_buffer'].to_array()
@@ -205,10 +499,11 @@ class Renderer:
             plt.imshow(final_image)
             plt.show()
 
-            # (2) Transient Signal
-            plt.plot(ts, transient_signal_histogram[:, 1], label="1")
-            plt.plot(ts, transient_signal_histogram[:, 2], label="2")
-            plt.plot(ts, transient_signal_histogram[:, 3], label="3")
+            # (2) Transient Signal (first receiver in multi-receiver mode)
+            plotted_histogram = transient_signal_histogram[0] if self.receiver_count > 0 else transient_signal_histogram
+            for label, column in label_histogram_columns(plotted_histogram, self.bounce_labels).items():
+                if label != "0":
+                    plt.plot(ts, column, label=label)
             plt.xlabel('time')
             plt.ylabel('intensity')
             plt.ticklabel_format(style='sci', axis='y', scilimits=(0,0))
@@ -219,5 +514,9 @@ class Renderer:
 
         results = dict()
         results["transient_histogram"] = transient_signal_histogram
+        results["transient_bounce_labels"] = self.bounce_labels
+        results["transient_bin_edges"] = self.transient_bin_edges
+        results["sample_range"] = (sample_begin, sample_begin + completed_samples)
+        results["render_state_hash"] = self.render_state_hash(max_depth, rr_begin_depth)
 
         return results
@@ -1,5 +1,5 @@
 from core.utils.math_utils import *
-from pyoptix import GeometryInstance,  Transform, GeometryGroup, Acceleration
+from pyoptix import GeometryInstance,  Transform, GeometryGroup, Acceleration, Buffer
 import os
 
 from core.optix_mesh import OptixMesh
@@ -12,7 +12,10 @@ from core.shapes.objmesh import OBJMesh, InstancedShape, Shape
 from itertools import chain
 from core.textures.texture import *
 from core.emitters.envmap import EnvironmentMap
+from core.utils.loader_utils import load_texture_image, create_texture_sampler
+from core.utils.light_utils import envmap_sampling_tables
 from pathlib import Path
+import copy
 
 
 def add_transform(transformation, geometry_instance):
@@ -61,6 +64,31 @@ def add_animation(animation, geometry_instance):
     return transform
 
 
+def shape_node_signature(node, shape):
+    """
+    Signature of everything that defines the geometry of a shape except its instance transform.
+    Nested bsdf / emitter / material reference and toWorld transform are compared separately.
+    """
+    node = copy.deepcopy(node)
+    for child in list(node):
+        if child.tag in ("bsdf", "emitter", "ref") or (child.tag == "transform" and child.attrib.get("name") == "toWorld"):
+            node.remove(child)
+    signature = [shape.shape_type, ET.tostring(node)]
+    if isinstance(shape, OBJMesh):
+        signature.append(shape.mesh_key)
+    elif not isinstance(shape, InstancedShape):
+        # transform is baked into the shape (e.g. sphere)
+        signature.append(str(shape))
+    return tuple(signature)
+
+
+def file_stamp(file_name):
+    if not os.path.exists(file_name):
+        return None
+    stat = os.stat(file_name)
+    return stat.st_mtime_ns, stat.st_size
+
+
 class Scene:
     def __init__(self, name):
         self.name = name
@@ -82,12 +110,33 @@ class Scene:
 
         self.obj_name_list = []
         self.obj_geometry_dict = {}
+        # mesh key -> (mtime, size) of the obj file when it was loaded
+        self.obj_file_stamps = {}
+        # mesh key -> (obj file name, decimation setting)
+        self.obj_load_dict = {}
+
+        # obj file name -> decimation setting given by config
+        self.mesh_decimation = {}
+        # mesh preprocessing options given by config
+        self.mesh_preprocess = None
 
         self.geometry_instances = []
         self.light_instances = []
 
+        # per shape signature, optix transform node and local bbox (used by incremental reload)
+        self.shape_signatures = []
+        self.shape_transforms = []
+        self.shape_local_bbox_list = []
+
+        # (texture file name, gamma) -> (texture sampler, file stamp)
+        self.texture_sampler_dict = {}
+        # (environment map file name, gamma) -> (marginal cdf buffer, conditional cdf buffer)
+        self.envmap_table_dict = {}
+
         self.folder_path = None
         self.bbox = BoundingBox()
+        # world space bbox of each shape
+        self.shape_bbox_list = []
 
         self.width = 0
         self.height = 0
@@ -175,6 +224,7 @@ class Scene:
         """
         shape_list = []
         obj_list = []
+        shape_signatures = []
         anonymous_material_count = 0
 
         for node in root.findall('shape'):
@@ -182,8 +232,12 @@ class Scene:
             shape = load_single_shape(node)
 
             # if shape includes obj mesh, this would be loaded after.
-            if isinstance(shape, OBJMesh) and shape.obj_file_name not in obj_list:
-                obj_list.append(shape.obj_file_name)
+            if isinstance(shape, OBJMesh):
+                if shape.obj_file_name in self.mesh_decimation:
+                    shape.decimation = self.mesh_decimation[shape.obj_file_name]
+                if shape.mesh_key not in obj_list:
+                    obj_list.append(shape.mesh_key)
+                    self.obj_load_dict[shape.mesh_key] = (shape.obj_file_name, shape.decimation)
 
             # 2. load material
             material_ref = node.find("ref")
@@ -230,9 +284,11 @@ class Scene:
 
             shape.bsdf = material
             shape_list.append(shape)
+            shape_signatures.append(shape_node_signature(node, shape))
 
         self.shape_list = shape_list
         self.obj_name_list = obj_list
+        self.shape_signatures = shape_signatures
 
     def load_new_material(self, bsdf, bsdf_id=None):
         """
@@ -253,23 +309,73 @@ class Scene:
 
         return material
 
-    def optix_load_objs(self, program_dictionary):
+    def optix_load_objs(self, program_dictionary, reuse_from=None):
         """
         Load OBJ files and store it as OptiX Geometry instance
         :param program_dictionary:
-        :return:
+        :param reuse_from: previously loaded scene, its meshes are reused if the obj file and options did not change
+        :return: list of reused mesh keys
         """
         mesh_bb = program_dictionary['tri_mesh_bb']
         mesh_it = program_dictionary['tri_mesh_it']
 
-        for obj_file_name in self.obj_name_list:
+        reused = []
+        for mesh_key in self.obj_name_list:
+            obj_file_name, decimation = self.obj_load_dict[mesh_key]
+            file_name = self.folder_path + "/" + obj_file_name
+            stamp = file_stamp(file_name)
+            if reuse_from is not None and mesh_key in reuse_from.obj_geometry_dict and \
+                    reuse_from.obj_file_stamps.get(mesh_key) == stamp and reuse_from.mesh_preprocess == self.mesh_preprocess:
+                self.obj_geometry_dict[mesh_key] = reuse_from.obj_geometry_dict[mesh_key]
+                self.obj_file_stamps[mesh_key] = stamp
+                reused.append(mesh_key)
+                continue
             mesh = OptixMesh(mesh_bb, mesh_it)
-            mesh.load_from_file(self.folder_path + "/" + obj_file_name)
-            self.obj_geometry_dict[obj_file_name] = mesh
+            mesh.load_from_file(file_name, decimation=decimation, preprocess=self.mesh_preprocess)
+            self.obj_geometry_dict[mesh_key] = mesh
+            self.obj_file_stamps[mesh_key] = stamp
+        return reused
 
-    def optix_load_textures(self):
+    def load_texture_sampler_cached(self, texture_name, gamma, reuse_from=None):
+        """
+        Load texture sampler, reusing the one of previously loaded scene if the file did not change.
+        """
+        key = (texture_name, gamma)
+        stamp = file_stamp(os.path.join(self.folder_path, texture_name))
+        if reuse_from is not None and key in reuse_from.texture_sampler_dict and \
+                reuse_from.texture_sampler_dict[key][1] == stamp:
+            tex_sampler = reuse_from.texture_sampler_dict[key][0]
+        else:
+            tex_sampler = load_texture_sampler(self.folder_path, texture_name, gamma=gamma)
+        self.texture_sampler_dict[key] = (tex_sampler, stamp)
+        return tex_sampler
+
+    def load_envmap_cached(self, texture_name, reuse_from=None):
+        """
+        Load environment map sampler and its importance sampling tables,
+        reusing both from previously loaded scene if the file did not change.
+        :return: texture sampler, marginal cdf buffer, conditional cdf buffer
+        """
+        key = (texture_name, 1)
+        stamp = file_stamp(os.path.join(self.folder_path, texture_name))
+        if reuse_from is not None and key in reuse_from.envmap_table_dict and \
+                reuse_from.texture_sampler_dict[key][1] == stamp:
+            tex_sampler = reuse_from.texture_sampler_dict[key][0]
+            tables = reuse_from.envmap_table_dict[key]
+        else:
+            image = load_texture_image(self.folder_path, texture_name, gamma=1)
+            tex_sampler = create_texture_sampler(image)
+            marginal_cdf, conditional_cdf = envmap_sampling_tables(image)
+            tables = (Buffer.from_array(marginal_cdf, dtype=np.float32, buffer_type='i'),
+                      Buffer.from_array(conditional_cdf.reshape(-1), dtype=np.float32, buffer_type='i'))
+        self.texture_sampler_dict[key] = (tex_sampler, stamp)
+        self.envmap_table_dict[key] = tables
+        return (tex_sampler,) + tables
+
+    def optix_load_textures(self, reuse_from=None):
         """
         Load texture data and store it as OptiX object.
+        :param reuse_from: previously loaded scene, its samplers are reused for unchanged files
         :return:
         """
         from core.textures.bitmap import BitmapTexture
@@ -278,7 +384,8 @@ class Scene:
         for light in self.light_list:
             if isinstance(light, EnvironmentMap):
                 self.has_envmap = True
-                tex_sampler = load_texture_sampler(self.folder_path, light.filename, gamma=1)
+                tex_sampler, light.marginal_cdf_buffer, light.conditional_cdf_buffer = \
+                    self.load_envmap_cached(light.filename, reuse_from)
                 self.texture_sampler_list.append(tex_sampler)
                 light.envmapID = tex_sampler.get_id()
                 print("ENV loaded", light.envmapID, light.filename)
@@ -296,7 +403,7 @@ class Scene:
         print(self.texture_name_list)
 
         for texture_name in self.texture_name_list:
-            tex_sampler = load_texture_sampler(self.folder_path, texture_name, gamma=2.2)
+            tex_sampler = self.load_texture_sampler_cached(texture_name, 2.2, reuse_from)
             self.texture_name_to_optix_index_dictionary[texture_name] = tex_sampler.get_id()
             self.texture_sampler_list.append(tex_sampler)
 
@@ -315,6 +422,9 @@ class Scene:
 
         geometry_instances = []
         light_instances = []
+        shape_bbox_list = []
+        shape_transforms = []
+        shape_local_bbox_list = []
 
         for shape in self.shape_list:
             shape_type = shape.shape_type
@@ -323,7 +433,7 @@ class Scene:
 
             # (1) create geometry
             if shape_type == "obj":
-                mesh = self.obj_geometry_dict[shape.obj_file_name]
+                mesh = self.obj_geometry_dict[shape.mesh_key]
                 shape.mesh = mesh
                 geometry = mesh.geometry
                 bbox = mesh.bbox
@@ -359,6 +469,7 @@ class Scene:
             geometry_instance["lightId"] = emitter_id
             geometry_instance['programId'] = bsdf_type
 
+            shape_local_bbox_list.append(bbox)
             if isinstance(shape, InstancedShape):
                 if isinstance(shape.transform, Matrix44):
                     bbox = get_bbox_transformed(bbox, np.array(shape.transform.transpose(), dtype=np.float32))
@@ -373,7 +484,11 @@ class Scene:
                     bbox = merged_bbox
 
             # merge bbox
-            self.bbox = get_bbox_merged(self.bbox, bbox)
+            shape_bbox_list.append(bbox)
+            if len(shape_bbox_list) == 1:
+                self.bbox = bbox
+            else:
+                self.bbox = get_bbox_merged(self.bbox, bbox)
 
             if isinstance(shape, OBJMesh):
                 geometry_instance["faceNormals"] = np.array(1 if shape.face_normals else 0, dtype=np.int32)
@@ -384,6 +499,7 @@ class Scene:
                 transform = add_transform(None, geometry_instance)
             #if shape.transformation is not None:
             # geometry_instance["transformation"] = shape.transformation
+            shape_transforms.append(transform)
             if target_material == light_material:
                 light_instances.append(transform)
             else:
@@ -391,3 +507,61 @@ class Scene:
 
         self.geometry_instances = geometry_instances
         self.light_instances = light_instances
+        self.shape_bbox_list = shape_bbox_list
+        self.shape_transforms = shape_transforms
+        self.shape_local_bbox_list = shape_local_bbox_list
+
+    def same_geometry_structure(self, other):
+        """
+        Whether geometry instances of other (loaded) scene can be reused for this scene,
+        i.e. only instance transforms and material / light parameters may differ.
+        """
+        if self.shape_signatures != other.shape_signatures or len(self.light_list) != len(other.light_list):
+            return False
+        for shape, other_shape in zip(self.shape_list, other.shape_list):
+            if shape.bsdf.list_index != other_shape.bsdf.list_index or \
+                    int(shape.bsdf.optix_bsdf_type) != int(other_shape.bsdf.optix_bsdf_type) or \
+                    (shape.bsdf.bsdf_type == "mask") != (other_shape.bsdf.bsdf_type == "mask") or \
+                    (shape.emitter is None) != (other_shape.emitter is None):
+                return False
+            if shape.emitter is not None and shape.emitter.list_index != other_shape.emitter.list_index:
+                return False
+            if isinstance(shape, InstancedShape):
+                if isinstance(shape.transform, Matrix44) != isinstance(other_shape.transform, Matrix44):
+                    return False
+                # keyframes of animated transforms are set when the transform is created
+                if not isinstance(shape.transform, Matrix44) and (
+                        shape.transform.keys() != other_shape.transform.keys() or
+                        not all(np.array_equal(np.array(shape.transform[key]), np.array(other_shape.transform[key]))
+                                for key in shape.transform.keys())):
+                    return False
+        return True
+
+    def adopt_geometry_instances(self, other):
+        """
+        Take over optix geometry of other scene with the same geometry structure and apply changed transforms.
+        :return: indices of shapes whose transform changed
+        """
+        self.geometry_instances = other.geometry_instances
+        self.light_instances = other.light_instances
+        self.shape_transforms = other.shape_transforms
+        self.shape_local_bbox_list = other.shape_local_bbox_list
+        self.shape_bbox_list = list(other.shape_bbox_list)
+        for shape, other_shape in zip(self.shape_list, other.shape_list):
+            if isinstance(shape, OBJMesh):
+                shape.mesh = self.obj_geometry_dict[shape.mesh_key]
+
+        changed = []
+        for i, (shape, other_shape) in enumerate(zip(self.shape_list, other.shape_list)):
+            if not isinstance(shape, InstancedShape) or not isinstance(shape.transform, Matrix44):
+                continue
+            if np.array_equal(np.array(shape.transform), np.array(other_shape.transform)):
+                continue
+            self.shape_transforms[i].set_matrix(False, shape.transform.transpose())
+            self.shape_bbox_list[i] = get_bbox_transformed(
+                self.shape_local_bbox_list[i], np.array(shape.transform.transpose(), dtype=np.float32))
+            changed.append(i)
+
+        for i, bbox in enumerate(self.shape_bbox_list):
+            self.bbox = bbox if i == 0 else get_bbox_merged(self.bbox, bbox)
+        return changed
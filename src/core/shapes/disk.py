@@ -30,8 +30,9 @@ class Disk(InstancedShape):
         return disk
 
     def get_bbox(self) -> BoundingBox:
-        new_max = self.center + self.radius
-        new_min = self.center - self.radius
+        # bbox of canonical unit disk in object space, toWorld is applied with the instance transform
+        new_max = np.array([1, 1, 1], dtype=np.float32)
+        new_min = np.array([-1, -1, -1], dtype=np.float32)
         return BoundingBox(new_max, new_min)
 
     def __str__(self):
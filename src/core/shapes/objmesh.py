@@ -1,7 +1,8 @@
 from core.shapes.shape import Shape, InstancedShape
-from pyoptix import Geometry
+from pyoptix import Geometry, Buffer
 import numpy as np
 from core.utils.math_utils import BoundingBox
+from core.utils.light_utils import triangle_areas, build_triangle_cdf
 
 
 class OBJMesh(InstancedShape):
@@ -12,17 +13,51 @@ class OBJMesh(InstancedShape):
         self.face_normals = load_value(props, "faceNormals", default=False)
         self.flip_normals = load_value(props, "flipNormals", default=False)
         self.flip_tex_coords = load_value(props, "flipTexCoords", default=True)
+
+        # optional quadric-error decimation
+        self.decimation = None
+        decimation_target_triangles = load_value(props, "decimationTargetTriangles", default=None)
+        decimation_max_error = load_value(props, "decimationMaxError", default=None)
+        if decimation_target_triangles is not None or decimation_max_error is not None:
+            self.decimation = {
+                "target_triangles": decimation_target_triangles,
+                "max_error": decimation_max_error
+            }
         self.mesh = None
+        # (key, cdf buffer, total area) of the area light triangle table
+        self.triangle_cdf = None
+
+    @property
+    def mesh_key(self):
+        """
+        Key of loaded mesh. Shapes with same file and same decimation setting share a mesh.
+        """
+        if self.decimation is None:
+            return self.obj_file_name
+        return self.obj_file_name, self.decimation.get("target_triangles"), self.decimation.get("max_error")
 
     def __str__(self):
         logs = [
             "[Shape]",
             "\t- type : %s" % "obj",
             "\t- filename : %s" % str(self.obj_file_name),
-            "\t- face_normals : %s" % str(self.face_normals)
+            "\t- face_normals : %s" % str(self.face_normals),
+            "\t- decimation : %s" % str(self.decimation)
         ]
         return "\n".join(logs)
 
+    def triangle_cdf_table(self):
+        """
+        Area proportional triangle cdf buffer and total area under the shape transform,
+        recomputed only when the mesh or the transform changed.
+        :return: cdf buffer, total area
+        """
+        key = (id(self.mesh), np.asarray(self.transform, dtype=np.float32).tobytes())
+        if self.triangle_cdf is None or self.triangle_cdf[0] != key:
+            cdf, total_area = build_triangle_cdf(triangle_areas(self.mesh.vertices, self.mesh.indices, self.transform))
+            self.triangle_cdf = (key, Buffer.from_array(cdf, dtype=np.float32, buffer_type='i'), total_area)
+        return self.triangle_cdf[1], self.triangle_cdf[2]
+
     def fill_area_light_array(self, np_array):
         np_array["lightType"] = 6
         np_array["pos_buffer_id"] = self.mesh.geometry['vertex_buffer'].get_id()
@@ -30,4 +65,6 @@ class OBJMesh(InstancedShape):
         np_array["normal_buffer_id"] = self.mesh.geometry['normal_buffer'].get_id()
         np_array["n_triangles"] = self.mesh.n_triangles
         np_array["transformation"] = np.array(self.transform.transpose(), dtype=np.float32)
-        np_array["area"] = 1.0
+        triangle_cdf_buffer, total_area = self.triangle_cdf_table()
+        np_array["triangle_cdf_buffer_id"] = triangle_cdf_buffer.get_id()
+        np_array["area"] = total_area
@@ -51,13 +51,9 @@ class Rectangle(InstancedShape):
         return parallelogram
 
     def get_bbox(self) -> BoundingBox:
-        v1 = self.anchor
-        v2 = self.anchor + self.offset1
-        v3 = self.anchor + self.offset2
-        v4 = self.anchor + self.offset1 + self.offset2
-        vs = np.array([v1, v2, v3, v4])
-        new_max = np.amax(vs, 0)
-        new_min = np.amin(vs, 0)
+        # bbox of canonical rectangle in object space, toWorld is applied with the instance transform
+        new_max = np.array([1, 1, 0], dtype=np.float32)
+        new_min = np.array([-1, -1, 0], dtype=np.float32)
         return BoundingBox(new_max, new_min)
 
     def __str__(self):
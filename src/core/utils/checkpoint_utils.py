@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+CHECKPOINT_VERSION = 1
+
+
+def hash_render_state(state):
+    """
+    Stable hash of render state (config values and arrays).
+    :param state: dict of json serializable values or numpy arrays
+    :return: hex digest
+    """
+    hasher = hashlib.sha1()
+    for key in sorted(state.keys()):
+        value = state[key]
+        hasher.update(key.encode())
+        if isinstance(value, np.ndarray):
+            hasher.update(str(value.dtype).encode())
+            hasher.update(str(value.shape).encode())
+            hasher.update(np.ascontiguousarray(value).tobytes())
+        else:
+            hasher.update(json.dumps(value, sort_keys=True, default=str).encode())
+    return hasher.hexdigest()
+
+
+def hash_file(file_path):
+    """
+    Hash of file contents (empty string if the file does not exist).
+    """
+    if file_path is None or not os.path.exists(file_path):
+        return ""
+    hasher = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def save_checkpoint(checkpoint_file, transient_histogram, completed_samples, n_pass,
+                    config_hash, scene_hash, output_buffer=None):
+    """
+    Save accumulated (unnormalized) buffers of a render. The file is written next to the target and
+    renamed, so an interrupted save never corrupts the previous checkpoint.
+    :param transient_histogram: raw accumulated histogram buffer
+    :param completed_samples: number of samples per pixel accumulated so far
+    :param n_pass: number of finished passes
+    :param output_buffer: raw accumulated output buffer (optional)
+    """
+    arrays = {
+        "version": np.array(CHECKPOINT_VERSION),
+        "transient_histogram": transient_histogram,
+        "completed_samples": np.array(completed_samples, dtype=np.int64),
+        "n_pass": np.array(n_pass, dtype=np.int64),
+        "config_hash": np.array(config_hash),
+        "scene_hash": np.array(scene_hash),
+    }
+    if output_buffer is not None:
+        arrays["output_buffer"] = output_buffer
+
+    temp_file = "%s.tmp" % checkpoint_file
+    with open(temp_file, "wb") as f:
+        np.savez(f, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, checkpoint_file)
+
+
+def load_checkpoint(checkpoint_file, config_hash=None, scene_hash=None):
+    """
+    Load checkpoint saved by save_checkpoint.
+    :param config_hash: expected config hash (None : not checked)
+    :param scene_hash: expected scene hash (None : not checked)
+    :return: dict of checkpoint values, None if there is no checkpoint
+    """
+    if checkpoint_file is None or not os.path.exists(checkpoint_file):
+        return None
+    with np.load(checkpoint_file) as data:
+        checkpoint = {key: data[key] for key in data.files}
+    if int(checkpoint["version"]) != CHECKPOINT_VERSION:
+        raise ValueError("Checkpoint %s has version %d, expected %d" %
+                         (checkpoint_file, int(checkpoint["version"]), CHECKPOINT_VERSION))
+    if config_hash is not None and str(checkpoint["config_hash"]) != config_hash:
+        raise ValueError("Checkpoint %s was saved with a different config" % checkpoint_file)
+    if scene_hash is not None and str(checkpoint["scene_hash"]) != scene_hash:
+        raise ValueError("Checkpoint %s was saved with a different scene" % checkpoint_file)
+    checkpoint["completed_samples"] = int(checkpoint["completed_samples"])
+    checkpoint["n_pass"] = int(checkpoint["n_pass"])
+    return checkpoint
+
+
+def split_sample_range(spp, n_parts):
+    """
+    Split sample indices [0, spp) into n_parts contiguous ranges of (almost) equal size.
+    :return: list of (s0, s1)
+    """
+    bounds = np.linspace(0, spp, n_parts + 1).round().astype(np.int64)
+    return [(int(bounds[i]), int(bounds[i + 1])) for i in range(n_parts) if bounds[i + 1] > bounds[i]]
+
+
+def save_partial_result(partial_file, transient_histogram, sample_range, render_state_hash, transient_bin_edges=None):
+    """
+    Save normalized histogram of a partial render of sample indices [s0, s1).
+    """
+    arrays = {
+        "transient_histogram": transient_histogram,
+        "sample_range": np.array(sample_range, dtype=np.int64),
+        "render_state_hash": np.array(render_state_hash),
+    }
+    if transient_bin_edges is not None:
+        arrays["transient_bin_edges"] = transient_bin_edges
+    np.savez(partial_file, **arrays)
+
+
+def load_partial_result(partial_file):
+    with np.load(partial_file) as data:
+        partial = {key: data[key] for key in data.files}
+    partial["sample_range"] = tuple(int(x) for x in partial["sample_range"])
+    partial["render_state_hash"] = str(partial["render_state_hash"])
+    return partial
+
+
+def merge_partial_results(partials):
+    """
+    Merge partial renders of disjoint sample ranges into the histogram of a single run over their union.
+    Each normalized histogram is weighted by its number of samples, accumulated in float64.
+    :param partials: list of dicts with transient_histogram, sample_range and render_state_hash
+    :return: merged histogram and list of merged (s0, s1) ranges
+    """
+    if len(partials) == 0:
+        raise ValueError("No partial results to merge")
+    hashes = set(partial["render_state_hash"] for partial in partials)
+    if len(hashes) != 1:
+        raise ValueError("Partial results were rendered with different configs")
+
+    partials = sorted(partials, key=lambda partial: partial["sample_range"][0])
+    for previous, current in zip(partials[:-1], partials[1:]):
+        if current["sample_range"][0] < previous["sample_range"][1]:
+            raise ValueError("Sample ranges %s and %s overlap" % (previous["sample_range"], current["sample_range"]))
+
+    merged = np.zeros(partials[0]["transient_histogram"].shape, dtype=np.float64)
+    total_samples = 0
+    ranges = []
+    for partial in partials:
+        s0, s1 = partial["sample_range"]
+        merged += partial["transient_histogram"].astype(np.float64) * (s1 - s0)
+        total_samples += s1 - s0
+        if len(ranges) > 0 and ranges[-1][1] == s0:
+            ranges[-1] = (ranges[-1][0], s1)
+        else:
+            ranges.append((s0, s1))
+    merged /= max(total_samples, 1)
+    return merged, ranges
@@ -0,0 +1,138 @@
+import glob
+import hashlib
+import json
+import os
+import re
+from utils.logging_utils import load_logger
+
+compile_cache_logger = load_logger("Compile cache")
+
+INCLUDE_PATTERN = re.compile(r'^\s*#\s*include\s*[<"]([^>"]+)[>"]', re.MULTILINE)
+DEFINE_PATTERN = re.compile(r'^\s*#\s*define\s+(\w+)(?:[ \t]+(.*))?$', re.MULTILINE)
+BLOCK_COMMENT_PATTERN = re.compile(r'/\*.*?\*/', re.DOTALL)
+LINE_COMMENT_PATTERN = re.compile(r'//[^\n]*')
+
+CACHE_FILE_NAME = ".optix_program_hashes.json"
+
+
+def strip_comments(source):
+    return LINE_COMMENT_PATTERN.sub("", BLOCK_COMMENT_PATTERN.sub("", source))
+
+
+def find_includes(source):
+    """
+    Include names of a source, commented out includes are ignored.
+    """
+    return INCLUDE_PATTERN.findall(strip_comments(source))
+
+
+def find_defines(source):
+    """
+    Macro definitions of a source.
+    :return: dict of macro name -> value
+    """
+    return {name: (value or "").strip() for name, value in DEFINE_PATTERN.findall(strip_comments(source))}
+
+
+def resolve_include(include_name, including_dir, include_dirs):
+    """
+    Resolve include like the compiler : directory of the including file first, then include directories.
+    :return: absolute path, None for headers outside of include_dirs (system / OptiX SDK headers)
+    """
+    for directory in [including_dir] + list(include_dirs):
+        candidate = os.path.normpath(os.path.join(directory, include_name))
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def include_graph(source_file, include_dirs):
+    """
+    Transitive include graph of a source file.
+    :param include_dirs: include directories (program directories given to the compiler)
+    :return: dict of file -> list of resolved included files, external includes are skipped
+    """
+    graph = {}
+    stack = [os.path.normpath(os.path.abspath(source_file))]
+    while len(stack) > 0:
+        file = stack.pop()
+        if file in graph:
+            continue
+        with open(file, encoding="utf-8", errors="replace") as f:
+            source = f.read()
+        resolved = []
+        for include_name in find_includes(source):
+            include_file = resolve_include(include_name, os.path.dirname(file), include_dirs)
+            if include_file is not None:
+                resolved.append(include_file)
+        graph[file] = resolved
+        stack.extend(resolved)
+    return graph
+
+
+def hash_program(source_file, include_dirs, extra=None):
+    """
+    Hash of a program source, every header it includes and compile relevant settings.
+    Headers are hashed in sorted path order so the hash does not depend on include order.
+    :param extra: dict of compile settings (flags ...) included in the hash
+    :return: hex digest, dict of macro definitions found in the include graph
+    """
+    graph = include_graph(source_file, include_dirs)
+    hasher = hashlib.sha1()
+    defines = {}
+    for file in sorted(graph.keys()):
+        with open(file, "rb") as f:
+            content = f.read()
+        hasher.update(os.path.relpath(file, include_dirs[0] if len(include_dirs) > 0 else "").encode())
+        hasher.update(content)
+        defines.update(find_defines(content.decode("utf-8", errors="replace")))
+    hasher.update(json.dumps(extra or {}, sort_keys=True, default=str).encode())
+    return hasher.hexdigest(), defines
+
+
+def program_hashes(program_dir, extra=None):
+    """
+    Hash every .cu program under program_dir/optix.
+    :return: dict of program path (relative to program_dir) -> hash
+    """
+    hashes = {}
+    for source_file in sorted(glob.glob(os.path.join(program_dir, "optix", "**", "*.cu"), recursive=True)):
+        digest, _ = hash_program(source_file, [program_dir], extra)
+        hashes[os.path.relpath(source_file, program_dir)] = digest
+    return hashes
+
+
+def changed_programs(old_hashes, new_hashes):
+    return sorted(name for name in set(old_hashes) | set(new_hashes) if old_hashes.get(name) != new_hashes.get(name))
+
+
+def prepare_compile_cache(compiler, program_dir, cache_dir=None):
+    """
+    Clean compiled programs only if a program, one of its headers or the compile settings changed.
+    Replaces unconditional Compiler.clean() at startup.
+    :param compiler: pyoptix Compiler class
+    :param program_dir: directory added with Compiler.add_program_directory
+    :param cache_dir: directory of the hash file (default : program_dir)
+    :return: list of changed programs (empty if the cache is valid)
+    """
+    extra = {"keep_device_function": getattr(compiler, "keep_device_function", None)}
+    new_hashes = program_hashes(program_dir, extra)
+    cache_file = os.path.join(cache_dir or program_dir, CACHE_FILE_NAME)
+    old_hashes = {}
+    if os.path.exists(cache_file):
+        try:
+            old_hashes = json.load(open(cache_file))
+        except ValueError:
+            old_hashes = {}
+
+    changed = changed_programs(old_hashes, new_hashes)
+    if len(changed) > 0:
+        compile_cache_logger.info("Recompiling, changed programs : %s" % ", ".join(changed))
+        compiler.clean()
+        temp_file = "%s.%d.tmp" % (cache_file, os.getpid())
+        with open(temp_file, "w") as f:
+            json.dump(new_hashes, f, indent=1, sort_keys=True)
+        os.replace(temp_file, cache_file)
+    else:
+        compile_cache_logger.info("Compiled programs are up to date (%d programs)" % len(new_hashes))
+    return changed
@@ -0,0 +1,163 @@
+from collections import OrderedDict
+import numpy as np
+from pyoptix import Buffer
+
+
+def buffer_bytes(key):
+    shape, dtype = key[0], key[1]
+    return int(np.prod(shape)) * dtype.itemsize
+
+
+class BufferPool:
+    """
+    Device buffers keyed by (shape, dtype, buffer_type, drop_last_dim).
+    Released buffers are kept and handed out again for the same key instead of allocating a new one.
+    Free buffers are evicted least recently released first when the allocated size exceeds the budget.
+    """
+    def __init__(self, budget_bytes=None):
+        self.budget_bytes = budget_bytes
+        # key -> list of free buffers, in release order
+        self.free_buffers = OrderedDict()
+        self.allocated_bytes = 0
+        self.free_bytes = 0
+        self.n_allocations = 0
+        self.n_reuses = 0
+        self.n_evictions = 0
+
+    def acquire(self, key):
+        """
+        :return: buffer, whether it was reused (content is undefined)
+        """
+        free_list = self.free_buffers.get(key, None)
+        if free_list:
+            buffer = free_list.pop()
+            if len(free_list) == 0:
+                del self.free_buffers[key]
+            self.free_bytes -= buffer_bytes(key)
+            self.n_reuses += 1
+            return buffer, True
+        shape, dtype, buffer_type, drop_last_dim = key
+        buffer = Buffer.empty(shape, dtype=dtype, buffer_type=buffer_type, drop_last_dim=drop_last_dim)
+        self.allocated_bytes += buffer_bytes(key)
+        self.n_allocations += 1
+        self.evict()
+        return buffer, False
+
+    def release(self, key, buffer):
+        self.free_buffers.setdefault(key, []).append(buffer)
+        self.free_buffers.move_to_end(key)
+        self.free_bytes += buffer_bytes(key)
+        self.evict()
+
+    def evict(self):
+        # buffers are freed when their last reference is dropped
+        while self.budget_bytes is not None and self.allocated_bytes > self.budget_bytes and len(self.free_buffers) > 0:
+            key, free_list = next(iter(self.free_buffers.items()))
+            free_list.pop(0)
+            if len(free_list) == 0:
+                del self.free_buffers[key]
+            self.allocated_bytes -= buffer_bytes(key)
+            self.free_bytes -= buffer_bytes(key)
+            self.n_evictions += 1
+
+    def stats(self):
+        return {
+            "allocated_bytes": self.allocated_bytes,
+            "free_bytes": self.free_bytes,
+            "n_allocations": self.n_allocations,
+            "n_reuses": self.n_reuses,
+            "n_evictions": self.n_evictions
+        }
+
+
+class ContextState:
+    """
+    Tracks structural changes of an OptiX context since the last compile.
+    Assigning a new buffer / program / group object to a context variable changes the layout of the context,
+    while writing scalar variables or the contents of an existing buffer does not.
+    Buffers are therefore kept per variable and refilled in place when their size and format did not change.
+    Buffers replaced by another size go back to the buffer pool, so alternating sizes do not allocate again.
+    """
+    def __init__(self, context, buffer_pool_budget=None):
+        self.context = context
+        # variable name -> ((shape, dtype, buffer_type, drop_last_dim), buffer)
+        self.buffers = {}
+        self.buffer_pool = BufferPool(buffer_pool_budget)
+        self.dirty_reasons = ["context created"]
+        self.n_compiles = 0
+
+    def mark_dirty(self, reason):
+        self.dirty_reasons.append(reason)
+
+    @property
+    def dirty(self):
+        return len(self.dirty_reasons) > 0
+
+    def set_object(self, name, optix_object):
+        """
+        Assign program / group / buffer object to a context variable.
+        """
+        self.context[name] = optix_object
+        self._release(name)
+        self.mark_dirty(name)
+
+    def _release(self, name):
+        cached = self.buffers.pop(name, None)
+        if cached is not None:
+            self.buffer_pool.release(*cached)
+
+    def _bind_buffer(self, name, key):
+        """
+        Buffer of a context variable for key, the current one if it matches, otherwise one from the pool.
+        :return: buffer, whether its content is undefined
+        """
+        cached = self.buffers.get(name, None)
+        if cached is not None and cached[0] == key:
+            return cached[1], True
+        self._release(name)
+        buffer, reused = self.buffer_pool.acquire(key)
+        self.context[name] = buffer
+        self.buffers[name] = (key, buffer)
+        self.mark_dirty("buffer %s %s" % (name, str(key[0])))
+        return buffer, reused
+
+    def upload(self, name, array, dtype=None, buffer_type='i', drop_last_dim=False):
+        """
+        Upload array to the buffer of a context variable, reusing the buffer if shape and format are the same.
+        :return: buffer
+        """
+        array = np.asarray(array, dtype=dtype)
+        buffer, _ = self._bind_buffer(name, (array.shape, array.dtype, buffer_type, drop_last_dim))
+        buffer.copy_from_array(array)
+        return buffer
+
+    def allocate(self, name, shape, dtype, buffer_type='io', drop_last_dim=False, clear=True):
+        """
+        Buffer of a context variable with given shape. Existing or pooled buffer of the same shape and format
+        is reused and cleared to zero (buffer_type has to be 'io' for that).
+        :return: buffer
+        """
+        shape = tuple(int(x) for x in shape)
+        dtype = np.dtype(dtype)
+        buffer, reused = self._bind_buffer(name, (shape, dtype, buffer_type, drop_last_dim))
+        if reused and clear:
+            buffer.copy_from_array(np.zeros(shape, dtype=dtype))
+        return buffer
+
+    def compile_if_dirty(self, logger=None):
+        """
+        Validate and compile the context only if its layout changed since the last compile.
+        :return: whether the context was compiled
+        """
+        if not self.dirty:
+            if logger is not None:
+                logger.info("Skipped context compile, layout unchanged")
+            return False
+        if logger is not None:
+            logger.info("Compile context, changed : %s" % ", ".join(self.dirty_reasons[:10]) +
+                        (" ... (%d)" % len(self.dirty_reasons) if len(self.dirty_reasons) > 10 else ""))
+        self.context.validate()
+        self.context.compile()
+        self.dirty_reasons = []
+        self.n_compiles += 1
+        return True
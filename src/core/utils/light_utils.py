@@ -0,0 +1,201 @@
+import math
+import numpy as np
+
+# lightType values of optix/light/light_parameters.h
+LIGHT_QUAD = 0
+LIGHT_SPHERE = 1
+LIGHT_POINT = 2
+LIGHT_DIRECTIONAL = 3
+LIGHT_SPOT = 4
+LIGHT_DISK = 5
+LIGHT_TRIANGLE_MESH = 6
+LIGHT_ENVMAP = 7
+
+AREA_LIGHT_TYPES = (LIGHT_QUAD, LIGHT_SPHERE, LIGHT_DISK, LIGHT_TRIANGLE_MESH)
+
+
+def luminance(color):
+    # same weights as path_transient::luminance
+    color = np.asarray(color, dtype=np.float64)
+    return 0.299 * color[..., 0] + 0.587 * color[..., 1] + 0.114 * color[..., 2]
+
+
+def emitter_power(np_lights):
+    """
+    Emitted power (luminance) of Emitter.dtype records.
+    area lights : pi * radiance * area (one sided), point lights : 4 pi * intensity,
+    spot lights : intensity * solid angle of the cone.
+    Lights whose power is unknown (directional, environment map) get the mean nonzero power of the others,
+    or 1 if no power is known. Lights emitting nothing get zero power and are never selected.
+    :param np_lights: (n_lights,) array of Emitter.dtype
+    :return: (n_lights,) float64 power
+    """
+    np_lights = np.asarray(np_lights).reshape(-1)
+    light_type = np_lights["lightType"]
+    power = np.zeros(np_lights.shape[0], dtype=np.float64)
+
+    area_light = np.isin(light_type, AREA_LIGHT_TYPES)
+    power[area_light] = math.pi * luminance(np_lights["emission"][area_light]) * np_lights["area"][area_light]
+
+    point_light = light_type == LIGHT_POINT
+    power[point_light] = 4 * math.pi * luminance(np_lights["intensity"][point_light])
+
+    spot_light = light_type == LIGHT_SPOT
+    # falloff region counted half
+    cos_cone = 0.5 * (np_lights["cosTotalWidth"][spot_light] + np_lights["cosFalloffStart"][spot_light])
+    power[spot_light] = 2 * math.pi * (1 - cos_cone) * luminance(np_lights["intensity"][spot_light])
+
+    unknown = ~(area_light | point_light | spot_light) | ~np.isfinite(power)
+    emitting = ~unknown & (power > 0)
+    power[unknown] = power[emitting].mean() if np.any(emitting) else 1.0
+    return power
+
+
+def build_light_cdf(power):
+    """
+    :param power: (n_lights,) non negative light weights, uniform if they are all zero
+    :return: (n_lights + 1,) float32 cdf with cdf[0] = 0 and cdf[-1] = 1
+    """
+    power = np.asarray(power, dtype=np.float64)
+    if not power.sum() > 0:
+        power = np.ones(power.shape[0])
+    cdf = np.zeros(power.shape[0] + 1, dtype=np.float64)
+    np.cumsum(power, out=cdf[1:])
+    cdf /= cdf[-1]
+    cdf[-1] = 1.0
+    return cdf.astype(np.float32)
+
+
+def light_selection_cdf(np_lights, light_selection="power"):
+    """
+    :param light_selection: "power" (proportional to emitter_power) or "uniform"
+    """
+    n_lights = np.asarray(np_lights).reshape(-1).shape[0]
+    if light_selection == "uniform":
+        return build_light_cdf(np.ones(n_lights))
+    if light_selection == "power":
+        return build_light_cdf(emitter_power(np_lights))
+    raise ValueError("Unknown light_selection %s" % light_selection)
+
+
+def envmap_light_index(np_lights):
+    """
+    Index of the environment map in the light list, used by the miss program to read its parameters and
+    to report the light_id of an escaped ray.
+    :param np_lights: (n_lights,) array of Emitter.dtype
+    :return: index of the first environment map, 0 if there is none (the miss program is then not bound)
+    """
+    light_type = np.asarray(np_lights).reshape(-1)["lightType"]
+    index = np.flatnonzero(light_type == LIGHT_ENVMAP)
+    return int(index[0]) if index.shape[0] > 0 else 0
+
+
+def sample_cdf(cdf, u):
+    """
+    CPU reference of find_cdf_interval in optix/common/cdf.h.
+    :param u: uniform random numbers in [0, 1)
+    :return: index, probability of the index
+    """
+    cdf = np.asarray(cdf, dtype=np.float32)
+    n = cdf.shape[0] - 1
+    index = np.clip(np.searchsorted(cdf, np.asarray(u, dtype=np.float32), side="right") - 1, 0, n - 1)
+    return index, cdf[index + 1] - cdf[index]
+
+
+def sample_light_index(cdf, u):
+    # CPU reference of sample_light_index in optix/light/light_selection.h
+    return sample_cdf(cdf, u)
+
+
+def triangle_areas(vertices, indices, transform=None):
+    """
+    World space areas of mesh triangles.
+    :param vertices: (n_vertices, 3) object space positions
+    :param indices: (n_triangles, 3) vertex indices
+    :param transform: 4x4 pyrr matrix (row vectors, translation in the last row), None for identity
+    :return: (n_triangles,) float64 areas
+    """
+    vertices = np.asarray(vertices, dtype=np.float64).reshape((-1, 3))
+    if transform is not None:
+        vertices = vertices @ np.asarray(transform, dtype=np.float64)[:3, :3] + np.asarray(transform, dtype=np.float64)[3, :3]
+    triangles = vertices[np.asarray(indices).reshape((-1, 3))]
+    return 0.5 * np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]), axis=1)
+
+
+def build_triangle_cdf(areas):
+    """
+    Triangle selection cdf proportional to area, uniform if every triangle is degenerate.
+    :return: (n_triangles + 1,) float32 cdf, total area
+    """
+    areas = np.asarray(areas, dtype=np.float64)
+    return build_light_cdf(areas), float(areas.sum())
+
+
+def envmap_sampling_tables(image):
+    """
+    Piecewise constant sampling tables of an equirectangular environment map (mapping of miss_environment_mapping),
+    pixels are weighted by luminance * sin(theta) of their row.
+    :param image: (height, width) or (height, width, channels) decoded environment map
+    :return: (height + 1,) marginal cdf over rows, (height, width + 1) conditional cdf over the columns of each row
+    """
+    image = np.nan_to_num(np.asarray(image, dtype=np.float64), posinf=0.0)
+    height, width = image.shape[:2]
+    weight = luminance(image[..., :3]) if image.ndim == 3 else image
+    sin_theta = np.sin((np.arange(height) + 0.5) / height * math.pi)
+    weight = np.maximum(weight, 0) * sin_theta[:, None]
+    row_weight = weight.sum(axis=1)
+
+    # rows without energy are never sampled, uniform columns keep their cdf valid
+    weight[row_weight <= 0] = 1
+    conditional_cdf = np.zeros((height, width + 1), dtype=np.float64)
+    np.cumsum(weight, axis=1, out=conditional_cdf[:, 1:])
+    conditional_cdf /= conditional_cdf[:, -1:]
+    conditional_cdf[:, -1] = 1.0
+
+    marginal_cdf = build_light_cdf(row_weight if row_weight.sum() > 0 else sin_theta)
+    return marginal_cdf, conditional_cdf.astype(np.float32)
+
+
+def envmap_direction(u, v):
+    """
+    Local direction of texture coordinates (inverse of the mapping of miss_environment_mapping).
+    :return: (..., 3) unit directions
+    """
+    phi = np.asarray(u) * 2 * math.pi - math.pi
+    theta = np.asarray(v) * math.pi
+    return np.stack([np.sin(theta) * np.sin(phi), -np.cos(theta), -np.sin(theta) * np.cos(phi)], axis=-1)
+
+
+def envmap_pdf(marginal_cdf, conditional_cdf, u, v):
+    """
+    CPU reference of pdf_light_envmap : solid angle pdf of texture coordinates.
+    """
+    height, width = conditional_cdf.shape[0], conditional_cdf.shape[1] - 1
+    row = np.clip((np.asarray(v) * height).astype(np.int64), 0, height - 1)
+    col = np.clip((np.asarray(u) * width).astype(np.int64), 0, width - 1)
+    row_pmf = marginal_cdf[row + 1] - marginal_cdf[row]
+    col_pmf = conditional_cdf[row, col + 1] - conditional_cdf[row, col]
+    sin_theta = np.sin(np.asarray(v) * math.pi)
+    return np.where(sin_theta > 0, row_pmf * col_pmf * width * height / (2 * math.pi * math.pi * np.maximum(sin_theta, 1e-12)), 0.0)
+
+
+def sample_envmap(marginal_cdf, conditional_cdf, u1, u2):
+    """
+    CPU reference of sample_light_envmap.
+    :param u1: uniform random numbers selecting the row
+    :param u2: uniform random numbers selecting the column
+    :return: u, v texture coordinates, solid angle pdf
+    """
+    height, width = conditional_cdf.shape[0], conditional_cdf.shape[1] - 1
+    u1 = np.asarray(u1, dtype=np.float32)
+    u2 = np.asarray(u2, dtype=np.float32)
+    row, row_pmf = sample_cdf(marginal_cdf, u1)
+    row_cdf = conditional_cdf[row]
+    col = np.clip((row_cdf <= u2[:, None]).sum(axis=1) - 1, 0, width - 1)
+    col_pmf = row_cdf[np.arange(row.shape[0]), col + 1] - row_cdf[np.arange(row.shape[0]), col]
+    # position inside the selected pixel
+    dv = (u1 - marginal_cdf[row]) / row_pmf
+    du = (u2 - row_cdf[np.arange(row.shape[0]), col]) / col_pmf
+    u = (col + du) / width
+    v = (row + dv) / height
+    return u, v, envmap_pdf(marginal_cdf, conditional_cdf, u, v)
@@ -1,7 +1,6 @@
 import re
 import numpy as np
 from utils.image_utils import load_exr_image
-from PIL import Image
 from pyoptix import TextureSampler, Buffer
 from core.utils.math_utils import srgb_to_linear
 from utils.logging_utils import load_logger
@@ -32,7 +31,11 @@ def str2_4by4mat(s):
 texture_load_logger = load_logger("Texture Loader")
 
 
-def load_texture_sampler(folder_path, texture_name, gamma=-1):
+def load_texture_image(folder_path, texture_name, gamma=-1):
+    """
+    Decode texture file, converted to linear color space unless gamma is 1.
+    :return: (height, width, channels) array
+    """
     full_path = folder_path + "/" + texture_name
     if texture_name.endswith(".exr"):
         image = load_exr_image(full_path)
@@ -41,6 +44,7 @@ def load_texture_sampler(folder_path, texture_name, gamma=-1):
     elif texture_name.endswith(".hdr"):
         image = load_exr_image(full_path, True)
     else:
+        from PIL import Image
         image = Image.open(folder_path + "/" + texture_name).convert('RGBA')
 
     image_np = np.asarray(image)
@@ -55,7 +59,10 @@ def load_texture_sampler(folder_path, texture_name, gamma=-1):
             return image_rgb
         image_np = np.array(image)
         image_np[:,:,0:3] = def_apply_gamma_rgb(image_np[:,:,0:3])
+    return image_np
+
 
+def create_texture_sampler(image_np):
     tex_buffer = Buffer.from_array(image_np, buffer_type='i', drop_last_dim=True)
 
     tex_sampler = TextureSampler(tex_buffer,
@@ -64,3 +71,7 @@ def load_texture_sampler(folder_path, texture_name, gamma=-1):
                                  read_mode='normalized_float',
                                  filter_mode='linear')
     return tex_sampler
+
+
+def load_texture_sampler(folder_path, texture_name, gamma=-1):
+    return create_texture_sampler(load_texture_image(folder_path, texture_name, gamma))
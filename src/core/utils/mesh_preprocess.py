@@ -0,0 +1,189 @@
+import time
+import numpy as np
+from utils.logging_utils import load_logger
+
+mesh_preprocess_logger = load_logger("Mesh preprocess")
+
+DEFAULT_MESH_PREPROCESS = {
+    "weld": True,
+    "weld_tolerance": 0.0,
+    "remove_degenerates": True,
+    "degenerate_area_epsilon": 0.0,
+    "generate_normals": True,
+    "reorder": True
+}
+
+
+def weld_vertices(vertices, normals, texcoords, indices, tolerance=0.0):
+    """
+    Merge vertices whose positions are coincident within tolerance and whose attributes are identical.
+    Positions are snapped to a grid of cell size tolerance, so this is exact only up to the grid.
+    :param tolerance: weld tolerance in world unit (0 merges only exactly identical positions)
+    :return: welded vertices, normals, texcoords and indices
+    """
+    if vertices.shape[0] == 0:
+        return vertices, normals, texcoords, indices
+    if tolerance > 0:
+        keys = [np.floor(vertices / tolerance + 0.5)]
+    else:
+        keys = [vertices.astype(np.float64)]
+    if normals is not None:
+        keys.append(normals)
+    if texcoords is not None:
+        keys.append(texcoords)
+    keys = np.concatenate(keys, axis=1)
+
+    _, first_index, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    # keep first-use order of vertices
+    order = np.argsort(first_index, kind='stable')
+    rank = np.empty_like(order)
+    rank[order] = np.arange(order.shape[0])
+    representative = first_index[order]
+
+    vertices = vertices[representative]
+    normals = None if normals is None else normals[representative]
+    texcoords = None if texcoords is None else texcoords[representative]
+    indices = rank[inverse][indices].astype(np.int32)
+    return vertices, normals, texcoords, indices
+
+
+def remove_degenerate_triangles(vertices, indices, area_epsilon=0.0):
+    """
+    Remove triangles with repeated indices or (near) zero area.
+    :param area_epsilon: triangles with area less or equal to this are removed
+    :return: remaining indices
+    """
+    repeated = (indices[:, 0] == indices[:, 1]) | (indices[:, 1] == indices[:, 2]) | (indices[:, 2] == indices[:, 0])
+    areas = triangle_areas(vertices, indices)
+    return indices[~repeated & (areas > area_epsilon)]
+
+
+def triangle_areas(vertices, indices):
+    """
+    Area of each triangle.
+    :return: (n_triangles,) areas
+    """
+    p0 = vertices[indices[:, 0]].astype(np.float64)
+    p1 = vertices[indices[:, 1]].astype(np.float64)
+    p2 = vertices[indices[:, 2]].astype(np.float64)
+    return 0.5 * np.linalg.norm(np.cross(p1 - p0, p2 - p0), axis=1)
+
+
+def compute_vertex_normals(vertices, indices):
+    """
+    Area-weighted vertex normals. Unnormalized face normal has length of twice the face area.
+    :return: (n_vertices, 3) unit vertex normals
+    """
+    p0 = vertices[indices[:, 0]].astype(np.float64)
+    p1 = vertices[indices[:, 1]].astype(np.float64)
+    p2 = vertices[indices[:, 2]].astype(np.float64)
+    face_normals = np.cross(p1 - p0, p2 - p0)
+
+    normals = np.zeros((vertices.shape[0], 3), dtype=np.float64)
+    for k in range(3):
+        np.add.at(normals, indices[:, k], face_normals)
+    norm = np.linalg.norm(normals, axis=1)
+    valid = norm > 0
+    normals[valid] /= norm[valid, None]
+    normals[~valid] = np.array([0, 0, 1])
+    return normals.astype(np.float32)
+
+
+def _part1by2(x):
+    # spread lower 21 bits so that there are two zero bits between each bit
+    x = x.astype(np.uint64) & np.uint64(0x1fffff)
+    x = (x | (x << np.uint64(32))) & np.uint64(0x1f00000000ffff)
+    x = (x | (x << np.uint64(16))) & np.uint64(0x1f0000ff0000ff)
+    x = (x | (x << np.uint64(8))) & np.uint64(0x100f00f00f00f00f)
+    x = (x | (x << np.uint64(4))) & np.uint64(0x10c30c30c30c30c3)
+    x = (x | (x << np.uint64(2))) & np.uint64(0x1249249249249249)
+    return x
+
+
+def morton_codes(points, bbox_min=None, bbox_max=None):
+    """
+    63 bit Morton codes of points quantized inside the bounding box.
+    :return: (n,) uint64 codes
+    """
+    if bbox_min is None:
+        bbox_min = np.amin(points, 0)
+    if bbox_max is None:
+        bbox_max = np.amax(points, 0)
+    extent = np.maximum(bbox_max - bbox_min, 1e-20)
+    quantized = np.clip((points - bbox_min) / extent * 2097151.0, 0, 2097151).astype(np.uint64)
+    return _part1by2(quantized[:, 0]) | (_part1by2(quantized[:, 1]) << np.uint64(1)) | \
+        (_part1by2(quantized[:, 2]) << np.uint64(2))
+
+
+def reorder_morton(vertices, normals, texcoords, indices):
+    """
+    Sort triangles along Morton curve of their centroids, then renumber vertices in first-use order.
+    :return: reordered vertices, normals, texcoords and indices
+    """
+    if indices.shape[0] == 0:
+        return vertices, normals, texcoords, indices
+    centroids = vertices[indices].mean(axis=1)
+    triangle_order = np.argsort(morton_codes(centroids), kind='stable')
+    indices = indices[triangle_order]
+
+    flat = indices.reshape(-1)
+    used, first_use = np.unique(flat, return_index=True)
+    vertex_order = used[np.argsort(first_use, kind='stable')]
+    remap = np.full(vertices.shape[0], -1, dtype=np.int64)
+    remap[vertex_order] = np.arange(vertex_order.shape[0])
+
+    vertices = vertices[vertex_order]
+    normals = None if normals is None else normals[vertex_order]
+    texcoords = None if texcoords is None else texcoords[vertex_order]
+    indices = remap[indices].astype(np.int32)
+    return vertices, normals, texcoords, indices
+
+
+def preprocess_mesh(vertices, normals, texcoords, indices, options=None, name=""):
+    """
+    Run mesh preprocessing pipeline (weld -> remove degenerates -> generate normals -> reorder).
+    Each step can be switched off in options. Timing and counts of each step are logged.
+    :param normals: None if the mesh has no normals
+    :param texcoords: None if the mesh has no texture coordinates
+    :param options: dict overriding DEFAULT_MESH_PREPROCESS
+    :return: vertices, normals, texcoords, indices and list of step reports
+    """
+    options = {**DEFAULT_MESH_PREPROCESS, **(options or {})}
+    reports = []
+
+    def run_step(step_name, function):
+        nonlocal vertices, normals, texcoords, indices
+        n_vertices, n_triangles = vertices.shape[0], indices.shape[0]
+        start_time = time.time()
+        vertices, normals, texcoords, indices = function()
+        report = {
+            "step": step_name,
+            "time": time.time() - start_time,
+            "vertices_before": n_vertices,
+            "vertices_after": vertices.shape[0],
+            "triangles_before": n_triangles,
+            "triangles_after": indices.shape[0]
+        }
+        reports.append(report)
+        mesh_preprocess_logger.info("%s [%s] vertices %d -> %d, triangles %d -> %d in %.3f ms" % (
+            name, step_name, n_vertices, report["vertices_after"], n_triangles, report["triangles_after"],
+            report["time"] * 1000
+        ))
+
+    if options["weld"]:
+        run_step("weld", lambda: weld_vertices(vertices, normals, texcoords, indices, options["weld_tolerance"]))
+    if options["remove_degenerates"]:
+        run_step("remove_degenerates", lambda: (
+            vertices, normals, texcoords,
+            remove_degenerate_triangles(vertices, indices, options["degenerate_area_epsilon"])
+        ))
+    if options["generate_normals"] and normals is None:
+        run_step("generate_normals", lambda: (
+            vertices, compute_vertex_normals(vertices, indices), texcoords, indices
+        ))
+    if options["reorder"]:
+        run_step("reorder", lambda: reorder_morton(vertices, normals, texcoords, indices))
+
+    return vertices, normals, texcoords, indices, reports
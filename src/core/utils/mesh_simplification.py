@@ -0,0 +1,362 @@
+import numpy as np
+from utils.logging_utils import load_logger
+
+mesh_simplification_logger = load_logger("Mesh simplification")
+
+
+def compute_face_planes(vertices, indices):
+    """
+    Compute plane equation (a, b, c, d) of each triangle with unit normal.
+    :param vertices: (n_vertices, 3) vertex positions
+    :param indices: (n_triangles, 3) triangle indices
+    :return: (n_triangles, 4) plane equations and (n_triangles,) validity mask
+    """
+    p0 = vertices[indices[:, 0]]
+    p1 = vertices[indices[:, 1]]
+    p2 = vertices[indices[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    norm = np.linalg.norm(normals, axis=1)
+    valid = norm > 0
+    normals[valid] /= norm[valid, None]
+    planes = np.empty((indices.shape[0], 4), dtype=np.float64)
+    planes[:, 0:3] = normals
+    planes[:, 3] = -np.einsum('ij,ij->i', normals, p0)
+    return planes, valid
+
+
+def get_unique_edges(indices, n_vertices):
+    """
+    Extract undirected edges of a triangle mesh.
+    :param indices: (n_triangles, 3) triangle indices
+    :param n_vertices: number of vertices
+    :return: (n_edges, 2) sorted edge vertex pairs and (n_edges,) number of adjacent faces
+    """
+    edges = np.concatenate([indices[:, [0, 1]], indices[:, [1, 2]], indices[:, [2, 0]]], axis=0)
+    edges.sort(axis=1)
+    keys = edges[:, 0].astype(np.int64) * n_vertices + edges[:, 1]
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    unique_edges = np.stack([unique_keys // n_vertices, unique_keys % n_vertices], axis=1)
+    return unique_edges, counts
+
+
+def compute_vertex_quadrics(vertices, indices, boundary_weight=100.0):
+    """
+    Accumulate fundamental error quadrics of adjacent planes per vertex (Garland & Heckbert).
+    Boundary edges get an additional perpendicular plane so that open borders are not eroded.
+    :param vertices: (n_vertices, 3) vertex positions
+    :param indices: (n_triangles, 3) triangle indices
+    :param boundary_weight: weight of boundary constraint planes
+    :return: (n_vertices, 4, 4) quadrics
+    """
+    n_vertices = vertices.shape[0]
+    planes, valid = compute_face_planes(vertices, indices)
+    planes = planes[valid]
+    valid_indices = indices[valid]
+
+    face_quadrics = planes[:, :, None] * planes[:, None, :]
+    quadrics = np.zeros((n_vertices, 4, 4), dtype=np.float64)
+    for k in range(3):
+        np.add.at(quadrics, valid_indices[:, k], face_quadrics)
+
+    if boundary_weight > 0 and valid_indices.shape[0] > 0:
+        # directed edges of each face, boundary edges appear only once
+        directed = np.concatenate([valid_indices[:, [0, 1]], valid_indices[:, [1, 2]], valid_indices[:, [2, 0]]], axis=0)
+        face_normals = np.tile(planes[:, 0:3], (3, 1))
+        sorted_edges = np.sort(directed, axis=1)
+        keys = sorted_edges[:, 0].astype(np.int64) * n_vertices + sorted_edges[:, 1]
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        is_boundary = counts[inverse] == 1
+        if np.any(is_boundary):
+            a = vertices[directed[is_boundary, 0]]
+            b = vertices[directed[is_boundary, 1]]
+            edge_normals = np.cross(b - a, face_normals[is_boundary])
+            norm = np.linalg.norm(edge_normals, axis=1)
+            ok = norm > 0
+            edge_normals = edge_normals[ok] / norm[ok, None]
+            edge_planes = np.empty((edge_normals.shape[0], 4), dtype=np.float64)
+            edge_planes[:, 0:3] = edge_normals
+            edge_planes[:, 3] = -np.einsum('ij,ij->i', edge_normals, a[ok])
+            edge_quadrics = boundary_weight * edge_planes[:, :, None] * edge_planes[:, None, :]
+            boundary_directed = directed[is_boundary][ok]
+            np.add.at(quadrics, boundary_directed[:, 0], edge_quadrics)
+            np.add.at(quadrics, boundary_directed[:, 1], edge_quadrics)
+
+    return quadrics
+
+
+def _evaluate_quadrics(quadrics, positions):
+    homogeneous = np.concatenate([positions, np.ones((positions.shape[0], 1))], axis=1)
+    return np.einsum('ni,nij,nj->n', homogeneous, quadrics, homogeneous)
+
+
+def _edge_collapse_candidates(vertices, quadrics, edges):
+    """
+    Choose collapse position of each edge among two end points and the midpoint.
+    :return: (n_edges,) cost, (n_edges, 3) new position
+    """
+    edge_quadrics = quadrics[edges[:, 0]] + quadrics[edges[:, 1]]
+    v0 = vertices[edges[:, 0]]
+    v1 = vertices[edges[:, 1]]
+    candidates = np.stack([v0, v1, 0.5 * (v0 + v1)], axis=1)
+    costs = np.stack([_evaluate_quadrics(edge_quadrics, candidates[:, k]) for k in range(3)], axis=1)
+    best = np.argmin(costs, axis=1)
+    arange = np.arange(edges.shape[0])
+    cost = np.maximum(costs[arange, best], 0)
+    return cost, candidates[arange, best]
+
+
+def _select_independent_edges(edges, cost, n_vertices):
+    """
+    Select set of edges that do not share vertices.
+    Each vertex votes for its cheapest incident edge, edges voted by both end points are selected.
+    """
+    rank = np.empty(edges.shape[0], dtype=np.int64)
+    rank[np.argsort(cost, kind='stable')] = np.arange(edges.shape[0])
+    best_rank = np.full(n_vertices, edges.shape[0], dtype=np.int64)
+    np.minimum.at(best_rank, edges[:, 0], rank)
+    np.minimum.at(best_rank, edges[:, 1], rank)
+    selected = (best_rank[edges[:, 0]] == rank) & (best_rank[edges[:, 1]] == rank)
+    return np.nonzero(selected)[0]
+
+
+def _apply_collapses(vertices, indices, edges, positions):
+    remap = np.arange(vertices.shape[0])
+    remap[edges[:, 1]] = edges[:, 0]
+    new_vertices = vertices.copy()
+    new_vertices[edges[:, 0]] = positions
+    new_indices = remap[indices]
+    return new_vertices, new_indices
+
+
+def _find_flipped_collapses(vertices, indices, new_vertices, new_indices, edges):
+    """
+    Find collapses that flip orientation of any surviving triangle.
+    :return: boolean mask over edges
+    """
+    alive = (new_indices[:, 0] != new_indices[:, 1]) & \
+            (new_indices[:, 1] != new_indices[:, 2]) & \
+            (new_indices[:, 2] != new_indices[:, 0])
+    changed = alive & np.any(new_indices != indices, axis=1)
+    changed |= alive & np.any(np.isin(indices, edges[:, 0]), axis=1)
+    if not np.any(changed):
+        return np.zeros(edges.shape[0], dtype=bool)
+
+    old_planes, _ = compute_face_planes(vertices, indices[changed])
+    new_planes, new_valid = compute_face_planes(new_vertices, new_indices[changed])
+    flipped = (np.einsum('ij,ij->i', old_planes[:, 0:3], new_planes[:, 0:3]) < 0.2) | ~new_valid
+    if not np.any(flipped):
+        return np.zeros(edges.shape[0], dtype=bool)
+
+    flipped_vertices = np.unique(new_indices[changed][flipped])
+    return np.isin(edges[:, 0], flipped_vertices)
+
+
+def compact_mesh(vertices, indices):
+    """
+    Remove unreferenced vertices.
+    :return: compacted vertices, remapped indices and original index of each remaining vertex
+    """
+    used = np.unique(indices)
+    remap = np.full(vertices.shape[0], -1, dtype=np.int64)
+    remap[used] = np.arange(used.shape[0])
+    return vertices[used], remap[indices], used
+
+
+def simplify_mesh(vertices, indices, target_triangles=None, max_error=None, max_iterations=1000, boundary_weight=100.0):
+    """
+    Quadric edge-collapse simplification.
+    Collapses are performed in batches of independent edges, so each iteration is fully vectorized.
+    :param vertices: (n_vertices, 3) vertex positions
+    :param indices: (n_triangles, 3) triangle indices
+    :param target_triangles: stop when the triangle count reaches this value
+    :param max_error: maximum allowed quadric error (as distance) of a single collapse
+    :param max_iterations: maximum number of collapse batches
+    :param boundary_weight: weight of boundary preserving quadrics
+    :return: simplified vertices, simplified indices, original vertex index of each simplified vertex
+    """
+    if target_triangles is None and max_error is None:
+        return vertices, indices, np.arange(vertices.shape[0])
+
+    original_dtype = vertices.dtype
+    target_triangles = 0 if target_triangles is None else int(target_triangles)
+    max_cost = np.inf if max_error is None else float(max_error) ** 2
+
+    vertices = np.asarray(vertices, dtype=np.float64)
+    indices = np.asarray(indices, dtype=np.int64)
+    n_vertices = vertices.shape[0]
+    quadrics = compute_vertex_quadrics(vertices, indices, boundary_weight)
+
+    for _ in range(max_iterations):
+        n_triangles = indices.shape[0]
+        if n_triangles <= target_triangles:
+            break
+
+        edges, _ = get_unique_edges(indices, n_vertices)
+        cost, positions = _edge_collapse_candidates(vertices, quadrics, edges)
+        allowed = cost <= max_cost
+        if not np.any(allowed):
+            break
+        edges, cost, positions = edges[allowed], cost[allowed], positions[allowed]
+
+        # each collapse removes about two triangles
+        n_needed = max((n_triangles - target_triangles + 1) // 2, 1)
+        candidate = np.ones(edges.shape[0], dtype=bool)
+        selected = np.zeros(0, dtype=np.int64)
+        for _ in range(8):
+            candidate_ids = np.nonzero(candidate)[0]
+            if candidate_ids.shape[0] == 0:
+                break
+            selected = candidate_ids[_select_independent_edges(edges[candidate_ids], cost[candidate_ids], n_vertices)]
+            selected = selected[np.argsort(cost[selected], kind='stable')[:n_needed]]
+            new_vertices, new_indices = _apply_collapses(vertices, indices, edges[selected], positions[selected])
+            flipped = _find_flipped_collapses(vertices, indices, new_vertices, new_indices, edges[selected])
+            if not np.any(flipped):
+                break
+            # drop collapses that flip faces and select again among remaining edges
+            candidate[selected[flipped]] = False
+            selected = selected[~flipped]
+        if selected.shape[0] == 0:
+            break
+
+        collapsed = edges[selected]
+        vertices, new_indices = _apply_collapses(vertices, indices, collapsed, positions[selected])
+        quadrics[collapsed[:, 0]] += quadrics[collapsed[:, 1]]
+
+        non_degenerate = (new_indices[:, 0] != new_indices[:, 1]) & \
+                         (new_indices[:, 1] != new_indices[:, 2]) & \
+                         (new_indices[:, 2] != new_indices[:, 0])
+        indices = new_indices[non_degenerate]
+
+    vertices, indices, vertex_map = compact_mesh(vertices, indices)
+    return vertices.astype(original_dtype), indices.astype(np.int32), vertex_map
+
+
+def point_triangle_distance(points, a, b, c):
+    """
+    Distance from points to triangles (row-wise), closest point computation from Ericson's Real-Time Collision Detection.
+    :param points: (n, 3) query points
+    :param a: (n, 3) first triangle vertices
+    :param b: (n, 3) second triangle vertices
+    :param c: (n, 3) third triangle vertices
+    :return: (n,) distances
+    """
+    def dot(x, y):
+        return np.einsum('ij,ij->i', x, y)
+
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    d1 = dot(ab, ap)
+    d2 = dot(ac, ap)
+    bp = points - b
+    d3 = dot(ab, bp)
+    d4 = dot(ac, bp)
+    cp = points - c
+    d5 = dot(ab, cp)
+    d6 = dot(ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = va + vb + vc
+        v = np.where(denom != 0, vb / denom, 0)
+        w = np.where(denom != 0, vc / denom, 0)
+        closest = a + ab * v[:, None] + ac * w[:, None]
+
+        # edge regions
+        t_ab = np.where(d1 - d3 != 0, d1 / (d1 - d3), 0)
+        on_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        closest[on_ab] = (a + ab * t_ab[:, None])[on_ab]
+        t_ac = np.where(d2 - d6 != 0, d2 / (d2 - d6), 0)
+        on_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        closest[on_ac] = (a + ac * t_ac[:, None])[on_ac]
+        t_bc = np.where((d4 - d3) + (d5 - d6) != 0, (d4 - d3) / ((d4 - d3) + (d5 - d6)), 0)
+        on_bc = (va <= 0) & ((d4 - d3) >= 0) & ((d5 - d6) >= 0)
+        closest[on_bc] = (b + (c - b) * t_bc[:, None])[on_bc]
+
+    # vertex regions
+    on_a = (d1 <= 0) & (d2 <= 0)
+    closest[on_a] = a[on_a]
+    on_b = (d3 >= 0) & (d4 <= d3)
+    closest[on_b] = b[on_b]
+    on_c = (d6 >= 0) & (d5 <= d6)
+    closest[on_c] = c[on_c]
+
+    return np.linalg.norm(points - closest, axis=1)
+
+
+def point_mesh_distance(points, vertices, indices, k=8, chunk_size=65536):
+    """
+    Approximate distance from points to a triangle mesh.
+    Exact point-triangle distance is evaluated against the k triangles with nearest centroids.
+    :param points: (n, 3) query points
+    :param vertices: (n_vertices, 3) mesh vertices
+    :param indices: (n_triangles, 3) mesh triangle indices
+    :param k: number of candidate triangles per point
+    :param chunk_size: number of points processed at once
+    :return: (n,) distances
+    """
+    from scipy.spatial import cKDTree
+    points = np.asarray(points, dtype=np.float64)
+    vertices = np.asarray(vertices, dtype=np.float64)
+    k = min(k, indices.shape[0])
+    triangles = vertices[indices]
+    tree = cKDTree(triangles.mean(axis=1))
+    distances = np.empty(points.shape[0], dtype=np.float64)
+    for start in range(0, points.shape[0], chunk_size):
+        chunk = points[start:start + chunk_size]
+        _, candidates = tree.query(chunk, k=k)
+        candidates = candidates.reshape(chunk.shape[0], k)
+        repeated = np.repeat(chunk, k, axis=0)
+        flat = candidates.reshape(-1)
+        d = point_triangle_distance(repeated, triangles[flat, 0], triangles[flat, 1], triangles[flat, 2])
+        distances[start:start + chunk_size] = d.reshape(chunk.shape[0], k).min(axis=1)
+    return distances
+
+
+def hausdorff_distance(vertices_a, indices_a, vertices_b, indices_b):
+    """
+    Symmetric Hausdorff distance between two meshes, sampled at the vertices of each mesh.
+    :return: Hausdorff distance
+    """
+    if indices_a.shape[0] == 0 or indices_b.shape[0] == 0:
+        return float('inf')
+    distance_ab = point_mesh_distance(vertices_a, vertices_b, indices_b)
+    distance_ba = point_mesh_distance(vertices_b, vertices_a, indices_a)
+    return float(max(np.max(distance_ab, initial=0), np.max(distance_ba, initial=0)))
+
+
+def weld_positions(vertices, indices):
+    """
+    Merge vertices with exactly identical positions so that the mesh topology is connected.
+    :return: welded vertices, remapped indices and representative original vertex of each welded vertex
+    """
+    _, first_index, inverse = np.unique(vertices, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    return vertices[first_index], inverse[indices], first_index
+
+
+def simplify_mesh_with_report(vertices, indices, target_triangles=None, max_error=None, name=""):
+    """
+    Simplify mesh and log triangle count before / after with Hausdorff error.
+    :return: simplified vertices, indices, original vertex index of each simplified vertex and report dict
+    """
+    welded_vertices, welded_indices, welded_map = weld_positions(vertices, indices)
+    new_vertices, new_indices, vertex_map = simplify_mesh(
+        welded_vertices, welded_indices, target_triangles=target_triangles, max_error=max_error
+    )
+    report = {
+        "name": name,
+        "triangles_before": int(indices.shape[0]),
+        "triangles_after": int(new_indices.shape[0]),
+        "vertices_before": int(vertices.shape[0]),
+        "vertices_after": int(new_vertices.shape[0]),
+        "hausdorff_error": hausdorff_distance(vertices, indices, new_vertices, new_indices)
+    }
+    mesh_simplification_logger.info(
+        "%s : triangles %d -> %d, Hausdorff error %e" %
+        (name, report["triangles_before"], report["triangles_after"], report["hausdorff_error"])
+    )
+    return new_vertices, new_indices, welded_map[vertex_map], report
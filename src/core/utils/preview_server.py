@@ -0,0 +1,186 @@
+import io
+import json
+import queue
+import threading
+import time
+import numpy as np
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+from core.utils.math_utils import ToneMap, LinearToSrgb
+from utils.logging_utils import load_logger
+
+preview_logger = load_logger("Preview server")
+
+PREVIEW_PAGE = b"""<!DOCTYPE html>
+<html><head><title>Transient preview</title></head>
+<body style="font-family:sans-serif">
+<div id="status"></div>
+<img id="image" style="image-rendering:pixelated;width:512px"><br>
+<canvas id="histogram" width="1024" height="256"></canvas>
+<script>
+function refresh() {
+	fetch("status.json").then(r => r.json()).then(s => {
+		document.getElementById("status").textContent =
+			"samples " + s.completed_samples + " / " + s.spp + ", pass " + s.n_pass + ", snapshot " + s.snapshot_index;
+		if (s.snapshot_index > 0) document.getElementById("image").src = "image.png?" + s.snapshot_index;
+	});
+	fetch("histogram.json").then(r => r.json()).then(h => {
+		const canvas = document.getElementById("histogram"), ctx = canvas.getContext("2d");
+		ctx.clearRect(0, 0, canvas.width, canvas.height);
+		if (!h.columns) return;
+		let peak = 1e-30;
+		h.columns.forEach(c => c.forEach(v => peak = Math.max(peak, v)));
+		h.columns.forEach((c, k) => {
+			ctx.strokeStyle = "hsl(" + (360 * k / h.columns.length) + ",80%,40%)";
+			ctx.beginPath();
+			c.forEach((v, i) => ctx.lineTo(i / c.length * canvas.width, canvas.height * (1 - v / peak)));
+			ctx.stroke();
+		});
+	});
+}
+setInterval(refresh, 1000);
+refresh();
+</script>
+</body></html>
+"""
+
+
+def downsample_image(image, max_size):
+	"""
+	Box filter image so that the longer side is at most max_size.
+	"""
+	factor = int(np.ceil(max(image.shape[0], image.shape[1]) / max_size))
+	if factor <= 1:
+		return image
+	height = image.shape[0] // factor * factor
+	width = image.shape[1] // factor * factor
+	image = image[:height, :width]
+	return image.reshape(height // factor, factor, width // factor, factor, -1).mean(axis=(1, 3))
+
+
+def downsample_histogram(histogram, max_bins):
+	"""
+	Sum neighboring bins so that there are at most max_bins bins (axis 0).
+	"""
+	factor = int(np.ceil(histogram.shape[0] / max_bins))
+	if factor <= 1:
+		return histogram
+	n_bins = int(np.ceil(histogram.shape[0] / factor)) * factor
+	padded = np.zeros((n_bins,) + histogram.shape[1:], dtype=histogram.dtype)
+	padded[:histogram.shape[0]] = histogram
+	return padded.reshape((n_bins // factor, factor) + histogram.shape[1:]).sum(axis=1)
+
+
+class PreviewServer:
+	"""
+	Headless preview of a progressive render served over HTTP on localhost.
+	The render loop hands raw snapshots to a bounded queue (dropping old ones when full), a worker thread
+	encodes them once, and HTTP clients only read the encoded result, so the number of clients
+	does not affect rendering.
+	"""
+	def __init__(self, port=8765, host="127.0.0.1", interval_sec=1.0, max_image_size=256, max_bins=1024):
+		self.interval_sec = interval_sec
+		self.max_image_size = max_image_size
+		self.max_bins = max_bins
+		self.last_submit_time = 0.0
+
+		self.snapshot_queue = queue.Queue(maxsize=1)
+		self.lock = threading.Lock()
+		self.encoded = {
+			"image.png": b"",
+			"histogram.json": b"{}",
+			"status.json": json.dumps({"completed_samples": 0, "spp": 0, "n_pass": 0, "snapshot_index": 0}).encode()
+		}
+		self.snapshot_index = 0
+
+		self.worker = threading.Thread(target=self._encode_loop, daemon=True)
+		self.worker.start()
+
+		self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+		self.httpd.daemon_threads = True
+		self.server_thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+		self.server_thread.start()
+		preview_logger.info("Serving preview at http://%s:%d/" % (host, self.httpd.server_address[1]))
+
+	def _make_handler(self):
+		server = self
+
+		class PreviewRequestHandler(BaseHTTPRequestHandler):
+			def do_GET(self):
+				name = self.path.split("?")[0].lstrip("/") or "index.html"
+				if name == "index.html":
+					body, content_type = PREVIEW_PAGE, "text/html"
+				else:
+					with server.lock:
+						body = server.encoded.get(name, None)
+					content_type = "image/png" if name.endswith(".png") else "application/json"
+				if body is None:
+					self.send_error(404)
+					return
+				self.send_response(200)
+				self.send_header("Content-Type", content_type)
+				self.send_header("Content-Length", str(len(body)))
+				self.send_header("Cache-Control", "no-store")
+				self.end_headers()
+				self.wfile.write(body)
+
+			def log_message(self, format, *args):
+				pass
+
+		return PreviewRequestHandler
+
+	def should_submit(self):
+		"""
+		Whether enough time passed since the last snapshot. Check this before reading buffers back.
+		"""
+		return time.time() - self.last_submit_time >= self.interval_sec
+
+	def submit(self, image, histogram, completed_samples, spp, n_pass):
+		"""
+		Hand a snapshot to the encoder without blocking. Older pending snapshot is replaced.
+		:param image: (height, width, 4) accumulated output buffer
+		:param histogram: (n_bins, n_columns) accumulated histogram
+		"""
+		self.last_submit_time = time.time()
+		snapshot = (image, histogram, completed_samples, spp, n_pass)
+		try:
+			self.snapshot_queue.put_nowait(snapshot)
+		except queue.Full:
+			try:
+				self.snapshot_queue.get_nowait()
+			except queue.Empty:
+				pass
+			try:
+				self.snapshot_queue.put_nowait(snapshot)
+			except queue.Full:
+				pass
+
+	def _encode_loop(self):
+		while True:
+			image, histogram, completed_samples, spp, n_pass = self.snapshot_queue.get()
+			if image is None:
+				return
+			try:
+				hdr_image = downsample_image(image[:, :, 0:3] / max(completed_samples, 1), self.max_image_size)
+				ldr_image = np.clip(LinearToSrgb(ToneMap(hdr_image, 1.5)) * 255, 0, 255).astype(np.uint8)
+				png = io.BytesIO()
+				Image.fromarray(ldr_image).save(png, format="PNG")
+
+				columns = downsample_histogram(histogram / max(completed_samples, 1), self.max_bins)
+				histogram_json = json.dumps({"columns": columns.T.tolist()}).encode()
+
+				with self.lock:
+					self.snapshot_index += 1
+					self.encoded["image.png"] = png.getvalue()
+					self.encoded["histogram.json"] = histogram_json
+					self.encoded["status.json"] = json.dumps({
+						"completed_samples": completed_samples, "spp": spp, "n_pass": n_pass,
+						"snapshot_index": self.snapshot_index
+					}).encode()
+			except Exception:
+				preview_logger.exception("Failed to encode preview snapshot")
+
+	def close(self):
+		self.httpd.shutdown()
+		self.httpd.server_close()
+		self.submit(None, None, 0, 0, 0)
@@ -0,0 +1,378 @@
+import os
+import numpy as np
+
+
+def path_length_to_index(path_length, transient_dist_min, transient_dist_max, transient_bin_num):
+    """
+    CPU reference of path_transient::path_length_to_index.
+    Path lengths outside of the range are clamped to the first / last bin.
+    :param path_length: path length array
+    :return: bin index array (uint32)
+    """
+    path_length = np.asarray(path_length, dtype=np.float32)
+    dist_min = np.float32(transient_dist_min)
+    dist_range = np.float32(transient_dist_max) - dist_min
+    index = (path_length - dist_min) / dist_range * np.float32(transient_bin_num)
+    index = np.clip(np.floor(index), 0, transient_bin_num - 1)
+    return index.astype(np.uint32)
+
+
+def receiver_path_lengths(path_lengths, vertices, receiver_positions):
+    """
+    Total path length when each path vertex is connected to each receiver.
+    :param path_lengths: (n_vertices,) path length from the transmitter to each vertex
+    :param vertices: (n_vertices, 3) path vertex positions
+    :param receiver_positions: (n_receivers, 3) receiver positions
+    :return: (n_vertices, n_receivers) path lengths and connection distances
+    """
+    vertices = np.asarray(vertices, dtype=np.float32)
+    receiver_positions = np.asarray(receiver_positions, dtype=np.float32)
+    distances = np.linalg.norm(vertices[:, None, :] - receiver_positions[None, :, :], axis=2)
+    return np.asarray(path_lengths, dtype=np.float32)[:, None] + distances, distances
+
+
+def accumulate_multi_receiver_histogram(histogram, path_lengths, vertices, depths, contributions,
+                                        receiver_positions, transient_dist_min, transient_dist_max,
+                                        receiver_indices=None):
+    """
+    CPU reference of receiver connection binning in path_transient::path_trace_multi_receiver.
+    Contribution of vertex i is divided by squared distance to the receiver as for point receivers.
+    :param histogram: (n_receivers, transient_bin_num, max_depth) histogram, updated in place
+    :param path_lengths: (n_vertices,) path length from the transmitter to each vertex
+    :param vertices: (n_vertices, 3) path vertex positions
+    :param depths: (n_vertices,) bounce index of each vertex (column of histogram)
+    :param contributions: (n_vertices,) or (n_vertices, n_receivers) luminance of throughput * f * intensity
+    :param receiver_positions: (n_receivers, 3) receiver positions
+    :param receiver_indices: optional (n_vertices, n_samples) sampled receivers, reweighted by n_receivers / n_samples
+    :return: histogram
+    """
+    n_receivers, transient_bin_num, _ = histogram.shape
+    total_lengths, distances = receiver_path_lengths(path_lengths, vertices, receiver_positions)
+    contributions = np.asarray(contributions, dtype=np.float64)
+    if contributions.ndim == 1:
+        contributions = np.repeat(contributions[:, None], n_receivers, axis=1)
+    values = contributions / (distances.astype(np.float64) ** 2)
+
+    n_vertices = total_lengths.shape[0]
+    if receiver_indices is None:
+        receiver_indices = np.broadcast_to(np.arange(n_receivers), (n_vertices, n_receivers))
+        weight = 1.0
+    else:
+        receiver_indices = np.asarray(receiver_indices)
+        weight = n_receivers / receiver_indices.shape[1]
+
+    vertex_indices = np.broadcast_to(np.arange(n_vertices)[:, None], receiver_indices.shape)
+    bins = path_length_to_index(total_lengths[vertex_indices, receiver_indices],
+                                transient_dist_min, transient_dist_max, transient_bin_num)
+    depth_columns = np.broadcast_to(np.asarray(depths)[:, None], receiver_indices.shape)
+    np.add.at(histogram, (receiver_indices, bins, depth_columns),
+              weight * values[vertex_indices, receiver_indices])
+    return histogram
+
+
+def make_bounce_layout(bounce_layout, max_depth):
+    """
+    Mapping from bounce index (column of the full histogram) to column of the stored histogram.
+    Supported layouts
+        "all" : one column per bounce
+        "total" : single column with sum over all bounces
+        [b0, b1, ...] : only the given bounces
+        {"type": "overflow", "k": k} : bounces 0 ... k-1 and a single ">=k" column
+    :param bounce_layout: layout spec
+    :param max_depth: max depth of path tracing (number of bounces)
+    :return: (max_depth,) int32 column map (-1 : discarded) and list of column labels
+    """
+    column_map = np.full(max_depth, -1, dtype=np.int32)
+    if bounce_layout is None or bounce_layout == "all":
+        column_map[:] = np.arange(max_depth)
+        labels = [str(b) for b in range(max_depth)]
+    elif bounce_layout == "total":
+        column_map[:] = 0
+        labels = ["total"]
+    elif isinstance(bounce_layout, (list, tuple)):
+        bounces = [b for b in bounce_layout if 0 <= b < max_depth]
+        column_map[bounces] = np.arange(len(bounces))
+        labels = [str(b) for b in bounces]
+    elif isinstance(bounce_layout, dict) and bounce_layout.get("type") == "overflow":
+        k = min(int(bounce_layout["k"]), max_depth)
+        column_map[:k] = np.arange(k)
+        column_map[k:] = k
+        labels = [str(b) for b in range(k)]
+        if k < max_depth:
+            labels.append(">=%d" % k)
+    else:
+        raise NotImplementedError("Bounce layout %s is not implemented" % str(bounce_layout))
+    return column_map, labels
+
+
+def label_histogram_columns(histogram, labels):
+    """
+    Split histogram by bounce column.
+    :param histogram: (..., n_bins, n_columns) histogram
+    :param labels: column labels from make_bounce_layout
+    :return: dict of label -> (..., n_bins) histogram
+    """
+    return {label: histogram[..., i] for i, label in enumerate(labels)}
+
+
+def point_aabb_distance(points, bbox_min, bbox_max):
+    """
+    Distance from points to axis aligned boxes (0 inside).
+    :param points: (n_points, 3)
+    :param bbox_min: (n_boxes, 3)
+    :param bbox_max: (n_boxes, 3)
+    :return: (n_points, n_boxes) distances
+    """
+    points = points[:, None, :]
+    delta = np.maximum(np.maximum(bbox_min[None] - points, points - bbox_max[None]), 0)
+    return np.linalg.norm(delta, axis=2)
+
+
+def point_aabb_max_distance(points, bbox_min, bbox_max):
+    """
+    Distance from points to the farthest corner of axis aligned boxes.
+    :return: (n_points, n_boxes) distances
+    """
+    points = points[:, None, :]
+    delta = np.maximum(np.abs(bbox_min[None] - points), np.abs(points - bbox_max[None]))
+    return np.linalg.norm(delta, axis=2)
+
+
+def compute_time_window(tx_coords, rx_coords, bbox_min, bbox_max, max_depth, bin_width=None, bin_num=None, margin=0.0):
+    """
+    Tightest path length window that contains every path of a pose, vectorized over a trajectory.
+    Lower bound : shortest single bounce path tx -> shape -> rx, using per shape boxes.
+    Upper bound : farthest first and last vertex + (max_depth - 1) segments bounded by the scene diagonal.
+    :param tx_coords: (n_poses, 3) transmitter positions
+    :param rx_coords: (n_poses, 3) receiver positions
+    :param bbox_min: (n_shapes, 3) minimum corner of each shape bbox
+    :param bbox_max: (n_shapes, 3) maximum corner of each shape bbox
+    :param max_depth: max number of path vertices on surfaces
+    :param bin_width: requested bin width (path length), nBin is derived
+    :param bin_num: requested number of bins if bin_width is not given
+    :param margin: extra path length added to both sides
+    :return: dict of (n_poses,) arrays transient_dist_min, transient_dist_max, transient_bin_num
+    """
+    tx_coords = np.atleast_2d(np.asarray(tx_coords, dtype=np.float64))
+    rx_coords = np.atleast_2d(np.asarray(rx_coords, dtype=np.float64))
+    bbox_min = np.atleast_2d(np.asarray(bbox_min, dtype=np.float64))
+    bbox_max = np.atleast_2d(np.asarray(bbox_max, dtype=np.float64))
+
+    lower = np.min(point_aabb_distance(tx_coords, bbox_min, bbox_max) +
+                   point_aabb_distance(rx_coords, bbox_min, bbox_max), axis=1)
+
+    scene_diagonal = np.linalg.norm(np.amax(bbox_max, 0) - np.amin(bbox_min, 0))
+    upper = np.max(point_aabb_max_distance(tx_coords, bbox_min, bbox_max), axis=1) + \
+        np.max(point_aabb_max_distance(rx_coords, bbox_min, bbox_max), axis=1) + \
+        max(max_depth - 1, 0) * scene_diagonal
+
+    lower = np.maximum(lower - margin, 0)
+    upper = upper + margin
+
+    if bin_width is not None:
+        bin_num = np.maximum(np.ceil((upper - lower) / bin_width), 1).astype(np.int64)
+        upper = lower + bin_num * bin_width
+    else:
+        bin_num = np.full(lower.shape, bin_num, dtype=np.int64)
+
+    return {
+        "transient_dist_min": lower,
+        "transient_dist_max": upper,
+        "transient_bin_num": bin_num
+    }
+
+
+def merge_time_windows(window, bin_width=None):
+    """
+    Single window covering every pose of a compute_time_window result.
+    :param window: dict of (n_poses,) transient_dist_min, transient_dist_max, transient_bin_num
+    :param bin_width: bin width given to compute_time_window, None keeps the largest transient_bin_num
+    :return: dict of float transient_dist_min, transient_dist_max and int transient_bin_num
+    """
+    lower = np.atleast_1d(window["transient_dist_min"])
+    upper = np.atleast_1d(window["transient_dist_max"])
+    bin_num = np.atleast_1d(window["transient_bin_num"])
+    if lower.shape[0] == 1:
+        return {
+            "transient_dist_min": float(lower[0]),
+            "transient_dist_max": float(upper[0]),
+            "transient_bin_num": int(bin_num[0])
+        }
+    merged_lower = float(np.min(lower))
+    merged_upper = float(np.max(upper))
+    if bin_width is not None:
+        # every pose window is a whole number of bins from its own lower bound, the union has to be rounded again
+        merged_bin_num = max(int(np.ceil((merged_upper - merged_lower) / bin_width - 1e-9)), 1)
+        merged_upper = merged_lower + merged_bin_num * bin_width
+    else:
+        merged_bin_num = int(np.max(bin_num))
+    return {
+        "transient_dist_min": merged_lower,
+        "transient_dist_max": merged_upper,
+        "transient_bin_num": merged_bin_num
+    }
+
+
+def make_bin_edges(transient_binning, transient_dist_min, transient_dist_max, transient_bin_num=None):
+    """
+    Bin edges of (possibly non-uniform) transient binning.
+    Supported specs
+        {"type": "uniform"} : transient_bin_num bins of equal width
+        {"type": "piecewise", "segments": [{"end": d0, "width": w0}, {"end": d1, "width": w1}, ...]}
+            : bins of width w_i up to path length d_i, last segment ends at transient_dist_max
+        {"type": "log", "nBin": n, "scale": s}
+            : n bins whose width grows logarithmically, s (default 1/1000 of the range) is the
+              path length after transient_dist_min where spacing changes from linear to log
+    :return: (n_bins + 1,) increasing bin edges
+    """
+    binning_type = transient_binning.get("type", "uniform")
+    dist_range = transient_dist_max - transient_dist_min
+    if binning_type == "uniform":
+        bin_num = transient_binning.get("nBin", transient_bin_num)
+        edges = np.linspace(transient_dist_min, transient_dist_max, bin_num + 1)
+    elif binning_type == "piecewise":
+        edges = [np.array([transient_dist_min])]
+        start = transient_dist_min
+        segments = transient_binning["segments"]
+        for i, segment in enumerate(segments):
+            end = transient_dist_max if i == len(segments) - 1 else min(segment["end"], transient_dist_max)
+            if end <= start:
+                continue
+            n = max(int(np.ceil((end - start) / segment["width"] - 1e-9)), 1)
+            edges.append(np.linspace(start, end, n + 1)[1:])
+            start = end
+        edges = np.concatenate(edges)
+    elif binning_type == "log":
+        bin_num = transient_binning.get("nBin", transient_bin_num)
+        scale = transient_binning.get("scale", dist_range / 1000.0)
+        edges = transient_dist_min + scale * np.expm1(np.linspace(0, np.log1p(dist_range / scale), bin_num + 1))
+        edges[-1] = transient_dist_max
+    else:
+        raise NotImplementedError("Transient binning type %s is not implemented" % binning_type)
+    return edges.astype(np.float64)
+
+
+def bin_edges_file_name(output_file_name):
+    """
+    Bin edges file saved next to a histogram : <output_file_name>_bin_edges.npy (.npy of the histogram removed).
+    """
+    root, extension = os.path.splitext(output_file_name)
+    return "%s_bin_edges.npy" % (root if extension == ".npy" else output_file_name)
+
+
+def load_bin_edges(output_file_name, transient_dist_min, transient_dist_max, transient_bin_num):
+    """
+    Bin edges of a saved histogram. Edges saved with it (auto time window, transient_binning) take precedence
+    over the range of the render config.
+    :param output_file_name: output_file_name of the render or file of the histogram
+    :return: (n_bins + 1,) bin edges
+    """
+    edges_file = bin_edges_file_name(output_file_name)
+    if os.path.exists(edges_file):
+        return np.load(edges_file)
+    return np.linspace(transient_dist_min, transient_dist_max, transient_bin_num + 1)
+
+
+def uniform_bin_range(bin_edges, rtol=1e-4):
+    """
+    :return: transient_dist_min, transient_dist_max, transient_bin_num of uniform bin edges
+    """
+    bin_edges = np.asarray(bin_edges, dtype=np.float64)
+    widths = np.diff(bin_edges)
+    if not np.allclose(widths, widths.mean(), rtol=rtol, atol=0):
+        raise ValueError("Bins are not uniform, resample them with resample_to_uniform first")
+    return float(bin_edges[0]), float(bin_edges[-1]), widths.shape[0]
+
+
+def path_length_to_index_edges(path_length, bin_edges):
+    """
+    CPU reference of path_transient::path_length_to_index for non-uniform bins (binary search over edges).
+    Path lengths outside of the range are clamped to the first / last bin.
+    :param path_length: path length array
+    :param bin_edges: (n_bins + 1,) bin edges
+    :return: bin index array (uint32)
+    """
+    bin_edges = np.asarray(bin_edges, dtype=np.float32)
+    index = np.searchsorted(bin_edges, np.asarray(path_length, dtype=np.float32), side='right') - 1
+    return np.clip(index, 0, bin_edges.shape[0] - 2).astype(np.uint32)
+
+
+def resample_histogram(histogram, source_edges, target_edges, axis=0):
+    """
+    Resample histogram to other bin edges assuming constant density inside each source bin.
+    Total energy inside the overlapping range is preserved.
+    :param histogram: histogram with bins along axis
+    :param source_edges: (n_source + 1,) bin edges of histogram
+    :param target_edges: (n_target + 1,) target bin edges
+    :return: resampled histogram
+    """
+    histogram = np.moveaxis(np.asarray(histogram, dtype=np.float64), axis, 0)
+    cumulative = np.concatenate([np.zeros((1,) + histogram.shape[1:]), np.cumsum(histogram, axis=0)], axis=0)
+    flat = cumulative.reshape(cumulative.shape[0], -1)
+    resampled_cumulative = np.stack([
+        np.interp(target_edges, source_edges, flat[:, i]) for i in range(flat.shape[1])
+    ], axis=1)
+    resampled = np.diff(resampled_cumulative, axis=0).reshape((len(target_edges) - 1,) + histogram.shape[1:])
+    return np.moveaxis(resampled, 0, axis)
+
+
+def resample_to_uniform(histogram, bin_edges, transient_bin_num=None, bin_width=None, axis=0):
+    """
+    Convert non-uniform histogram back to uniform bins over the same range.
+    :return: uniform histogram and its (n_bins + 1,) bin edges
+    """
+    if transient_bin_num is None:
+        transient_bin_num = int(np.ceil((bin_edges[-1] - bin_edges[0]) / bin_width))
+    uniform_edges = np.linspace(bin_edges[0], bin_edges[-1], transient_bin_num + 1)
+    return resample_histogram(histogram, bin_edges, uniform_edges, axis=axis), uniform_edges
+
+
+class HistogramAccumulator:
+    """
+    Float64 host accumulation of the float32 device histogram.
+    The device histogram is read back every few passes, added to the host sum and cleared,
+    so it only holds the contributions of a few passes and large bins do not swallow small contributions.
+    Readback, zero and Kahan scratch arrays are allocated once and reused, a flush does not allocate.
+    """
+    def __init__(self, shape, kahan=False):
+        """
+        :param kahan: Kahan compensated summation of the flushed histograms
+        """
+        self.shape = tuple(shape)
+        self.kahan = kahan
+        self.sum = np.zeros(self.shape, dtype=np.float64)
+        self.compensation = np.zeros(self.shape, dtype=np.float64) if kahan else None
+        self.scratch = (np.empty(self.shape, dtype=np.float64), np.empty(self.shape, dtype=np.float64)) if kahan else None
+        self.readback = np.zeros(self.shape, dtype=np.float32)
+        self.zeros = np.zeros(self.shape, dtype=np.float32)
+        self.n_flushes = 0
+
+    def reset(self):
+        self.sum.fill(0)
+        if self.compensation is not None:
+            self.compensation.fill(0)
+        self.n_flushes = 0
+
+    def add(self, histogram):
+        if not self.kahan:
+            self.sum += histogram
+            return
+        y, t = self.scratch
+        np.subtract(histogram, self.compensation, out=y)
+        np.add(self.sum, y, out=t)
+        # compensation = (t - sum) - y
+        np.subtract(t, self.sum, out=self.compensation)
+        np.subtract(self.compensation, y, out=self.compensation)
+        np.copyto(self.sum, t)
+
+    def flush(self, buffer):
+        """
+        Add the device histogram buffer to the host sum and clear it.
+        """
+        buffer.copy_to_array(self.readback)
+        self.add(self.readback)
+        buffer.copy_from_array(self.zeros)
+        self.n_flushes += 1
+
+    def total(self):
+        return self.sum
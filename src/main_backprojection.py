@@ -0,0 +1,61 @@
+import sys
+import glob
+import os
+from utils.config_utils import *
+from utils.backprojection_utils import *
+from core.utils.transient_utils import load_bin_edges, uniform_bin_range
+import numpy as np
+
+if __name__ == "__main__":
+	argument = sys.argv
+	config_file = argument[1]
+
+	config = load_config_recursive(config_file)
+
+	if config.get("benchmark", False):
+		print(benchmark_backprojection(workers=config.get("workers", None)))
+		sys.exit(0)
+
+	# per ping render configs of a sweep (same format as main_transient.py)
+	ping_config_files = []
+	for pattern in config["ping_configs"]:
+		ping_config_files += sorted(glob.glob(pattern))
+
+	signal_suffix = config.get("signal_suffix", "")
+	signals = []
+	tx_coords = []
+	rx_coords = []
+	time_window = None
+	for ping_config_file in ping_config_files:
+		ping_config = load_config_recursive(ping_config_file)
+		rx_coords.append([ping_config.get("rx_x", 0.0), ping_config.get("rx_y", 0.0), ping_config.get("rx_z", 0.0)])
+		tx_coords.append([ping_config.get("tx_x", 0.0), ping_config.get("tx_y", 0.0), ping_config.get("tx_z", 0.0)])
+		root, _ = os.path.splitext(ping_config.get("output_file_name"))
+		signal = np.load("%s%s.npy" % (root, signal_suffix))
+		# (nBin, columns) -> sum over bounces
+		signals.append(np.sum(signal, axis=1) if signal.ndim == 2 else signal)
+
+		# time axis of the ping : saved bin edges (auto time window) or range of its render config
+		ping_window = uniform_bin_range(load_bin_edges(
+			root, ping_config.get("tMin", 0), ping_config.get("tMax", 1), ping_config.get("nBin", 10000)))
+		if time_window is None:
+			time_window = ping_window
+		elif not np.allclose(ping_window, time_window, rtol=1e-6, atol=0):
+			raise ValueError("Time axis of %s %s differs from %s of the first ping, pings need the same tMin / tMax / nBin" % (
+				ping_config_file, str(ping_window), str(time_window)))
+	if time_window is None:
+		raise ValueError("No ping configs match %s" % str(config["ping_configs"]))
+	signals = np.stack(signals)
+
+	voxels, grid_shape = make_voxel_grid(config["voxel_min"], config["voxel_max"], config["voxel_resolution"])
+	image = backproject(
+		signals, np.array(tx_coords), np.array(rx_coords), voxels,
+		time_window[0], time_window[1],
+		# complex baseband signals need phase compensation at the carrier frequency
+		center_frequency=config.get("center_frequency", 0.0) if np.iscomplexobj(signals) else 0.0,
+		speed_of_sound=config.get("speed_of_sound", 343.0),
+		voxel_tile_size=config.get("voxel_tile_size", 4096),
+		ping_tile_size=config.get("ping_tile_size", 64),
+		workers=config.get("workers", None)
+	)
+	np.save(config.get("image_file_name", "backprojection"), image.reshape(grid_shape))
@@ -0,0 +1,49 @@
+import sys
+import os
+from utils.host_overhead_utils import use_recording_pyoptix, bundled_scenes, measure_host_overhead, summarize_pings, SCENE_DIR
+
+
+def ping_configs(scene_name, n_pings):
+	# small pose changes between pings, like a sweep
+	return [{
+		"scene_name": scene_name,
+		"scene_file_path": os.path.join(SCENE_DIR, scene_name, "scene.xml"),
+		"spp": 64,
+		"samples_per_pass": 16,
+		"max_depth": 4,
+		"rr_begin_depth": 8,
+		"tMin": 0.0,
+		"tMax": 4.0,
+		"nBin": 1000,
+		"tx_x": 0.01 * i,
+		"tx_y": -0.8485,
+		"tx_z": 0.1125,
+		"rx_y": -0.8615,
+		"rx_z": 0.0745,
+		"output_file_name": None
+	} for i in range(n_pings)]
+
+
+if __name__ == "__main__":
+	# python main_host_overhead.py [n_pings] [scene ...] : host side time and traffic per ping without a GPU
+	recorder = use_recording_pyoptix()
+	from main_transient import create_renderer, render_transient
+
+	argument = sys.argv
+	n_pings = int(argument[1]) if len(argument) > 1 else 10
+	scene_names = argument[2:] if len(argument) > 2 else bundled_scenes()
+
+	renderer = create_renderer()
+	print("%-12s %10s %14s %10s %10s %14s %14s %8s %8s" % (
+		"scene", "cold ms", "cold upload", "warm ms", "max ms", "upload/ping", "download/ping", "alloc", "compile"))
+	for scene_name in scene_names:
+		try:
+			results = measure_host_overhead(lambda config: render_transient(renderer, config), recorder, ping_configs(scene_name, n_pings))
+		except Exception as e:
+			print("%-12s failed : %s" % (scene_name, e))
+			continue
+		summary = summarize_pings(results)
+		print("%-12s %10.2f %14d %10.2f %10.2f %14.0f %14.0f %8.1f %8d" % (
+			scene_name, summary["cold_host_ms"], summary["cold_uploaded_bytes"],
+			summary.get("warm_host_ms", 0), summary.get("warm_host_ms_max", 0), summary.get("warm_uploaded_bytes", 0),
+			summary.get("warm_downloaded_bytes", 0), summary.get("warm_allocations", 0), summary.get("warm_compiles", 0)))
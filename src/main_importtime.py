@@ -0,0 +1,23 @@
+import sys
+import os
+from utils.importtime_utils import measure_import_time, heaviest_imports
+
+if __name__ == "__main__":
+	# python main_importtime.py [budget_ms] [module ...] : exit code 1 if any import exceeds the budget
+	argument = sys.argv
+	budget = float(argument[1]) * 1e-3 if len(argument) > 1 else 1.0
+	module_names = argument[2:] if len(argument) > 2 else ["main_transient", "main_sweep", "main_postprocess", "core.renderer"]
+	file_dir = os.path.dirname(os.path.abspath(__file__))
+
+	over_budget = False
+	for module_name in module_names:
+		result = measure_import_time(module_name, cwd=file_dir)
+		if result["error"] is not None:
+			print("%-20s import failed : %s" % (module_name, result["error"]))
+			continue
+		status = "OK" if result["import_time"] <= budget else "OVER BUDGET"
+		over_budget |= result["import_time"] > budget
+		print("%-20s import %.1f ms (process %.1f ms) %s" % (module_name, result["import_time"] * 1e3, result["wall_time"] * 1e3, status))
+		for name, cumulative_time in heaviest_imports(result, 8):
+			print("    %-40s %.1f ms" % (name, cumulative_time * 1e3))
+	sys.exit(1 if over_budget else 0)
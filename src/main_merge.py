@@ -0,0 +1,25 @@
+import sys
+import glob
+import numpy as np
+from utils.config_utils import *
+from utils.logging_utils import load_logger
+from core.utils.checkpoint_utils import load_partial_result, merge_partial_results
+
+merge_logger = load_logger("Merge")
+
+if __name__ == "__main__":
+	# python main_merge.py config.json : merge <output_file_name>_samples_*.npz into <output_file_name>.npy
+	argument = sys.argv
+	config_file = argument[1]
+
+	config = load_config_recursive(config_file)
+	output_file_name = config.get("output_file_name")
+
+	partial_files = sorted(glob.glob("%s_samples_*.npz" % output_file_name))
+	partials = [load_partial_result(partial_file) for partial_file in partial_files]
+	merged, ranges = merge_partial_results(partials)
+	merge_logger.info("Merged %d partial renders covering sample ranges %s" % (len(partials), ranges))
+	if len(ranges) != 1 or ranges[0][0] != 0:
+		merge_logger.warning("Merged samples are not a single range starting at 0")
+
+	np.save(output_file_name, merged.astype(np.float32))
@@ -0,0 +1,56 @@
+import sys
+import glob
+from utils.config_utils import *
+from utils.signal_utils import *
+from core.utils.transient_utils import load_bin_edges, uniform_bin_range
+import numpy as np
+
+if __name__ == "__main__":
+	argument = sys.argv
+	config_file = argument[1]
+
+	config = load_config_recursive(config_file)
+
+	# rendered histograms of a sweep, (nBin, max_depth) per ping
+	input_files = config.get("input_files", config.get("output_file_name"))
+	if isinstance(input_files, str):
+		input_files = [input_files]
+	output_suffix = config.get("output_suffix", "_baseband")
+	file_names = []
+	for pattern in input_files:
+		if not pattern.endswith(".npy"):
+			pattern += ".npy"
+		# bin edges and processed outputs of earlier runs match the same patterns
+		file_names += sorted(file_name for file_name in glob.glob(pattern)
+							 if not file_name.endswith("_bin_edges.npy") and not file_name.endswith(output_suffix + ".npy"))
+
+	# pings are processed in groups sharing the same time axis (auto_time_window gives one per ping)
+	windows = {}
+	for file_name in file_names:
+		bin_edges = load_bin_edges(file_name, config.get("tMin", 0), config.get("tMax", 1), config.get("nBin", 10000))
+		windows.setdefault(uniform_bin_range(bin_edges), []).append(file_name)
+
+	speed_of_sound = config.get("speed_of_sound", DEFAULT_SPEED_OF_SOUND)
+	waveform_spec = config["waveform"]
+	center_frequency = config.get("center_frequency", waveform_center_frequency(waveform_spec))
+	pings_per_batch = config.get("pings_per_batch", 256)
+
+	for (transient_dist_min, transient_dist_max, transient_bin_num), window_file_names in windows.items():
+		sample_spacing = transient_bin_spacing(transient_dist_min, transient_dist_max, transient_bin_num, speed_of_sound)
+		waveform = make_waveform(waveform_spec, sample_spacing)
+		for start in range(0, len(window_file_names), pings_per_batch):
+			batch_file_names = window_file_names[start:start + pings_per_batch]
+			histograms = np.stack([np.load(file_name) for file_name in batch_file_names])
+			signals = process_transients(
+				histograms, waveform, sample_spacing,
+				convolve=config.get("convolve", True),
+				matched_filter=config.get("matched_filter", True),
+				demodulate=config.get("demodulate", True),
+				center_frequency=center_frequency,
+				time_offset=transient_dist_min / speed_of_sound,
+				sum_bounces=config.get("sum_bounces", False),
+				max_chunk_bytes=config.get("max_chunk_bytes", 1 << 30),
+				workers=config.get("fft_workers", -1)
+			)
+			for file_name, signal in zip(batch_file_names, signals):
+				save_processed_transients(file_name, signal, output_suffix)
@@ -0,0 +1,44 @@
+import sys
+import numpy as np
+from utils.sampling_benchmark_utils import equal_time_variance, point_light_scene, light_selection_estimator, \
+	mesh_light_scene, triangle_selection_estimator, envmap_image, envmap_irradiance_estimator
+from core.utils.light_utils import triangle_areas, envmap_sampling_tables
+
+
+def print_comparison(name, reference, estimators, time_budget, rng):
+	print(name)
+	print("  %-10s %12s %12s %12s %12s" % ("strategy", "samples", "mean", "variance", "rel. error"))
+	for strategy, estimator in estimators.items():
+		result = equal_time_variance(estimator, time_budget, rng)
+		print("  %-10s %12d %12.5g %12.5g %12.5g" % (
+			strategy, result["n_samples"], result["mean"], result["mean_variance"],
+			np.sqrt(result["mean_variance"]) / reference))
+
+
+if __name__ == "__main__":
+	# python main_sampling_benchmark.py [seconds per strategy] : equal time variance of NEE sampling strategies on the CPU
+	argument = sys.argv
+	time_budget = float(argument[1]) if len(argument) > 1 else 1.0
+	rng = np.random.default_rng(0)
+
+	positions, power, irradiance = point_light_scene(64, rng)
+	print_comparison("Light selection, 64 point lights", irradiance.sum(), {
+		"uniform": light_selection_estimator(irradiance, np.ones_like(power)),
+		"power": light_selection_estimator(irradiance, power)
+	}, time_budget, rng)
+
+	vertices, indices = mesh_light_scene(256, rng)
+	areas = triangle_areas(vertices, indices)
+	reference = triangle_selection_estimator(vertices, indices, areas)(rng, 4000000).mean()
+	print_comparison("Mesh light, 256 triangles", reference, {
+		"uniform": triangle_selection_estimator(vertices, indices, np.ones_like(areas)),
+		"area": triangle_selection_estimator(vertices, indices, areas)
+	}, time_budget, rng)
+
+	image = envmap_image(128, 256, rng)
+	tables = envmap_sampling_tables(image)
+	reference = envmap_irradiance_estimator(image, tables)(rng, 4000000).mean()
+	print_comparison("Environment map 256x128 with sun", reference, {
+		"uniform": envmap_irradiance_estimator(image),
+		"tables": envmap_irradiance_estimator(image, tables)
+	}, time_budget, rng)
@@ -0,0 +1,22 @@
+import sys
+from utils.manifest_utils import run_manifest
+from utils.writer_utils import OutputWriter
+from main_transient import create_renderer, render_transient
+
+
+def run_job(renderer, writer, config):
+	output_files = render_transient(renderer, config, writer)["output_files"]
+	# outputs must exist before the job is marked as done
+	writer.flush()
+	return output_files
+
+
+if __name__ == "__main__":
+	# python main_sweep.py manifest.json : several runners may share the same manifest
+	argument = sys.argv
+	manifest_file = argument[1]
+
+	renderer = create_renderer()
+	writer = OutputWriter()
+	run_manifest(manifest_file, lambda config: run_job(renderer, writer, config))
+	writer.close()
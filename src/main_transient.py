@@ -3,24 +3,36 @@ from utils.config_utils import *
 from core.renderer_constants import process_config
 from utils.image_utils import save_image, save_image_numpy
 import numpy as np
-from tqdm import tqdm
 import os
+from utils.writer_utils import OutputWriter
+from utils.logging_utils import load_logger
 
-if __name__ == "__main__":
-	argument = sys.argv
-	config_file = argument[1]
+transient_logger = load_logger("Transient main")
 
-	config = load_config_recursive(config_file)
 
+def create_renderer(force_recompile=False):
 	from pyoptix import Compiler
-	Compiler.clean()
+	from core.utils.compile_cache import prepare_compile_cache
 	Compiler.keep_device_function = False
 	file_dir = os.path.dirname(os.path.abspath(__file__))
 	Compiler.add_program_directory(file_dir)
+	# recompile only when a program, its headers or compile settings changed
+	if force_recompile:
+		Compiler.clean()
+	prepare_compile_cache(Compiler, file_dir)
 
 	from core.renderer import Renderer
-	renderer = Renderer()
+	return Renderer()
 
+
+def render_transient(renderer, config, writer=None):
+	"""
+	Render single ping of config and save its outputs.
+	:param writer: OutputWriter, outputs are written in the background (None : synchronous write)
+	:return: render result, with the list of written files in output_files
+	"""
+	if writer is None:
+		writer = OutputWriter(n_workers=0)
 	transient_configs = {
 		"transient_dist_max": config.get("tMax", 1),
 		"transient_dist_min": config.get("tMin", 0),
@@ -38,11 +50,90 @@ if __name__ == "__main__":
 	
 
 	renderer.init(**config, **transient_configs)
-	renderer.update_camera_and_emitter_position(rx_coord, tx_coord)
+	if "rx_array" in config:
+		# (K, 3) receiver positions rendered in a single launch
+		rx_array = np.array(config["rx_array"], dtype=float)
+		renderer.update_receiver_array(rx_array, tx_coord, config.get("receiver_sample_count", 0))
+	else:
+		renderer.update_camera_and_emitter_position(rx_coord, tx_coord)
+
+	if config.get("auto_time_window", False):
+		# derive tMin / tMax / nBin from scene bounds, covering every receiver
+		rx_coords = np.array(config["rx_array"], dtype=float) if "rx_array" in config else rx_coord[None]
+		window = renderer.compute_time_window(
+			rx_coords, np.repeat(tx_coord[None], rx_coords.shape[0], axis=0), config.get("max_depth", 8),
+			bin_width=config.get("bin_width", None), bin_num=config.get("nBin", 10000),
+			margin=config.get("time_window_margin", 0.0)
+		)
+		from core.utils.transient_utils import merge_time_windows
+		transient_configs = merge_time_windows(window, config.get("bin_width", None))
+		renderer.set_transient_range(**transient_configs)
+		transient_logger.info("Auto time window %s" % str(transient_configs))
+
+	if "transient_binning" in config:
+		# non-uniform (piecewise / log) bins over [tMin, tMax]
+		from core.utils.transient_utils import make_bin_edges
+		transient_bin_edges = make_bin_edges(
+			config["transient_binning"], transient_configs["transient_dist_min"],
+			transient_configs["transient_dist_max"], transient_configs["transient_bin_num"]
+		)
+		transient_configs["transient_bin_num"] = transient_bin_edges.shape[0] - 1
+		transient_configs["transient_bin_edges"] = transient_bin_edges
+		renderer.set_transient_range(**transient_configs)
+		transient_logger.info("Transient binning %s with %d bins" % (config["transient_binning"].get("type", "uniform"), transient_configs["transient_bin_num"]))
 	
 	result = renderer.render(**config, **transient_configs)
 	transient_histogram = result["transient_histogram"]
 	
 	output_file_name = config.get("output_file_name")
+	output_files = []
+	result["output_files"] = output_files
+	if output_file_name is None:
+		# result is only returned (render daemon)
+		return result
+
+	if "sample_range" in config:
+		# partial render, merged later with main_merge.py
+		from core.utils.checkpoint_utils import save_partial_result
+		s0, s1 = result["sample_range"]
+		output_files.append("%s_samples_%d_%d.npz" % (output_file_name, s0, s1))
+		writer.submit(output_files[-1], lambda f: save_partial_result(
+			f, transient_histogram, result["sample_range"], result["render_state_hash"], result["transient_bin_edges"]))
+	else:
+		# same naming as np.save
+		output_files.append(output_file_name if output_file_name.endswith(".npy") else output_file_name + ".npy")
+		writer.save_npy(output_files[-1], transient_histogram)
+	if "bounce_layout" in config:
+		# labels of the histogram columns
+		output_files.append("%s_bounce_labels.json" % output_file_name)
+		writer.save_json(output_files[-1], result["transient_bounce_labels"])
+	if "transient_binning" in config or config.get("auto_time_window", False):
+		# time axis of this ping differs from tMin / tMax / nBin of the config
+		from core.utils.transient_utils import bin_edges_file_name
+		output_files.append(bin_edges_file_name(output_file_name))
+		writer.save_npy(output_files[-1], result["transient_bin_edges"])
+	return result
+
+
+if __name__ == "__main__":
+	argument = sys.argv
+	config_file = argument[1]
+
+	config = load_config_recursive(config_file)
+	renderer = create_renderer()
+
+	if "--daemon" in argument:
+		# python main_transient.py config.json --daemon [address] : serve jobs with a warm renderer
+		from utils.render_daemon import RenderDaemon
+		daemon_index = argument.index("--daemon")
+		address = argument[daemon_index + 1] if len(argument) > daemon_index + 1 else config.get("daemon_address", "127.0.0.1:8770")
+		RenderDaemon(lambda job_config: render_transient(renderer, job_config), address, config).run()
+		sys.exit(0)
 
-	np.save(output_file_name, transient_histogram)
\ No newline at end of file
+	from tqdm import tqdm
+	# next ping is traced while outputs of the previous one are written
+	writer = OutputWriter(config.get("writer_workers", 2), config.get("writer_queue_size", 8))
+	# trajectory configs are expanded lazily into one config per ping
+	for ping_config in tqdm(expand_trajectory(config), disable="trajectory" not in config):
+		render_transient(renderer, ping_config, writer)
+	writer.close()
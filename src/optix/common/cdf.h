@@ -0,0 +1,20 @@
+#pragma once
+#include "optix/common/rt_function.h"
+
+// index i of the interval cdf[i] <= u < cdf[i + 1] of a (n + 1) cdf with cdf[0] = 0 and cdf[n] = 1
+// stored from cdf[offset] (rows of a flattened table)
+// (works with rtBuffer and rtBufferId, CPU reference : core/utils/light_utils.sample_cdf)
+template<typename CdfBuffer>
+RT_FUNCTION int find_cdf_interval(const CdfBuffer &cdf, int n, float u, int offset = 0)
+{
+    int lo = 0;
+    int hi = n;
+    while(lo + 1 < hi){
+        int mid = (lo + hi) / 2;
+        if(cdf[offset + mid] <= u)
+            lo = mid;
+        else
+            hi = mid;
+    }
+    return lo;
+}
@@ -9,6 +9,7 @@ using namespace optix;
 #include "optix/bsdf/bsdf.h"
 #include "optix/light/light_sample.h"
 #include "optix/light/light_pdf.h"
+#include "optix/light/light_selection.h"
 
 // scene geometry + material + lights
 rtDeclareVariable(rtObject,      top_object, , );
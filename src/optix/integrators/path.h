@@ -16,8 +16,6 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
     si.is_valid = true;
     rtTrace(top_object, ray, si);
 #if USE_NEXT_EVENT_ESTIMATION
-    int num_lights = sysLightParameters.size();
-    float num_lights_inv = 1.0 / (float) (num_lights);
     LightSample lightSample;
     PerRayData_pathtrace_shadow prd_shadow;
 #endif
@@ -51,7 +49,8 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         float3 L = make_float3(0.0f);
 
         // sample light index
-        int index = (num_lights==1)?0:optix::clamp(static_cast<int>(floorf(rnd(seed) * num_lights)), 0, num_lights - 1);
+        float light_pmf;
+        int index = sample_light_index(rnd(seed), light_pmf);
         const LightParameter& light = sysLightParameters[index];
 
         // sample light
@@ -60,7 +59,7 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         float lightDist = lightSample.lightDist;
         float3 wo = lightSample.wi;
         float3 Li = lightSample.Li;
-        float lightPdf = lightSample.pdf * num_lights_inv;
+        float lightPdf = lightSample.pdf * light_pmf;
         //return make_float3(1.0f);
         bool is_light_delta = (light.lightType == LIGHT_POINT) || (light.lightType == LIGHT_DIRECTIONAL) || (light.lightType == LIGHT_SPOT);
         if ((!is_light_delta && (dot(wo, si.normal) <= 0.0f) )|| length(Li) == 0)
@@ -116,8 +115,14 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         if(si.emission.x > 0)
         {
             LightParameter& light = sysLightParameters[si.light_id];
-            float lightPdfArea = pdf_light(si.hitTriIdx, ray.origin, ray.direction, light);
-            float light_pdf = (si.t * si.t) / si.wi.z * lightPdfArea * num_lights_inv;
+            float light_pdf;
+            if(light.lightType == LIGHT_ENVMAP){
+                // ray missed : solid angle pdf
+                light_pdf = pdf_light_envmap(ray.direction, light) * light_selection_pmf(si.light_id);
+            } else {
+                float lightPdfArea = pdf_light(si.hitTriIdx, ray.origin, ray.direction, light);
+                light_pdf = (si.t * si.t) / si.wi.z * lightPdfArea * light_selection_pmf(si.light_id);
+            }
             emission_weight = powerHeuristic(bs.pdf, light_pdf);
         }
 #endif
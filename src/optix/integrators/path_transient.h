@@ -2,16 +2,41 @@
 
 using namespace optix;
 
-rtBuffer<float, 2>              transient_radiance_histogram;
+// (receiver, bin, bounce column)
+rtBuffer<float, 3>              transient_radiance_histogram;
 rtDeclareVariable(float,         transient_dist_min, , );
 rtDeclareVariable(float,         transient_dist_max, , );
 rtDeclareVariable(uint,         transient_bin_num, , );
 rtDeclareVariable(float,         speed_of_wave, , );
+// non-uniform binning : (transient_bin_num + 1) increasing bin edges
+rtBuffer<float>                 transient_bin_edges;
+rtDeclareVariable(uint,         transient_uniform_bins, , );
+// bounce index -> histogram column (-1 : not recorded)
+rtBuffer<int>                   bounce_column_map;
+
+// multi receiver array (camera is placed at the transmitter)
+rtBuffer<float3>                receiver_positions;
+rtDeclareVariable(uint,         receiver_count, , );
+rtDeclareVariable(uint,         receiver_sample_count, , );
+rtDeclareVariable(float3,       receiver_intensity, , );
 
 
 namespace path_transient{
 RT_FUNCTION uint path_length_to_index(float path_length)
 {
+    if(!transient_uniform_bins){
+        // binary search of the last edge less or equal to path_length
+        uint lo = 0;
+        uint hi = transient_bin_num;
+        while(lo + 1 < hi){
+            uint mid = (lo + hi) / 2;
+            if(transient_bin_edges[mid] <= path_length)
+                lo = mid;
+            else
+                hi = mid;
+        }
+        return lo;
+    }
     uint idx = static_cast<unsigned int>((path_length - transient_dist_min) / (transient_dist_max - transient_dist_min) * transient_bin_num);
     idx = max(min(idx, transient_bin_num-1), 0);
     return idx;
@@ -22,6 +47,18 @@ RT_FUNCTION float luminance(float3 color)
     return 0.299 * color.x + 0.587* color.y + 0.114 * color.z;
 }
 
+RT_FUNCTION void record_transient(int bounce, float path_length, uint receiver_index, float value)
+{
+    if(bounce >= bounce_column_map.size())
+        return;
+    int column = bounce_column_map[bounce];
+    if(column < 0)
+        return;
+    uint path_length_idx = path_length_to_index(path_length);
+    uint3 idx = make_uint3(column, path_length_idx, receiver_index);
+    atomicAdd(&transient_radiance_histogram[idx], value);
+}
+
 RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
 {
     float emission_weight = 1.0;
@@ -40,8 +77,6 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
     path_length += si.t;
 
 #if USE_NEXT_EVENT_ESTIMATION
-    int num_lights = sysLightParameters.size();
-    float num_lights_inv = 1.0 / (float) (num_lights);
     LightSample lightSample;
     PerRayData_pathtrace_shadow prd_shadow;
 #endif
@@ -49,11 +84,10 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
     for (depth = 1; ; depth++){
         // ---------------- Intersection with emitters ----------------
         result += emission_weight * throughput * si.emission;
-        if(si.emission.x > 0){
+        // environment map (missed ray) has no path length, it only contributes to the image
+        if(si.emission.x > 0 && si.is_valid){
             // add transient output
-            uint path_length_idx = path_length_to_index(path_length);
-            uint2 idx = make_uint2(depth-1, path_length_idx);
-            atomicAdd(&transient_radiance_histogram[idx], luminance(emission_weight * throughput * si.emission));
+            record_transient(depth-1, path_length, 0, luminance(emission_weight * throughput * si.emission));
         }
 
         // ---------------- Terminate ray tracing ----------------
@@ -81,7 +115,8 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         float3 L = make_float3(0.0f);
 
         // sample light index
-        int index = (num_lights==1)?0:optix::clamp(static_cast<int>(floorf(rnd(seed) * num_lights)), 0, num_lights - 1);
+        float light_pmf;
+        int index = sample_light_index(rnd(seed), light_pmf);
         const LightParameter& light = sysLightParameters[index];
 
         // sample light
@@ -90,7 +125,7 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         float lightDist = lightSample.lightDist;
         float3 wo = lightSample.wi;
         float3 Li = lightSample.Li;
-        float lightPdf = lightSample.pdf * num_lights_inv;
+        float lightPdf = lightSample.pdf * light_pmf;
         //return make_float3(1.0f);
         bool is_light_delta = (light.lightType == LIGHT_POINT) || (light.lightType == LIGHT_DIRECTIONAL) || (light.lightType == LIGHT_SPOT);
         if ((!is_light_delta && (dot(wo, si.normal) <= 0.0f) )|| length(Li) == 0)
@@ -121,10 +156,9 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
 
             float path_length_em = path_length + lightDist;
 
-            // add transient output
-            uint path_length_idx = path_length_to_index(path_length_em);
-            uint2 idx = make_uint2(depth, path_length_idx);
-            atomicAdd(&transient_radiance_histogram[idx], luminance(throughput * L));
+            // add transient output (environment map is at infinity, lightDist would put it in the last bin)
+            if(light.lightType != LIGHT_ENVMAP)
+                record_transient(depth, path_length_em, 0, luminance(throughput * L));
         }
 
         result += throughput * L;
@@ -155,8 +189,14 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
         if(si.emission.x > 0)
         {
             LightParameter& light = sysLightParameters[si.light_id];
-            float lightPdfArea = pdf_light(si.hitTriIdx, ray.origin, ray.direction, light);
-            float light_pdf = (si.t * si.t) / si.wi.z * lightPdfArea * num_lights_inv;
+            float light_pdf;
+            if(light.lightType == LIGHT_ENVMAP){
+                // ray missed : solid angle pdf
+                light_pdf = pdf_light_envmap(ray.direction, light) * light_selection_pmf(si.light_id);
+            } else {
+                float lightPdfArea = pdf_light(si.hitTriIdx, ray.origin, ray.direction, light);
+                light_pdf = (si.t * si.t) / si.wi.z * lightPdfArea * light_selection_pmf(si.light_id);
+            }
             emission_weight = powerHeuristic(bs.pdf, light_pdf);
         }
 #endif
@@ -167,4 +207,97 @@ RT_FUNCTION void path_trace(Ray& ray, unsigned int& seed, PerPathData &ppd)
     ppd.is_valid = si.is_valid;
 }
 
+RT_FUNCTION void connect_receiver(const SurfaceInteraction &si, const MaterialParameter &mat, const optix::Onb &onb,
+    const float3 &throughput, float path_length, int depth, uint receiver_index, unsigned int& seed)
+{
+    float3 receiver_dir = receiver_positions[receiver_index] - si.p;
+    float receiver_dist = length(receiver_dir);
+    receiver_dir /= receiver_dist;
+
+    // Check visibility
+    PerRayData_pathtrace_shadow prd_shadow;
+    prd_shadow.inShadow = false;
+    prd_shadow.seed = seed;
+    optix::Ray shadowRay = optix::make_Ray(si.p, receiver_dir, 1, scene_epsilon, receiver_dist - scene_epsilon);
+    rtTrace(top_shadower, shadowRay, prd_shadow);
+    seed = prd_shadow.seed;
+    if (prd_shadow.inShadow)
+        return;
+
+    // receiver is treated as an omnidirectional point (delta) sensor
+    float3 f = bsdf::Eval(mat, si, to_local(onb, receiver_dir));
+    float3 L = receiver_intensity * f / (receiver_dist * receiver_dist);
+
+    record_transient(depth, path_length + receiver_dist, receiver_index, luminance(throughput * L));
+}
+
+// Traces paths from the transmitter and connects every path vertex to the receivers.
+// If receiver_sample_count is smaller than receiver_count, a random subset is connected and reweighted.
+RT_FUNCTION void path_trace_multi_receiver(Ray& ray, unsigned int& seed, PerPathData &ppd)
+{
+    float3 throughput = make_float3(1.0);
+    float path_length = 0.0;
+
+    uint n_connections = (receiver_sample_count == 0 || receiver_sample_count >= receiver_count) ? receiver_count : receiver_sample_count;
+    bool connect_all = n_connections == receiver_count;
+    float connection_weight = (float) receiver_count / (float) n_connections;
+
+    BSDFSample3f bs;
+
+    // ---------------------- First intersection ----------------------
+    SurfaceInteraction si;
+    si.emission = make_float3(0);
+    si.is_valid = true;
+    rtTrace(top_object, ray, si);
+
+    path_length += si.t;
+
+    int depth;
+    for (depth = 1; ; depth++){
+        // ---------------- Terminate ray tracing ----------------
+        if(depth >= max_depth || ! si.is_valid){
+            break;
+        }
+        // Russian roulette termination
+        if(depth >= rr_begin_depth)
+        {
+            float pcont = fmaxf(throughput);
+            pcont = max(pcont, 0.05);
+            if(rnd(seed) >= pcont)
+                break;
+            throughput /= pcont;
+        }
+
+        MaterialParameter &mat = sysMaterialParameters[si.material_id];
+        optix::Onb onb(si.normal);
+
+        // --------------------- Receiver connection ---------------------
+        for(uint i = 0; i < n_connections; i++){
+            uint receiver_index = connect_all ? i : optix::clamp(static_cast<uint>(floorf(rnd(seed) * receiver_count)), 0u, receiver_count - 1);
+            connect_receiver(si, mat, onb, throughput * connection_weight, path_length, depth, receiver_index, seed);
+        }
+
+        // ----------------------- BSDF sampling ----------------------
+        bsdf::Sample(mat, si, seed, bs);
+        onb.inverse_transform(bs.wo);
+        ray.direction = bs.wo;
+        ray.origin = si.p;
+        throughput *= bs.weight;
+
+        if(dot(throughput, throughput) == 0){
+            break;
+        }
+
+        si.emission = make_float3(0.0);
+        si.seed = seed;
+        rtTrace(top_object, ray, si);
+        seed = si.seed;
+        path_length += si.t;
+    }
+
+    ppd.result = make_float3(0.0);
+    ppd.depth = depth;
+    ppd.is_valid = si.is_valid;
+}
+
 }
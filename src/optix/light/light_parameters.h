@@ -11,6 +11,7 @@ using namespace optix;
 #define LIGHT_SPOT 4
 #define LIGHT_DISK 5
 #define LIGHT_TRIANGLE_MESH 6
+#define LIGHT_ENVMAP 7
 
 struct LightParameter
 {
@@ -37,6 +38,12 @@ struct LightParameter
 	Matrix4x4 transformation;
 	int envmapID;
 	int isTwosided;
+	// (n_triangles + 1) area proportional triangle cdf of mesh lights (null : uniform)
+	rtBufferId<float, 1> triangle_cdf_buffer_id;
+	// environment map importance sampling : (height + 1) marginal cdf over rows,
+	// height * (width + 1) conditional cdf over the columns of each row
+	rtBufferId<float, 1> envmap_marginal_cdf_id;
+	rtBufferId<float, 1> envmap_conditional_cdf_id;
 };
 
 struct LightSample
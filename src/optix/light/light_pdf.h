@@ -44,9 +44,36 @@ RT_CALLABLE_PROGRAM float pdf_light_tri_mesh(const int hitTriIdx, const float3 &
     p2 = transform_point(light.transformation, p2);
 
 	float area = 0.5 * optix::length(optix::cross(p1- p0, p2 - p0));
+    if (light.triangle_cdf_buffer_id != RT_BUFFER_ID_NULL)
+        return (light.triangle_cdf_buffer_id[hitTriIdx + 1] - light.triangle_cdf_buffer_id[hitTriIdx]) / area;
 	return 1 / area * ( 1.0 / light.n_triangles );
 }
 
+// solid angle pdf of sample_light_envmap for world direction wi
+RT_CALLABLE_PROGRAM float pdf_light_envmap(const float3 &wi, const LightParameter &light)
+{
+    if (light.envmap_marginal_cdf_id == RT_BUFFER_ID_NULL)
+        return 0.0f;
+    const int height = light.envmap_marginal_cdf_id.size() - 1;
+    const int width = light.envmap_conditional_cdf_id.size() / height - 1;
+
+    float3 direction = transform_normal(light.transformation.transpose(), wi);
+    float phi = atan2f(direction.x, -direction.z);
+    float theta = acosf(-direction.y);
+    float sin_theta = sinf(theta);
+    if (sin_theta <= 0.0f)
+        return 0.0f;
+    float u = (phi + M_PIf) * (0.5f * M_1_PIf);
+    float v = theta * M_1_PIf;
+
+    int row = optix::clamp(static_cast<int>(v * height), 0, height - 1);
+    int col = optix::clamp(static_cast<int>(u * width), 0, width - 1);
+    int offset = row * (width + 1);
+    float row_pmf = light.envmap_marginal_cdf_id[row + 1] - light.envmap_marginal_cdf_id[row];
+    float col_pmf = light.envmap_conditional_cdf_id[offset + col + 1] - light.envmap_conditional_cdf_id[offset + col];
+    return row_pmf * col_pmf * width * height / (2 * M_PIf * M_PIf * sin_theta);
+}
+
 RT_CALLABLE_PROGRAM float pdf_light(const int hitTriIdx, const float3 &pos, const float3 &wi, const LightParameter &light)
 {
     switch(light.lightType){
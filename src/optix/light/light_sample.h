@@ -3,6 +3,7 @@
 #include "optix/common/sampling.h"
 #include "optix/common/rt_function.h"
 #include "optix/common/random.h"
+#include "optix/common/cdf.h"
 
 using namespace optix;
 
@@ -39,7 +40,15 @@ RT_FUNCTION void sample_light_area_quad(const LightParameter &light, unsigned in
 
 RT_FUNCTION void sample_light_area_triangle_mesh(const LightParameter &light, unsigned int &seed, AreaSample &sample)
 {
-    int tri_index = optix::clamp(static_cast<int>(floorf(rnd(seed) * light.n_triangles)), 0, light.n_triangles - 1);
+    int tri_index;
+    float tri_pmf;
+    if (light.triangle_cdf_buffer_id != RT_BUFFER_ID_NULL){
+        tri_index = find_cdf_interval(light.triangle_cdf_buffer_id, light.n_triangles, rnd(seed));
+        tri_pmf = light.triangle_cdf_buffer_id[tri_index + 1] - light.triangle_cdf_buffer_id[tri_index];
+    } else {
+        tri_index = optix::clamp(static_cast<int>(floorf(rnd(seed) * light.n_triangles)), 0, light.n_triangles - 1);
+        tri_pmf = 1.0 / light.n_triangles;
+    }
     const int3 v_idx = light.indices_buffer_id[tri_index];
 
     float3 p0 = light.pos_buffer_id[ v_idx.x ];
@@ -65,7 +74,7 @@ RT_FUNCTION void sample_light_area_triangle_mesh(const LightParameter &light, un
         sample.normal = optix::normalize(optix::cross(p1- p0, p2 - p0));
     }
 	float area = 0.5 * optix::length(optix::cross(p1- p0, p2 - p0));
-	sample.pdf = 1 / area * (1.0 / light.n_triangles);
+	sample.pdf = tri_pmf / area;
 }
 
 RT_FUNCTION void sample_light_area_disk(const LightParameter &light, unsigned int &seed, AreaSample &sample)
@@ -166,6 +175,39 @@ RT_CALLABLE_PROGRAM void sample_light_direction(const float3 &pos, const LightPa
     sample.lightDist = 9999; // big number
 }
 
+RT_CALLABLE_PROGRAM void sample_light_envmap(const float3 &pos, const LightParameter &light, unsigned int &seed, LightSample &sample)
+{
+    const int height = light.envmap_marginal_cdf_id.size() - 1;
+    const int width = light.envmap_conditional_cdf_id.size() / height - 1;
+
+    // row from the marginal cdf, column from the conditional cdf of the row
+    const float u1 = rnd(seed);
+    const float u2 = rnd(seed);
+    const int row = find_cdf_interval(light.envmap_marginal_cdf_id, height, u1);
+    const int offset = row * (width + 1);
+    const int col = find_cdf_interval(light.envmap_conditional_cdf_id, width, u2, offset);
+    const float row_pmf = light.envmap_marginal_cdf_id[row + 1] - light.envmap_marginal_cdf_id[row];
+    const float col_pmf = light.envmap_conditional_cdf_id[offset + col + 1] - light.envmap_conditional_cdf_id[offset + col];
+
+    // position inside the selected pixel, inverse of the mapping of miss_environment_mapping
+    const float u = (col + (u2 - light.envmap_conditional_cdf_id[offset + col]) / col_pmf) / width;
+    const float v = (row + (u1 - light.envmap_marginal_cdf_id[row]) / row_pmf) / height;
+    const float phi = u * 2 * M_PIf - M_PIf;
+    const float theta = v * M_PIf;
+    const float sin_theta = sinf(theta);
+    const float3 local_direction = make_float3(sin_theta * sinf(phi), -cosf(theta), -sin_theta * cosf(phi));
+
+    sample.wi = optix::normalize(transform_normal(light.transformation, local_direction));
+    sample.lightDist = 1e16f; // at infinity
+    if(sin_theta <= 0.0f){
+        sample.Li = make_float3(0.0);
+        sample.pdf = 1.0;
+        return;
+    }
+    sample.Li = make_float3(optix::rtTex2D<float4>(light.envmapID, u, v));
+    sample.pdf = row_pmf * col_pmf * width * height / (2 * M_PIf * M_PIf * sin_theta);
+}
+
 RT_CALLABLE_PROGRAM void sample_light(const float3 &pos, const LightParameter &light, unsigned int &seed, LightSample &sample)
 {
     if (light.lightType == LIGHT_QUAD ||
@@ -180,5 +222,7 @@ RT_CALLABLE_PROGRAM void sample_light(const float3 &pos, const LightParameter &l
         sample_light_point(pos, light, seed, sample);
     } else if (light.lightType == LIGHT_DIRECTIONAL){
         sample_light_direction(pos, light, seed, sample);
+    } else if (light.lightType == LIGHT_ENVMAP){
+        sample_light_envmap(pos, light, seed, sample);
     }
 }
\ No newline at end of file
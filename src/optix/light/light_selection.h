@@ -0,0 +1,22 @@
+#pragma once
+#include <optixu/optixu_math_namespace.h>
+#include "optix/common/rt_function.h"
+#include "optix/common/cdf.h"
+
+using namespace optix;
+
+// (num_lights + 1) light selection cdf, cdf[0] = 0 and cdf[num_lights] = 1
+// (proportional to emitter power or uniform, see core/utils/light_utils.py)
+rtBuffer<float> sysLightSelectionCdf;
+
+RT_FUNCTION float light_selection_pmf(int index)
+{
+    return sysLightSelectionCdf[index + 1] - sysLightSelectionCdf[index];
+}
+
+RT_FUNCTION int sample_light_index(float u, float &pmf)
+{
+    int index = find_cdf_interval(sysLightSelectionCdf, sysLightSelectionCdf.size() - 1, u);
+    pmf = light_selection_pmf(index);
+    return index;
+}
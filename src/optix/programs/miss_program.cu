@@ -8,6 +8,7 @@ using namespace optix;
 rtDeclareVariable(SurfaceInteraction, si, rtPayload, );
 rtDeclareVariable(float3, bg_color, , );
 rtBuffer<LightParameter> sysLightParameters;
+rtDeclareVariable(int, envmap_light_index, , );
 rtDeclareVariable(Ray, ray, rtCurrentRay, );
 
 RT_PROGRAM void miss()
@@ -18,7 +19,7 @@ RT_PROGRAM void miss()
 RT_PROGRAM void miss_environment_mapping()
 {
     si.is_valid = false;
-    LightParameter& light = sysLightParameters[0];
+    LightParameter& light = sysLightParameters[envmap_light_index];
 
     float3 ray_direction = transform_normal(light.transformation.transpose(), ray.direction);
 
@@ -28,4 +29,6 @@ RT_PROGRAM void miss_environment_mapping()
     float v = theta * M_1_PIf;
 
     si.emission = make_float3(optix::rtTex2D<float4>(light.envmapID , u, v));
+    // MIS weight of the emitter hit
+    si.light_id = envmap_light_index;
 }
\ No newline at end of file
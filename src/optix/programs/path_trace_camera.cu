@@ -52,6 +52,8 @@ rtDeclareVariable(uint2,         launch_index, rtLaunchIndex, );
 rtDeclareVariable(float3,        bad_color, , );
 rtDeclareVariable(unsigned int,  completed_sample_number, , );
 rtDeclareVariable(unsigned int,  samples_per_pass, , );
+// 0 : first pass of a render overwrites output_buffer, so it never has to be cleared from the host
+rtDeclareVariable(unsigned int,  accumulate_output_buffer, , );
 
 
 rtBuffer<float4, 2>              output_buffer;
@@ -89,13 +91,19 @@ RT_PROGRAM void pathtrace_camera()
         // return new segments to be traced here.
         PerPathData ppd;
 
-        path_transient::path_trace(ray, seed, ppd);
+        if(receiver_count > 0)
+            path_transient::path_trace_multi_receiver(ray, seed, ppd);
+        else
+            path_transient::path_trace(ray, seed, ppd);
         // path::path_trace(ray, seed, ppd);
         result += ppd.result;
         hit_count += dot(ppd.result, ppd.result) > 0 ? 1 : 0;
     } while (--left_samples_pass);
 
-    output_buffer[launch_index] += make_float4(result, 1.0);
+    if(accumulate_output_buffer)
+        output_buffer[launch_index] += make_float4(result, 1.0);
+    else
+        output_buffer[launch_index] = make_float4(result, 1.0);
 }
 
 
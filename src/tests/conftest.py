@@ -0,0 +1,10 @@
+import os
+import sys
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# tests run without a GPU : pyoptix is the recording stand-in of utils/recording_optix
+from utils.host_overhead_utils import use_recording_pyoptix
+use_recording_pyoptix()
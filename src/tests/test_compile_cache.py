@@ -0,0 +1,80 @@
+import os
+from core.utils.compile_cache import find_includes, hash_program, program_hashes, prepare_compile_cache
+
+
+class CountingCompiler:
+    keep_device_function = False
+
+    def __init__(self):
+        self.n_cleans = 0
+
+    def clean(self):
+        self.n_cleans += 1
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def make_tree(root):
+    """
+    a.cu -> common.h -> math.h, b.cu -> other.h
+    """
+    write(os.path.join(root, "optix", "common", "math.h"), "#define EPSILON 1e-4f\n")
+    write(os.path.join(root, "optix", "common", "common.h"), '#include "math.h"\n#include <optix_world.h>\n')
+    write(os.path.join(root, "optix", "common", "other.h"), '// #include "math.h"\n/* #include "common.h" */\n')
+    write(os.path.join(root, "optix", "a.cu"), '#include "optix/common/common.h"\n#include "optix/missing.h"\n')
+    write(os.path.join(root, "optix", "b.cu"), '#include "common/other.h"\n')
+
+
+def test_transitive_header_edit_changes_only_dependents(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    before = program_hashes(root)
+    write(os.path.join(root, "optix", "common", "math.h"), "#define EPSILON 1e-4f\nfloat f();\n")
+    after = program_hashes(root)
+    assert after["optix/a.cu"] != before["optix/a.cu"]
+    assert after["optix/b.cu"] == before["optix/b.cu"]
+
+
+def test_define_value_changes_hash(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    source_file = os.path.join(root, "optix", "a.cu")
+    digest, defines = hash_program(source_file, [root])
+    assert defines == {"EPSILON": "1e-4f"}
+    write(os.path.join(root, "optix", "common", "math.h"), "#define EPSILON 1e-5f\n")
+    new_digest, new_defines = hash_program(source_file, [root])
+    assert new_digest != digest
+    assert new_defines == {"EPSILON": "1e-5f"}
+
+
+def test_commented_missing_and_system_includes_are_ignored(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    assert find_includes('// #include "x.h"\n/* #include "y.h" */\n#include "z.h"\n') == ["z.h"]
+    before = program_hashes(root)
+    # headers only referenced from comments do not change b.cu
+    write(os.path.join(root, "optix", "common", "math.h"), "#define EPSILON 1e-3f\n")
+    assert program_hashes(root)["optix/b.cu"] == before["optix/b.cu"]
+
+
+def test_unchanged_tree_does_not_clean(tmp_path):
+    root = str(tmp_path)
+    make_tree(root)
+    compiler = CountingCompiler()
+    assert prepare_compile_cache(compiler, root) == ["optix/a.cu", "optix/b.cu"]
+    assert compiler.n_cleans == 1
+    assert prepare_compile_cache(compiler, root) == []
+    assert compiler.n_cleans == 1
+
+    write(os.path.join(root, "optix", "common", "other.h"), "#define SPLIT 2\n")
+    assert prepare_compile_cache(compiler, root) == ["optix/b.cu"]
+    assert compiler.n_cleans == 2
+
+    # compile settings are part of the hash
+    compiler.keep_device_function = True
+    assert prepare_compile_cache(compiler, root) == ["optix/a.cu", "optix/b.cu"]
+    assert compiler.n_cleans == 3
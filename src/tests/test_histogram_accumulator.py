@@ -0,0 +1,55 @@
+import tracemalloc
+import numpy as np
+import pytest
+from pyoptix import Buffer
+from core.utils.transient_utils import HistogramAccumulator
+
+
+def test_flushed_accumulation_keeps_small_contributions():
+    # one large pass, then many small ones, as the device adds them
+    passes = [np.full((1, 4, 1), 2.0 ** 25, dtype=np.float32)] + [np.ones((1, 4, 1), dtype=np.float32)] * 1000
+    device = np.zeros((1, 4, 1), dtype=np.float32)
+    for histogram in passes:
+        device += histogram
+    # float32 spacing at 2^25 is 4, every +1 is rounded away
+    assert np.all(device == 2.0 ** 25)
+
+    accumulator = HistogramAccumulator((1, 4, 1))
+    buffer = Buffer.empty((1, 4, 1), dtype=np.float32)
+    for histogram in passes:
+        buffer.copy_from_array(histogram)
+        accumulator.flush(buffer)
+    assert np.all(accumulator.total() == 2.0 ** 25 + 1000)
+    assert np.all(buffer.array == 0)
+
+
+def test_kahan_keeps_contributions_float64_loses():
+    large = np.full((2, 3, 1), 1e17)
+    small = np.ones((2, 3, 1))
+    plain = HistogramAccumulator((2, 3, 1))
+    kahan = HistogramAccumulator((2, 3, 1), kahan=True)
+    for accumulator in (plain, kahan):
+        accumulator.add(large)
+        for _ in range(1000):
+            accumulator.add(small)
+    # float64 spacing at 1e17 is 16
+    assert np.all(plain.total() == 1e17)
+    assert np.all(np.abs(kahan.total() - (1e17 + 1000)) <= 16)
+
+
+@pytest.mark.parametrize("kahan", [False, True])
+def test_flush_does_not_allocate(kahan):
+    shape = (4, 10000, 8)
+    accumulator = HistogramAccumulator(shape, kahan=kahan)
+    buffer = Buffer.empty(shape, dtype=np.float32)
+    total = accumulator.total()
+    tracemalloc.start()
+    try:
+        for _ in range(3):
+            accumulator.flush(buffer)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    # one float64 histogram is 2.56 MB
+    assert peak < 256 * 1024
+    assert accumulator.total() is total
@@ -0,0 +1,203 @@
+import numpy as np
+from core.emitters.emitter import Emitter
+from core.utils.light_utils import LIGHT_POINT, LIGHT_QUAD, LIGHT_DIRECTIONAL, LIGHT_ENVMAP, build_light_cdf, \
+    emitter_power, light_selection_cdf, sample_light_index, envmap_light_index
+
+
+def light_records(light_types, values):
+    np_lights = np.zeros(len(light_types), dtype=Emitter.dtype)
+    np_lights["lightType"] = light_types
+    np_lights["intensity"] = np.array(values)[:, None]
+    np_lights["emission"] = np.array(values)[:, None]
+    np_lights["area"] = 1.0
+    return np_lights
+
+
+def test_cdf_bounds():
+    cdf = build_light_cdf([3.0, 0.5, 7.25, 1e-6])
+    assert cdf.dtype == np.float32 and cdf.shape == (5,)
+    assert cdf[0] == 0 and cdf[-1] == 1
+    assert np.all(np.diff(cdf) >= 0)
+
+
+def test_empirical_pmf_matches_power():
+    rng = np.random.default_rng(0)
+    power = np.array([1.0, 4.0, 0.25, 2.75, 12.0])
+    index, pmf = sample_light_index(build_light_cdf(power), rng.random(400000))
+    frequency = np.bincount(index, minlength=power.shape[0]) / index.shape[0]
+    assert np.allclose(frequency, power / power.sum(), atol=3e-3)
+    assert np.allclose(pmf, (power / power.sum())[index], rtol=1e-5)
+
+
+def test_zero_power_lights_are_never_picked():
+    rng = np.random.default_rng(1)
+    np_lights = light_records([LIGHT_POINT, LIGHT_QUAD, LIGHT_POINT, LIGHT_QUAD], [0.0, 2.0, 0.0, 1.0])
+    cdf = light_selection_cdf(np_lights, "power")
+    # u on cdf values (ties) and at the end of the range included
+    u = np.concatenate([rng.random(100000), cdf[:-1], [np.nextafter(np.float32(1), np.float32(0))]])
+    index, pmf = sample_light_index(cdf, u)
+    assert not np.isin(index, [0, 2]).any()
+    assert np.all(pmf > 0)
+
+
+def test_all_zero_power_falls_back_to_uniform():
+    cdf = build_light_cdf(np.zeros(4))
+    assert np.allclose(cdf, [0, 0.25, 0.5, 0.75, 1])
+    np_lights = light_records([LIGHT_POINT, LIGHT_QUAD], [0.0, 0.0])
+    assert np.allclose(light_selection_cdf(np_lights, "power"), [0, 0.5, 1])
+
+
+def test_unknown_power_gets_mean_of_emitting_lights():
+    np_lights = light_records([LIGHT_POINT, LIGHT_POINT, LIGHT_DIRECTIONAL], [1.0, 0.0, 5.0])
+    power = emitter_power(np_lights)
+    assert power[1] == 0
+    assert power[2] == power[0]
+
+
+def test_power_selection_reduces_variance():
+    from utils.sampling_benchmark_utils import point_light_scene, light_selection_estimator
+    rng = np.random.default_rng(2)
+    positions, power, irradiance = point_light_scene(64, rng)
+    uniform = light_selection_estimator(irradiance, np.ones_like(power))(rng, 200000)
+    proportional = light_selection_estimator(irradiance, power)(rng, 200000)
+    # both unbiased
+    assert np.isclose(uniform.mean(), irradiance.sum(), rtol=0.02)
+    assert np.isclose(proportional.mean(), irradiance.sum(), rtol=0.02)
+    assert proportional.var() < uniform.var()
+
+
+def test_triangle_frequencies_follow_world_area_under_non_uniform_scale():
+    from core.utils.light_utils import triangle_areas, build_triangle_cdf, sample_cdf
+    rng = np.random.default_rng(3)
+    # one triangle in each of the xy, yz and xz planes, the same object space area
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 0], [0, 1, 0], [0, 0, 1], [0, 0, 0], [1, 0, 0], [0, 0, 1]])
+    indices = np.arange(9).reshape((3, 3))
+    # pyrr convention : row vectors, translation in the last row
+    transform = np.diag([2.0, 3.0, 0.5, 1.0])
+    transform[3, :3] = [5, -1, 2]
+    areas = triangle_areas(vertices, indices, transform)
+    assert np.allclose(areas, 0.5 * np.array([6.0, 1.5, 1.0]))
+
+    cdf, total_area = build_triangle_cdf(areas)
+    assert np.isclose(total_area, areas.sum())
+    index, pmf = sample_cdf(cdf, rng.random(300000))
+    frequency = np.bincount(index, minlength=3) / index.shape[0]
+    assert np.allclose(frequency, areas / total_area, atol=3e-3)
+
+
+def test_degenerate_triangles_get_zero_probability():
+    from core.utils.light_utils import triangle_areas, build_triangle_cdf, sample_cdf
+    rng = np.random.default_rng(4)
+    # second triangle is collinear, third repeats a vertex
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 0], [1, 1, 1], [2, 2, 2], [3, 0, 0], [3, 0, 0], [3, 1, 0]])
+    areas = triangle_areas(vertices, np.arange(9).reshape((3, 3)))
+    assert np.allclose(areas, [0.5, 0, 0])
+    cdf, _ = build_triangle_cdf(areas)
+    # u in [0, 1) like the device random numbers
+    index, pmf = sample_cdf(cdf, np.concatenate([rng.random(100000), [0, np.nextafter(np.float32(1), np.float32(0))]]))
+    assert np.all(index == 0) and np.all(pmf == 1)
+
+
+def test_area_selection_reduces_variance():
+    from core.utils.light_utils import triangle_areas
+    from utils.sampling_benchmark_utils import mesh_light_scene, triangle_selection_estimator
+    rng = np.random.default_rng(5)
+    vertices, indices = mesh_light_scene(64, rng)
+    areas = triangle_areas(vertices, indices)
+    uniform = triangle_selection_estimator(vertices, indices, np.ones_like(areas))(rng, 200000)
+    proportional = triangle_selection_estimator(vertices, indices, areas)(rng, 200000)
+    assert np.isclose(uniform.mean(), proportional.mean(), rtol=0.02)
+    assert proportional.var() < uniform.var()
+
+
+def envmap_test_image(rng, height=32, width=64):
+    from utils.sampling_benchmark_utils import envmap_image
+    return envmap_image(height, width, rng, sun_radiance=50.0)
+
+
+def test_envmap_tables_are_normalized():
+    from core.utils.light_utils import envmap_sampling_tables
+    image = envmap_test_image(np.random.default_rng(6))
+    marginal_cdf, conditional_cdf = envmap_sampling_tables(image)
+    assert marginal_cdf.shape == (33,) and conditional_cdf.shape == (32, 65)
+    assert marginal_cdf[0] == 0 and marginal_cdf[-1] == 1
+    assert np.all(conditional_cdf[:, 0] == 0) and np.all(conditional_cdf[:, -1] == 1)
+    assert np.all(np.diff(marginal_cdf) >= 0) and np.all(np.diff(conditional_cdf, axis=1) >= 0)
+
+
+def test_envmap_rows_are_weighted_by_sin_theta():
+    from core.utils.light_utils import envmap_sampling_tables, envmap_pdf
+    height, width = 16, 32
+    marginal_cdf, conditional_cdf = envmap_sampling_tables(np.ones((height, width, 3)))
+    sin_theta = np.sin((np.arange(height) + 0.5) / height * np.pi)
+    assert np.allclose(np.diff(marginal_cdf), sin_theta / sin_theta.sum(), rtol=1e-5)
+    assert np.allclose(np.diff(conditional_cdf, axis=1), 1 / width, rtol=1e-5)
+    # constant map : solid angle pdf at pixel centers close to uniform over the sphere
+    u, v = np.meshgrid((np.arange(width) + 0.5) / width, (np.arange(height) + 0.5) / height)
+    assert np.allclose(envmap_pdf(marginal_cdf, conditional_cdf, u, v), 1 / (4 * np.pi), rtol=0.01)
+
+
+def test_envmap_sampling_matches_pdf():
+    from core.utils.light_utils import envmap_sampling_tables, envmap_pdf, sample_envmap, luminance
+    rng = np.random.default_rng(7)
+    image = envmap_test_image(rng)
+    height, width = image.shape[:2]
+    marginal_cdf, conditional_cdf = envmap_sampling_tables(image)
+    u, v, pdf = sample_envmap(marginal_cdf, conditional_cdf, rng.random(400000), rng.random(400000))
+    assert np.allclose(pdf, envmap_pdf(marginal_cdf, conditional_cdf, u, v))
+
+    # pixel frequencies follow luminance * sin(theta)
+    row, col = np.minimum((v * height).astype(int), height - 1), np.minimum((u * width).astype(int), width - 1)
+    frequency = np.bincount(row * width + col, minlength=height * width) / u.shape[0]
+    weight = luminance(image) * np.sin((np.arange(height) + 0.5) / height * np.pi)[:, None]
+    assert np.allclose(frequency, (weight / weight.sum()).reshape(-1), atol=2e-3)
+
+
+def test_envmap_estimator_matches_solid_angle_integral():
+    from core.utils.light_utils import envmap_sampling_tables, sample_envmap, luminance
+    rng = np.random.default_rng(8)
+    image = envmap_test_image(rng)
+    height, width = image.shape[:2]
+    marginal_cdf, conditional_cdf = envmap_sampling_tables(image)
+    u, v, pdf = sample_envmap(marginal_cdf, conditional_cdf, rng.random(400000), rng.random(400000))
+    radiance = luminance(image)[np.minimum((v * height).astype(int), height - 1), np.minimum((u * width).astype(int), width - 1)]
+    # exact integral of the piecewise constant map over the sphere
+    theta = np.arange(height + 1) / height * np.pi
+    integral = (luminance(image) * (2 * np.pi / width) * (np.cos(theta[:-1]) - np.cos(theta[1:]))[:, None]).sum()
+    assert np.isclose((radiance / pdf).mean(), integral, rtol=0.01)
+
+
+def test_envmap_pdf_integrates_to_one():
+    from core.utils.light_utils import envmap_sampling_tables, envmap_pdf
+    image = envmap_test_image(np.random.default_rng(9))
+    marginal_cdf, conditional_cdf = envmap_sampling_tables(image)
+    # midpoint rule over (u, v), d omega = 2 pi^2 sin(theta) du dv
+    n_u, n_v = 512, 512
+    u, v = np.meshgrid((np.arange(n_u) + 0.5) / n_u, (np.arange(n_v) + 0.5) / n_v)
+    integral = (envmap_pdf(marginal_cdf, conditional_cdf, u, v) * 2 * np.pi ** 2 * np.sin(v * np.pi)).sum() / (n_u * n_v)
+    assert np.isclose(integral, 1.0, rtol=1e-3)
+
+
+def test_envmap_tables_reduce_variance():
+    from core.utils.light_utils import envmap_sampling_tables
+    from utils.sampling_benchmark_utils import envmap_irradiance_estimator
+    rng = np.random.default_rng(10)
+    image = envmap_test_image(rng)
+    uniform = envmap_irradiance_estimator(image)(rng, 400000)
+    importance = envmap_irradiance_estimator(image, envmap_sampling_tables(image))(rng, 400000)
+    assert np.isclose(uniform.mean(), importance.mean(), rtol=0.03)
+    assert importance.var() < uniform.var()
+
+
+def test_envmap_light_index_after_other_lights():
+    from types import SimpleNamespace
+    from pyoptix import Context
+    from core.optix_scene import OptiXSceneContext
+    np_lights = light_records([LIGHT_POINT, LIGHT_QUAD, LIGHT_ENVMAP], [1.0, 2.0, 1.0])
+    assert envmap_light_index(np_lights) == 2
+    assert envmap_light_index(light_records([LIGHT_POINT], [1.0])) == 0
+
+    # uploaded for the miss program
+    optix_context = OptiXSceneContext(Context())
+    optix_context.load_scene_lights(SimpleNamespace(light_list=list(np_lights)))
+    assert optix_context.context['envmap_light_index'] == 2
@@ -0,0 +1,47 @@
+import json
+import os
+import pytest
+from utils.manifest_utils import run_manifest, load_manifest
+
+
+def write_manifest(tmp_path, jobs):
+    manifest_file = str(tmp_path / "manifest.json")
+    with open(manifest_file, "w") as f:
+        json.dump({"jobs": jobs}, f)
+    return manifest_file
+
+
+def test_sample_range_job_is_done_after_its_outputs_exist(tmp_path):
+    output_file_name = str(tmp_path / "ping_000")
+    manifest_file = write_manifest(tmp_path, [{"name": "ping_000", "overrides": {
+        "output_file_name": output_file_name, "sample_range": [0, 64]}}])
+    written = []
+
+    def run_job(config):
+        # partial renders have no <name>.npy
+        output_file = "%s_samples_0_64.npz" % config["output_file_name"]
+        open(output_file, "wb").close()
+        written.append(output_file)
+        return [output_file]
+
+    assert run_manifest(manifest_file, run_job)["done"] == 1
+    assert run_manifest(manifest_file, run_job)["skipped"] == 1
+    assert len(written) == 1
+
+    # removed output is rendered again
+    os.remove(written[0])
+    assert run_manifest(manifest_file, run_job)["done"] == 1
+
+
+def test_job_without_output_is_rejected(tmp_path):
+    manifest_file = write_manifest(tmp_path, [{"name": "ping_000", "overrides": {"spp": 8}}])
+    with pytest.raises(ValueError, match="output_file_name"):
+        load_manifest(manifest_file)
+
+
+def test_failed_marker_does_not_stop_the_runner(tmp_path):
+    manifest_file = write_manifest(tmp_path, [
+        {"name": "ping_%03d" % i, "overrides": {"output_file_name": str(tmp_path / ("ping_%03d" % i))}} for i in range(2)])
+    # None is not a list of outputs
+    summary = run_manifest(manifest_file, lambda config: None if config["output_file_name"].endswith("000") else [manifest_file])
+    assert summary["failed"] == 1 and summary["done"] == 1
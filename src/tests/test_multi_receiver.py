@@ -0,0 +1,40 @@
+import numpy as np
+from core.utils.transient_utils import accumulate_multi_receiver_histogram, path_length_to_index
+
+
+def test_receiver_bin_placement():
+    # vertex 1 away from the transmitter, receivers at distance 1 and 2 from the vertex
+    histogram = np.zeros((2, 8, 3))
+    accumulate_multi_receiver_histogram(histogram, path_lengths=[1.0], vertices=[[0, 0, 1]], depths=[1],
+                                        contributions=[2.0], receiver_positions=[[0, 0, 0], [0, 0, 3]],
+                                        transient_dist_min=0.0, transient_dist_max=4.0)
+    # total lengths 2 and 3 with bin width 0.5
+    assert histogram[0, 4, 1] == 2.0
+    assert histogram[1, 6, 1] == 2.0 / 4
+    assert np.count_nonzero(histogram) == 2
+    assert path_length_to_index([2.0, 3.0], 0.0, 4.0, 8).tolist() == [4, 6]
+
+
+def test_receiver_subset_matches_full_connection_in_expectation():
+    rng = np.random.default_rng(0)
+    n_vertices, n_receivers, n_samples = 50, 6, 2
+    path_lengths = rng.uniform(0.5, 1.5, n_vertices)
+    vertices = rng.uniform(-1, 1, (n_vertices, 3))
+    depths = rng.integers(0, 3, n_vertices)
+    contributions = rng.uniform(0, 1, n_vertices)
+    receiver_positions = rng.uniform(-1, 1, (n_receivers, 3)) + np.array([0, 0, 3])
+    arguments = (path_lengths, vertices, depths, contributions, receiver_positions, 0.0, 8.0)
+
+    full = accumulate_multi_receiver_histogram(np.zeros((n_receivers, 64, 3)), *arguments)
+
+    n_trials = 4000
+    subset = np.zeros_like(full)
+    for _ in range(n_trials):
+        receiver_indices = np.array([rng.choice(n_receivers, n_samples, replace=False) for _ in range(n_vertices)])
+        accumulate_multi_receiver_histogram(subset, *arguments, receiver_indices=receiver_indices)
+    subset /= n_trials
+
+    np.testing.assert_allclose(subset.sum(), full.sum(), rtol=0.02)
+    np.testing.assert_allclose(subset.sum(axis=(1, 2)), full.sum(axis=(1, 2)), rtol=0.1)
+    # every bin reached by the full connection is reached by the subsets
+    assert np.all((subset > 0) == (full > 0))
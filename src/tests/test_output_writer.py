@@ -0,0 +1,54 @@
+import json
+import os
+import pytest
+from utils.writer_utils import OutputWriter
+from utils.manifest_utils import run_manifest
+
+
+def failing_write(f):
+    f.write(b"partial")
+    raise RuntimeError("disk full")
+
+
+@pytest.mark.parametrize("n_workers", [0, 2])
+def test_failed_write_raises_and_removes_temp_file(tmp_path, n_workers):
+    file_path = str(tmp_path / "ping.npy")
+    with open(file_path, "wb") as f:
+        f.write(b"old")
+    writer = OutputWriter(n_workers=n_workers)
+    with pytest.raises((IOError, RuntimeError)):
+        writer.submit(file_path, failing_write)
+        writer.flush()
+    assert os.listdir(str(tmp_path)) == ["ping.npy"]
+    assert open(file_path, "rb").read() == b"old"
+    # errors are raised once
+    writer.flush()
+    writer.close()
+    assert writer.stats()["n_errors"] == n_workers // 2
+
+
+def test_close_raises_unflushed_errors(tmp_path):
+    writer = OutputWriter(n_workers=1)
+    writer.submit(str(tmp_path / "ping.npy"), failing_write)
+    with pytest.raises(IOError, match="ping.npy"):
+        writer.close()
+
+
+def test_failed_write_is_not_marked_done(tmp_path):
+    output_file_name = str(tmp_path / "ping_000")
+    # output of an earlier run with other inputs
+    with open(output_file_name + ".npy", "wb") as f:
+        f.write(b"old")
+    manifest_file = str(tmp_path / "manifest.json")
+    with open(manifest_file, "w") as f:
+        json.dump({"jobs": [{"name": "ping_000", "overrides": {"output_file_name": output_file_name}}]}, f)
+    writer = OutputWriter(n_workers=2)
+
+    def run_job(config):
+        writer.submit(config["output_file_name"] + ".npy", failing_write)
+        writer.flush()
+        return [config["output_file_name"] + ".npy"]
+
+    assert run_manifest(manifest_file, run_job)["failed"] == 1
+    assert run_manifest(manifest_file, run_job)["failed"] == 1
+    writer.close()
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from pyoptix import recorder
+from core.utils.checkpoint_utils import merge_partial_results, split_sample_range
+from tests.test_warm_render import ping_config
+
+
+def render(renderer, **overrides):
+    from main_transient import render_transient
+    return render_transient(renderer, ping_config(samples_per_pass=8, **overrides))
+
+
+@pytest.fixture
+def renderer():
+    from core.renderer import Renderer
+    return Renderer()
+
+
+def test_merged_partials_equal_single_run(renderer):
+    full = render(renderer, spp=40)
+    partials = [render(renderer, spp=40, sample_range=[s0, s1]) for s0, s1 in [(0, 13), (13, 40)]]
+    # partial renders of different ranges differ
+    assert not np.allclose(partials[0]["transient_histogram"], partials[1]["transient_histogram"])
+    merged, ranges = merge_partial_results(partials[::-1])
+    assert ranges == [(0, 40)]
+    np.testing.assert_allclose(merged, full["transient_histogram"], rtol=1e-6)
+
+    split = [render(renderer, spp=40, sample_range=sample_range) for sample_range in split_sample_range(40, 3)]
+    np.testing.assert_allclose(merge_partial_results(split)[0], full["transient_histogram"], rtol=1e-6)
+
+
+def test_overlapping_ranges_raise(renderer):
+    partials = [render(renderer, spp=40, sample_range=sample_range) for sample_range in [(0, 24), (16, 40)]]
+    with pytest.raises(ValueError, match="overlap"):
+        merge_partial_results(partials)
+
+
+def test_mismatched_render_state_raises(renderer):
+    partials = [render(renderer, spp=40, sample_range=[0, 16]), render(renderer, spp=40, sample_range=[16, 40], tx_x=0.1)]
+    assert partials[0]["render_state_hash"] != partials[1]["render_state_hash"]
+    with pytest.raises(ValueError, match="different configs"):
+        merge_partial_results(partials)
+
+
+def test_resumed_render_equals_single_run(renderer, tmp_path):
+    checkpoint_file = str(tmp_path / "ping.ckpt.npz")
+    full = render(renderer, spp=48)
+    # interrupted run : checkpoint after 24 samples, then resumed up to 48
+    render(renderer, spp=24, checkpoint_file=checkpoint_file)
+    n_launches = recorder.n_launches
+    resumed = render(renderer, spp=48, checkpoint_file=checkpoint_file, resume=True)
+    # only the missing 24 samples are rendered
+    assert recorder.n_launches - n_launches == 3
+    np.testing.assert_allclose(resumed["transient_histogram"], full["transient_histogram"], rtol=1e-6)
+
+    # checkpoint of another pose is rejected
+    with pytest.raises(ValueError, match="different config"):
+        render(renderer, spp=48, checkpoint_file=checkpoint_file, resume=True, tx_x=0.1)
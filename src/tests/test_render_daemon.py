@@ -0,0 +1,62 @@
+import json
+import socket
+import threading
+import time
+from utils.render_daemon import RenderDaemon, send_request
+
+
+def start_daemon(address, run_job):
+    daemon = RenderDaemon(run_job, address)
+    thread = threading.Thread(target=daemon.run, daemon=True)
+    thread.start()
+    for _ in range(200):
+        try:
+            send_request(address, {"type": "status"}, timeout=1)
+            return daemon, thread
+        except OSError:
+            time.sleep(0.01)
+    raise RuntimeError("Render daemon did not start")
+
+
+def test_one_connection_queues_several_jobs(tmp_path):
+    address = "unix:%s" % (tmp_path / "daemon.sock")
+    release = threading.Event()
+    order = []
+
+    def run_job(config):
+        # first job blocks until the client has queued the others
+        if config["job"] == "first":
+            release.wait(10)
+        order.append(config["job"])
+        return {"transient_histogram": None}
+
+    daemon, thread = start_daemon(address, run_job)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(10)
+    client.connect(address[len("unix:"):])
+    stream = client.makefile("r")
+
+    def send(request):
+        client.sendall((json.dumps(request) + "\n").encode())
+
+    send({"type": "render", "id": 1, "config": {"job": "first"}})
+    assert json.loads(stream.readline())["status"] == "queued"
+    # sent while job 1 renders on the same connection
+    send({"type": "render", "id": 2, "priority": 5, "config": {"job": "late"}})
+    send({"type": "render", "id": 3, "priority": 0, "config": {"job": "urgent"}})
+    send({"type": "status"})
+    responses = [json.loads(stream.readline()) for _ in range(3)]
+    assert [response["status"] for response in responses] == ["queued", "queued", "ok"]
+    assert responses[2]["running"] == 1 and responses[2]["queue_length"] == 2
+
+    release.set()
+    done = [json.loads(stream.readline()) for _ in range(3)]
+    assert sorted(response["id"] for response in done) == [1, 2, 3]
+    assert all(response["status"] == "done" for response in done)
+    # priority applies to jobs of the same connection
+    assert order == ["first", "urgent", "late"]
+
+    client.close()
+    send_request(address, {"type": "shutdown"}, timeout=10)
+    thread.join(10)
+    assert not thread.is_alive()
@@ -0,0 +1,42 @@
+import os
+import shutil
+import numpy as np
+from utils.host_overhead_utils import SCENE_DIR
+
+
+def scale_obj(file_name, scale):
+    lines = []
+    for line in open(file_name).read().splitlines():
+        if line.startswith("v "):
+            line = "v " + " ".join(str(float(x) * scale) for x in line.split()[1:])
+        lines.append(line)
+    with open(file_name, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def test_reload_rebuilds_geometry_of_changed_obj(tmp_path):
+    from core.renderer import Renderer
+    scene_dir = str(tmp_path / "cube")
+    shutil.copytree(os.path.join(SCENE_DIR, "cube"), scene_dir)
+    scene_file_path = os.path.join(scene_dir, "scene.xml")
+
+    renderer = Renderer()
+    renderer.load_scene("cube", scene_file_path=scene_file_path)
+    old_instances = renderer.scene.geometry_instances
+    mesh_index = [type(shape).__name__ for shape in renderer.scene.shape_list].index("OBJMesh")
+    old_bbox = renderer.scene.shape_bbox_list[mesh_index]
+
+    # unchanged files : everything is reused
+    report = renderer.reload_scene()
+    assert report["meshes_loaded"] == 0 and report["geometry"] == "unchanged"
+    assert renderer.scene.geometry_instances is old_instances
+
+    # same mesh key, new content on disk
+    scale_obj(os.path.join(scene_dir, "cbox.obj"), 2.0)
+    report = renderer.reload_scene()
+    assert report["meshes_loaded"] == 1 and report["geometry"] == "rebuilt"
+    assert renderer.scene.geometry_instances is not old_instances
+    new_bbox = renderer.scene.shape_bbox_list[mesh_index]
+    assert np.allclose(new_bbox.bbox_max, 2 * old_bbox.bbox_max, rtol=1e-4)
+    assert np.allclose(new_bbox.bbox_min, 2 * old_bbox.bbox_min, rtol=1e-4)
+    assert np.all(renderer.scene.bbox.bbox_max >= new_bbox.bbox_max)
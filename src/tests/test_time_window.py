@@ -0,0 +1,21 @@
+import numpy as np
+from core.utils.transient_utils import compute_time_window, merge_time_windows
+
+
+def test_merged_window_covers_every_pose_with_whole_bins():
+    bbox_min, bbox_max = [[-1, -1, -1]], [[1, 1, 1]]
+    rx_coords = np.array([[0, 0, 2], [0, 0, 5]], dtype=float)
+    tx_coords = np.zeros_like(rx_coords) + [0, 0, 2]
+    window = compute_time_window(tx_coords, rx_coords, bbox_min, bbox_max, 3, bin_width=0.1)
+    merged = merge_time_windows(window, 0.1)
+    assert merged["transient_dist_min"] == np.min(window["transient_dist_min"])
+    assert merged["transient_dist_max"] >= np.max(window["transient_dist_max"])
+    assert np.isclose(merged["transient_dist_min"] + merged["transient_bin_num"] * 0.1, merged["transient_dist_max"])
+
+
+def test_single_pose_window_is_unchanged():
+    window = compute_time_window([[0, 0, 2]], [[0, 0, 3]], [[-1, -1, -1]], [[1, 1, 1]], 2, bin_num=500)
+    merged = merge_time_windows(window)
+    assert merged == {"transient_dist_min": float(window["transient_dist_min"][0]),
+                      "transient_dist_max": float(window["transient_dist_max"][0]), "transient_bin_num": 500}
+    assert isinstance(merged["transient_bin_num"], int)
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+from core.utils.transient_utils import bin_edges_file_name, load_bin_edges, uniform_bin_range
+from tests.test_warm_render import ping_config
+
+
+def test_bin_edges_file_name():
+    assert bin_edges_file_name("out/ping_000") == "out/ping_000_bin_edges.npy"
+    assert bin_edges_file_name("out/ping_000.npy") == "out/ping_000_bin_edges.npy"
+
+
+def test_uniform_bin_range():
+    assert uniform_bin_range(np.linspace(1.0, 3.0, 51)) == (1.0, 3.0, 50)
+    with pytest.raises(ValueError):
+        uniform_bin_range([0.0, 1.0, 3.0])
+
+
+def test_auto_time_window_is_saved_with_each_ping(tmp_path):
+    from core.renderer import Renderer
+    from main_transient import render_transient
+    renderer = Renderer()
+    windows = []
+    for i, tx_x in enumerate([0.0, 0.3]):
+        output_file_name = str(tmp_path / ("ping_%03d" % i))
+        result = render_transient(renderer, ping_config(auto_time_window=True, tx_x=tx_x, output_file_name=output_file_name))
+        assert bin_edges_file_name(output_file_name) in result["output_files"]
+        # config range is ignored when edges are saved
+        bin_edges = load_bin_edges(output_file_name + ".npy", 0.0, 4.0, 100)
+        assert np.allclose(bin_edges, result["transient_bin_edges"])
+        assert np.load(output_file_name + ".npy").shape[0] == bin_edges.shape[0] - 1
+        windows.append(uniform_bin_range(bin_edges))
+    assert windows[0] != windows[1]
+    assert windows[0][:2] != (0.0, 4.0)
@@ -0,0 +1,48 @@
+import numpy as np
+from core.utils.transient_utils import make_bin_edges, path_length_to_index, path_length_to_index_edges, \
+    resample_histogram, resample_to_uniform
+
+
+def test_out_of_range_and_edge_values():
+    edges = np.array([1.0, 2.0, 4.0, 8.0])
+    index = path_length_to_index_edges([0.5, 1.0, 2.0, 3.9, 4.0, 8.0, 20.0], edges)
+    # below -> first bin, on an edge -> bin starting there, on / above the last edge -> last bin
+    assert index.tolist() == [0, 0, 1, 1, 2, 2, 2]
+    assert index.dtype == np.uint32
+
+
+def test_uniform_edges_match_uniform_formula():
+    rng = np.random.default_rng(0)
+    edges = make_bin_edges({"type": "uniform"}, 1.0, 5.0, 400)
+    path_length = rng.uniform(0.5, 5.5, 100000)
+    # float32 rounding may differ right at an edge
+    away_from_edge = np.min(np.abs(path_length[:, None] - edges[None]), axis=1) > 1e-5
+    assert np.array_equal(path_length_to_index_edges(path_length, edges)[away_from_edge],
+                          path_length_to_index(path_length, 1.0, 5.0, 400)[away_from_edge])
+
+
+def test_log_edges():
+    edges = make_bin_edges({"type": "log", "nBin": 64, "scale": 0.01}, 1.0, 9.0)
+    assert edges.shape == (65,)
+    assert edges[0] == 1.0 and edges[-1] == 9.0
+    assert np.all(np.diff(np.diff(edges)) > 0)
+    centers = 0.5 * (edges[:-1] + edges[1:])
+    assert path_length_to_index_edges(centers, edges).tolist() == list(range(64))
+
+
+def test_piecewise_edges():
+    binning = {"type": "piecewise", "segments": [{"end": 2.0, "width": 0.25}, {"end": 3.0, "width": 0.5}, {"width": 1.0}]}
+    edges = make_bin_edges(binning, 1.0, 6.0)
+    assert np.allclose(edges, [1.0, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0, 4.0, 5.0, 6.0])
+    assert path_length_to_index_edges([1.1, 2.0, 2.7, 5.99], edges).tolist() == [0, 4, 5, 8]
+
+
+def test_resample_conserves_total():
+    rng = np.random.default_rng(1)
+    edges = make_bin_edges({"type": "log", "nBin": 50}, 0.0, 10.0)
+    histogram = rng.random((50, 3))
+    uniform, uniform_edges = resample_to_uniform(histogram, edges, transient_bin_num=37)
+    assert uniform.shape == (37, 3)
+    assert np.allclose(uniform.sum(axis=0), histogram.sum(axis=0))
+    coarse = resample_histogram(histogram.T, edges, np.linspace(0.0, 10.0, 6), axis=1)
+    assert np.allclose(coarse.sum(axis=1), histogram.sum(axis=0))
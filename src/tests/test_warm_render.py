@@ -0,0 +1,83 @@
+import os
+import pytest
+from pyoptix import recorder
+from utils.host_overhead_utils import SCENE_DIR
+
+
+def ping_config(**overrides):
+    config = {
+        "scene_name": "cube",
+        "scene_file_path": os.path.join(SCENE_DIR, "cube", "scene.xml"),
+        "spp": 32,
+        "samples_per_pass": 16,
+        "max_depth": 4,
+        "rr_begin_depth": 8,
+        "tMin": 0.0,
+        "tMax": 4.0,
+        "nBin": 100,
+        "tx_y": -0.8485,
+        "tx_z": 0.1125,
+        "rx_y": -0.8615,
+        "rx_z": 0.0745,
+        "output_file_name": None
+    }
+    config.update(overrides)
+    return config
+
+
+def measure(renderer, config):
+    from main_transient import render_transient
+    before = recorder.snapshot()
+    render_transient(renderer, config)
+    after = recorder.snapshot()
+    return {
+        "n_compiles": after["calls"]["Context.compile"] - before["calls"]["Context.compile"],
+        "n_allocations": after["n_allocations"] - before["n_allocations"],
+        "n_program_changes": after["calls"]["Context.set_ray_generation_program"] -
+            before["calls"]["Context.set_ray_generation_program"]
+    }
+
+
+@pytest.fixture
+def warm_renderer():
+    from core.renderer import Renderer
+    renderer = Renderer()
+    measure(renderer, ping_config())
+    return renderer
+
+
+def test_scalar_changes_do_not_compile_or_allocate(warm_renderer):
+    difference = measure(warm_renderer, ping_config(tx_x=0.05, spp=64, max_depth=4, rr_begin_depth=2, tMax=5.0))
+    assert difference == {"n_compiles": 0, "n_allocations": 0, "n_program_changes": 0}
+
+
+@pytest.mark.parametrize("overrides", [
+    {"nBin": 200},
+    {"rx_array": [[0.0, -0.8615, 0.0745], [0.1, -0.8615, 0.0745]]},
+    {"bounce_layout": "total"}
+])
+def test_histogram_layout_changes_reallocate(warm_renderer, overrides):
+    difference = measure(warm_renderer, ping_config(**overrides))
+    assert difference["n_allocations"] > 0
+    assert difference["n_compiles"] > 0
+    # same layout again is warm
+    assert measure(warm_renderer, ping_config(**overrides))["n_allocations"] == 0
+
+
+def test_program_change_recompiles(warm_renderer, monkeypatch):
+    from core.optix_scene import OptiXSceneContext
+    monkeypatch.setattr(OptiXSceneContext, "ray_generation_hash", lambda self: "edited")
+    difference = measure(warm_renderer, ping_config())
+    assert difference["n_program_changes"] == 1
+    assert difference["n_compiles"] == 1
+    assert difference["n_allocations"] == 0
+    assert measure(warm_renderer, ping_config())["n_compiles"] == 0
+
+
+def test_warm_render_does_not_upload_output_buffer(warm_renderer):
+    output_buffer = warm_renderer.context['output_buffer']
+    before = recorder.snapshot()
+    measure(warm_renderer, ping_config(spp=48))
+    assert recorder.uploaded_bytes - before["uploaded_bytes"] < output_buffer.array.nbytes
+    # first pass overwrites the previous render
+    assert (output_buffer.array == 48).all()
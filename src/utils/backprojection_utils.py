@@ -0,0 +1,134 @@
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from utils.logging_utils import load_logger
+
+backprojection_logger = load_logger("Backprojection")
+
+
+def make_voxel_grid(voxel_min, voxel_max, voxel_resolution):
+	"""
+	Regular voxel grid.
+	:param voxel_min: (3,) minimum corner
+	:param voxel_max: (3,) maximum corner
+	:param voxel_resolution: (3,) number of voxels along each axis or single int
+	:return: (nx * ny * nz, 3) voxel centers (x major) and grid shape
+	"""
+	voxel_resolution = np.broadcast_to(np.asarray(voxel_resolution, dtype=np.int64), (3,))
+	axes = [np.linspace(voxel_min[i], voxel_max[i], voxel_resolution[i], dtype=np.float32) for i in range(3)]
+	xs, ys, zs = np.meshgrid(*axes, indexing='ij')
+	voxels = np.stack([xs.reshape(-1), ys.reshape(-1), zs.reshape(-1)], axis=1)
+	return voxels, tuple(voxel_resolution.tolist())
+
+
+def _backproject_tile(signals, tx_coords, rx_coords, voxels, transient_dist_min, bin_width,
+					  wavenumber, ping_tile_size):
+	n_pings, n_bins = signals.shape
+	image = np.zeros(voxels.shape[0], dtype=signals.dtype)
+	for ping_start in range(0, n_pings, ping_tile_size):
+		ping_end = min(ping_start + ping_tile_size, n_pings)
+		tx = tx_coords[ping_start:ping_end]
+		rx = rx_coords[ping_start:ping_end]
+
+		# (pings, voxels) round trip path length
+		path_length = np.linalg.norm(voxels[None, :, :] - tx[:, None, :], axis=2)
+		path_length += np.linalg.norm(voxels[None, :, :] - rx[:, None, :], axis=2)
+
+		# linear interpolation between bin centers
+		position = (path_length - transient_dist_min) / bin_width - 0.5
+		index = np.floor(position)
+		fraction = (position - index).astype(np.float32)
+		index = index.astype(np.int64)
+		valid = (index >= 0) & (index < n_bins - 1)
+		index = np.clip(index, 0, n_bins - 2)
+
+		flat_index = index + (np.arange(ping_start, ping_end, dtype=np.int64) * n_bins)[:, None]
+		flat_signals = signals.reshape(-1)
+		value = flat_signals[flat_index] * (1 - fraction) + flat_signals[flat_index + 1] * fraction
+		value *= valid
+
+		if wavenumber != 0:
+			value *= np.exp(1j * wavenumber * path_length).astype(np.complex64)
+		image += np.sum(value, axis=0)
+	return image
+
+
+def backproject(signals, tx_coords, rx_coords, voxels, transient_dist_min, transient_dist_max,
+				center_frequency=0.0, speed_of_sound=343.0, voxel_tile_size=4096, ping_tile_size=64, workers=None):
+	"""
+	Delay-and-sum backprojection of per-ping signals onto voxels.
+	The voxel set and the ping set are split into tiles, voxel tiles are processed by a thread pool.
+	:param signals: (n_pings, n_bins) real histograms or complex baseband signals on the path length axis
+	:param tx_coords: (n_pings, 3) transmitter positions
+	:param rx_coords: (n_pings, 3) receiver positions
+	:param voxels: (n_voxels, 3) voxel centers
+	:param transient_dist_min: path length of the first bin edge (tMin)
+	:param transient_dist_max: path length of the last bin edge (tMax)
+	:param center_frequency: carrier frequency of baseband signals for phase compensation (0 : none)
+	:param speed_of_sound: speed of sound used for phase compensation
+	:param voxel_tile_size: number of voxels per tile
+	:param ping_tile_size: number of pings per tile
+	:param workers: number of threads (None : default of ThreadPoolExecutor)
+	:return: (n_voxels,) image
+	"""
+	signals = np.asarray(signals)
+	if np.iscomplexobj(signals) or center_frequency != 0:
+		signals = signals.astype(np.complex64)
+	else:
+		signals = signals.astype(np.float32)
+	tx_coords = np.asarray(tx_coords, dtype=np.float32)
+	rx_coords = np.asarray(rx_coords, dtype=np.float32)
+	voxels = np.asarray(voxels, dtype=np.float32)
+
+	n_pings, n_bins = signals.shape
+	bin_width = (transient_dist_max - transient_dist_min) / n_bins
+	wavenumber = 2 * np.pi * center_frequency / speed_of_sound
+
+	image = np.zeros(voxels.shape[0], dtype=signals.dtype)
+	tile_starts = list(range(0, voxels.shape[0], voxel_tile_size))
+
+	def run_tile(start):
+		end = min(start + voxel_tile_size, voxels.shape[0])
+		image[start:end] = _backproject_tile(signals, tx_coords, rx_coords, voxels[start:end],
+											 transient_dist_min, bin_width, wavenumber, ping_tile_size)
+
+	start_time = time.time()
+	with ThreadPoolExecutor(max_workers=workers) as executor:
+		list(executor.map(run_tile, tile_starts))
+	elapsed_time = time.time() - start_time
+
+	backprojection_logger.info("Backprojected %d pings onto %d voxels in %.3f sec (%.3e voxels/sec, %.3e voxel-pings/sec)" % (
+		n_pings, voxels.shape[0], elapsed_time,
+		voxels.shape[0] / max(elapsed_time, 1e-12), voxels.shape[0] * n_pings / max(elapsed_time, 1e-12)
+	))
+	return image
+
+
+def benchmark_backprojection(n_pings=256, n_bins=4096, voxel_resolution=64, workers=None,
+							 voxel_tile_size=4096, ping_tile_size=64, complex_signal=True):
+	"""
+	Measure backprojection throughput on random signals along a linear track.
+	:return: dict with voxels per second and voxel-pings per second
+	"""
+	rng = np.random.default_rng(0)
+	signals = rng.standard_normal((n_pings, n_bins)).astype(np.float32)
+	if complex_signal:
+		signals = signals + 1j * rng.standard_normal((n_pings, n_bins)).astype(np.float32)
+	track = np.linspace(-0.5, 0.5, n_pings, dtype=np.float32)
+	tx_coords = np.stack([track, np.full(n_pings, -1.0), np.zeros(n_pings)], axis=1)
+	rx_coords = tx_coords + np.array([0.0, 0.0, 0.05])
+	voxels, _ = make_voxel_grid([-0.2, -0.2, -0.2], [0.2, 0.2, 0.2], voxel_resolution)
+
+	start_time = time.time()
+	backproject(signals, tx_coords, rx_coords, voxels, 1.0, 3.0,
+				center_frequency=30000.0 if complex_signal else 0.0,
+				voxel_tile_size=voxel_tile_size, ping_tile_size=ping_tile_size, workers=workers)
+	elapsed_time = time.time() - start_time
+	result = {
+		"n_voxels": voxels.shape[0],
+		"n_pings": n_pings,
+		"elapsed_time": elapsed_time,
+		"voxels_per_sec": voxels.shape[0] / elapsed_time,
+		"voxel_pings_per_sec": voxels.shape[0] * n_pings / elapsed_time
+	}
+	return result
@@ -1,4 +1,6 @@
+import itertools
 import json
+import numpy as np
 from pathlib import Path
 
 
@@ -13,4 +15,126 @@ def load_config_recursive(config_file_name):
 		merged = {**config_include, **config}
 		return merged
 	else:
-		return config
\ No newline at end of file
+		return config
+
+POSE_KEYS = ["tx_x", "tx_y", "tx_z", "rx_x", "rx_y", "rx_z"]
+
+
+def _trajectory_size(spec):
+	trajectory_type = spec["type"]
+	if trajectory_type in ("linear", "circle"):
+		return int(spec["n"])
+	elif trajectory_type == "grid":
+		return int(np.prod(spec["shape"]))
+	raise NotImplementedError("Trajectory type %s has no analytic size" % trajectory_type)
+
+
+def _analytic_positions(spec, index):
+	"""
+	Transmitter positions of ping indices (vectorized).
+	:param index: (n,) ping indices
+	:return: (n, 3) positions
+	"""
+	trajectory_type = spec["type"]
+	if trajectory_type == "linear":
+		start = np.asarray(spec["start"], dtype=float)
+		end = np.asarray(spec["end"], dtype=float)
+		t = index / max(int(spec["n"]) - 1, 1)
+		return start[None] + t[:, None] * (end - start)[None]
+	elif trajectory_type == "grid":
+		grid_min = np.asarray(spec["min"], dtype=float)
+		grid_max = np.asarray(spec["max"], dtype=float)
+		shape = np.asarray(spec["shape"], dtype=np.int64)
+		grid_index = np.stack(np.unravel_index(index, tuple(shape)), axis=1)
+		t = grid_index / np.maximum(shape - 1, 1)[None]
+		return grid_min[None] + t * (grid_max - grid_min)[None]
+	elif trajectory_type == "circle":
+		# circular orbit around center in the plane orthogonal to axis
+		center = np.asarray(spec["center"], dtype=float)
+		axis = np.asarray(spec.get("axis", [0, 0, 1]), dtype=float)
+		axis /= np.linalg.norm(axis)
+		u = np.cross(axis, [1.0, 0.0, 0.0] if abs(axis[0]) < 0.9 else [0.0, 1.0, 0.0])
+		u /= np.linalg.norm(u)
+		v = np.cross(axis, u)
+		start_angle = np.deg2rad(spec.get("start_angle", 0.0))
+		end_angle = np.deg2rad(spec.get("end_angle", 360.0))
+		n = int(spec["n"])
+		# full orbit does not repeat the first pose
+		closed = np.isclose(abs(end_angle - start_angle), 2 * np.pi)
+		angle = start_angle + (end_angle - start_angle) * index / (n if closed else max(n - 1, 1))
+		radius = spec["radius"]
+		return center[None] + radius * (np.cos(angle)[:, None] * u[None] + np.sin(angle)[:, None] * v[None])
+	raise NotImplementedError("Trajectory type %s is not implemented" % trajectory_type)
+
+
+def _pose_rows_to_tx_rx(rows, rx_offset):
+	# rows of 3 (monostatic) or 6 (tx, rx) columns
+	rows = np.atleast_2d(rows)
+	tx = rows[:, 0:3]
+	rx = rows[:, 3:6] if rows.shape[1] >= 6 else tx + rx_offset[None]
+	return tx, rx
+
+
+def iterate_trajectory_poses(spec, chunk_size=4096):
+	"""
+	Lazily generate poses of a trajectory in chunks.
+	Supported specs
+		{"type": "linear", "start": [x, y, z], "end": [x, y, z], "n": n}
+		{"type": "grid", "min": [x, y, z], "max": [x, y, z], "shape": [nx, ny, nz]}
+		{"type": "circle", "center": [x, y, z], "radius": r, "n": n, "axis": [0, 0, 1], "start_angle": deg, "end_angle": deg}
+		{"type": "file", "path": csv or npy file with tx_x, tx_y, tx_z(, rx_x, rx_y, rx_z) columns}
+	Receiver is placed at transmitter + rx_offset (default [0, 0, 0]) unless the pose file has rx columns.
+	:return: generator of (first ping index, (n, 3) tx positions, (n, 3) rx positions)
+	"""
+	rx_offset = np.asarray(spec.get("rx_offset", [0.0, 0.0, 0.0]), dtype=float)
+	trajectory_type = spec["type"]
+	if trajectory_type == "file":
+		path = spec["path"]
+		if path.endswith(".npy"):
+			poses = np.load(path, mmap_mode='r')
+			for start in range(0, poses.shape[0], chunk_size):
+				yield (start,) + _pose_rows_to_tx_rx(np.asarray(poses[start:start + chunk_size], dtype=float), rx_offset)
+		else:
+			with open(path) as f:
+				start = 0
+				while True:
+					lines = [line for line in itertools.islice(f, chunk_size) if line.strip() and not line.startswith("#")]
+					if len(lines) == 0:
+						break
+					# skip header row
+					if start == 0 and lines[0].lstrip()[0] not in "+-.0123456789":
+						lines = lines[1:]
+					if len(lines) == 0:
+						continue
+					rows = np.loadtxt(lines, delimiter=spec.get("delimiter", ","), ndmin=2)
+					yield (start,) + _pose_rows_to_tx_rx(rows, rx_offset)
+					start += rows.shape[0]
+		return
+
+	n = _trajectory_size(spec)
+	for start in range(0, n, chunk_size):
+		index = np.arange(start, min(start + chunk_size, n))
+		tx = _analytic_positions(spec, index)
+		yield start, tx, tx + rx_offset[None]
+
+
+def expand_trajectory(config, chunk_size=4096):
+	"""
+	Expand config with "trajectory" into per-ping configs, one at a time.
+	Each ping config has scalar rx_x ... tx_z keys, ping_index and output_file_name suffixed with the ping index.
+	:return: generator of ping configs (config itself if there is no trajectory)
+	"""
+	if "trajectory" not in config:
+		yield config
+		return
+	base_config = {key: value for key, value in config.items() if key != "trajectory"}
+	output_file_name = config.get("output_file_name", "output")
+	for start, tx, rx in iterate_trajectory_poses(config["trajectory"], chunk_size):
+		poses = np.concatenate([tx, rx], axis=1).tolist()
+		for i, pose in enumerate(poses):
+			ping_index = start + i
+			ping_config = dict(base_config)
+			ping_config.update(zip(POSE_KEYS, pose))
+			ping_config["ping_index"] = ping_index
+			ping_config["output_file_name"] = "%s_%06d" % (output_file_name, ping_index)
+			yield ping_config
@@ -0,0 +1,74 @@
+import os
+import sys
+import time
+import numpy as np
+
+RECORDING_PYOPTIX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recording_optix")
+SCENE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "scenes")
+
+
+def use_recording_pyoptix():
+	"""
+	Make `import pyoptix` resolve to the recording stand-in (utils/recording_optix/pyoptix.py).
+	Has to be called before anything imports pyoptix.
+	:return: call recorder of the stand-in
+	"""
+	loaded = sys.modules.get("pyoptix", None)
+	if loaded is not None and os.path.dirname(os.path.abspath(getattr(loaded, "__file__", "") or "")) != RECORDING_PYOPTIX_DIR:
+		raise RuntimeError("pyoptix is already imported from %s" % getattr(loaded, "__file__", None))
+	if RECORDING_PYOPTIX_DIR not in sys.path:
+		sys.path.insert(0, RECORDING_PYOPTIX_DIR)
+	import pyoptix
+	return pyoptix.recorder
+
+
+def bundled_scenes():
+	return sorted(name for name in os.listdir(SCENE_DIR) if os.path.exists(os.path.join(SCENE_DIR, name, "scene.xml")))
+
+
+def snapshot_difference(before, after):
+	difference = {key: after[key] - before[key] for key in after if key != "calls"}
+	difference["calls"] = after["calls"] - before["calls"]
+	return difference
+
+
+def measure_host_overhead(run_ping, recorder, configs):
+	"""
+	Run one ping per config and measure host time and traffic of each.
+	:param run_ping: function rendering a config
+	:param recorder: call recorder of the stand-in
+	:return: list of dict per ping : host_time (without the stand-in launch time), uploaded / downloaded / allocated bytes,
+		allocations, launches, compiles and call counts
+	"""
+	results = []
+	for config in configs:
+		before = recorder.snapshot()
+		start_time = time.perf_counter()
+		run_ping(config)
+		elapsed_time = time.perf_counter() - start_time
+		difference = snapshot_difference(before, recorder.snapshot())
+		difference["host_time"] = elapsed_time - difference["launch_time"]
+		difference["n_compiles"] = difference["calls"]["Context.compile"]
+		results.append(difference)
+	return results
+
+
+def summarize_pings(results):
+	"""
+	First ping (context creation, scene load, compile) is reported apart from the following warm pings.
+	:return: dict of cold ping and mean / max of warm pings
+	"""
+	summary = {"cold_host_ms": results[0]["host_time"] * 1e3,
+			   "cold_uploaded_bytes": results[0]["uploaded_bytes"]}
+	warm = results[1:]
+	if len(warm) > 0:
+		host_ms = np.array([result["host_time"] for result in warm]) * 1e3
+		summary.update({
+			"warm_host_ms": float(host_ms.mean()),
+			"warm_host_ms_max": float(host_ms.max()),
+			"warm_uploaded_bytes": float(np.mean([result["uploaded_bytes"] + result["variable_bytes"] for result in warm])),
+			"warm_downloaded_bytes": float(np.mean([result["downloaded_bytes"] for result in warm])),
+			"warm_allocations": float(np.mean([result["n_allocations"] for result in warm])),
+			"warm_compiles": int(sum(result["n_compiles"] for result in warm))
+		})
+	return summary
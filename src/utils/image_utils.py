@@ -1,12 +1,12 @@
 import numpy as np
-import cv2 as cv
-from PIL import Image
 import glob
-import matplotlib.pyplot as plt
 import os
 
+# cv2 / PIL are imported when an image is actually loaded or saved
+
 
 def load_exr_image(path, invert=False):
+    import cv2 as cv
     image = cv.imread(path, -1).astype(np.float32)
     image = cv.cvtColor(image, cv.COLOR_RGB2BGRA)
     if invert:
@@ -23,6 +23,7 @@ def convert_image_to_uint(image):
 
 
 def save_image(image, file_path):
+    from PIL import Image
     x = convert_image_to_uint(image)
     new_im = Image.fromarray(x)
     dirname = os.path.dirname(file_path)
@@ -52,6 +53,7 @@ def load_reference_image(parent_folder, name):
 
 
 def load_image(path):
+    from PIL import Image
     image = Image.open(path)
     image = np.asarray(image, dtype=np.float32)
     image = image[:, :, 0:3]
@@ -0,0 +1,46 @@
+import re
+import subprocess
+import sys
+import time
+
+IMPORTTIME_LINE = re.compile(r"import time:\s*(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)")
+
+
+def measure_import_time(module_name, cwd=None):
+	"""
+	Import module in a fresh interpreter with -X importtime.
+	:return: dict with wall time, cumulative import time of every module (sec) and error message if import failed
+	"""
+	start_time = time.time()
+	process = subprocess.run([sys.executable, "-X", "importtime", "-c", "import %s" % module_name],
+							 cwd=cwd, stderr=subprocess.PIPE, stdout=subprocess.DEVNULL, universal_newlines=True)
+	wall_time = time.time() - start_time
+
+	cumulative = {}
+	top_level_total = 0.0
+	error_lines = []
+	for line in process.stderr.splitlines():
+		match = IMPORTTIME_LINE.match(line)
+		if match is None:
+			if not line.startswith("import time:"):
+				error_lines.append(line)
+			continue
+		cumulative_time = int(match.group(2)) * 1e-6
+		cumulative[match.group(4)] = cumulative_time
+		# top level imports have a single leading space
+		if len(match.group(3)) <= 1:
+			top_level_total += cumulative_time
+	return {
+		"module": module_name,
+		"wall_time": wall_time,
+		"import_time": top_level_total,
+		"cumulative": cumulative,
+		"error": "\n".join(error_lines[-3:]) if process.returncode != 0 else None
+	}
+
+
+def heaviest_imports(result, n=10):
+	"""
+	:return: list of (module, cumulative time) sorted by cumulative time
+	"""
+	return sorted(result["cumulative"].items(), key=lambda item: -item[1])[:n]
@@ -0,0 +1,165 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from utils.config_utils import load_config_recursive
+from utils.logging_utils import load_logger
+
+manifest_logger = load_logger("Sweep manifest")
+
+
+def load_manifest(manifest_file):
+	"""
+	Load sweep manifest.
+		{
+			"base_config": "bunny.json",
+			"jobs": [
+				{"name": "ping_000", "overrides": {"rx_x": 0.1, "tx_x": 0.1, "spp": 1024, "output_file_name": "out/ping_000"}},
+				...
+			]
+		}
+	base_config is relative to the manifest. Each job config is base config updated with its overrides
+	(scene, rx / tx pose, spp, output location ...). Every job needs an output_file_name.
+	:return: list of jobs, dict with name, config and hash
+	"""
+	path = Path(manifest_file)
+	manifest = json.load(open(manifest_file))
+	base_config = {}
+	if "base_config" in manifest:
+		base_config = load_config_recursive(path.parent / manifest["base_config"])
+
+	jobs = []
+	names = set()
+	for i, job in enumerate(manifest["jobs"]):
+		config = {**base_config, **job.get("overrides", {})}
+		if config.get("output_file_name", None) is None:
+			# a job without outputs could never be checked as done
+			raise ValueError("Job %d of %s has no output_file_name" % (i, manifest_file))
+		name = job.get("name", config.get("output_file_name", "job_%06d" % i))
+		name = str(name).replace(os.sep, "_")
+		if name in names:
+			raise ValueError("Duplicated job name %s in %s" % (name, manifest_file))
+		names.add(name)
+		jobs.append({"name": name, "config": config, "hash": job_hash(config)})
+	return jobs
+
+
+def _scene_file_path(config):
+	# same default as Renderer.init_scene_config
+	return config.get("scene_file_path", None) or "../../scenes/%s/scene.xml" % config.get("scene_name", "cornell-box")
+
+
+def job_hash(config):
+	"""
+	Content hash of job inputs : resolved config and the scene file.
+	"""
+	hasher = hashlib.sha1()
+	hasher.update(json.dumps(config, sort_keys=True, default=str).encode())
+	scene_file_path = _scene_file_path(config)
+	if os.path.exists(scene_file_path):
+		with open(scene_file_path, "rb") as f:
+			hasher.update(f.read())
+	return hasher.hexdigest()
+
+
+def state_directory(manifest_file):
+	state_dir = "%s.state" % manifest_file
+	os.makedirs(state_dir, exist_ok=True)
+	return state_dir
+
+
+def is_job_done(state_dir, job):
+	"""
+	Job is done if its marker has the same input hash and every output written by the job exists.
+	"""
+	marker_file = os.path.join(state_dir, "%s.done" % job["name"])
+	if not os.path.exists(marker_file):
+		return False
+	try:
+		marker = json.load(open(marker_file))
+	except ValueError:
+		return False
+	output_files = marker.get("outputs", None)
+	if marker.get("hash") != job["hash"] or not output_files:
+		return False
+	return all(os.path.exists(output_file) for output_file in output_files)
+
+
+def mark_job_done(state_dir, job, elapsed_time, output_files):
+	"""
+	Write done marker atomically (rename of a fully written temporary file).
+	:param output_files: files written by the job
+	"""
+	marker_file = os.path.join(state_dir, "%s.done" % job["name"])
+	temp_file = "%s.%d.tmp" % (marker_file, os.getpid())
+	with open(temp_file, "w") as f:
+		json.dump({"hash": job["hash"], "outputs": list(output_files),
+				   "elapsed_time": elapsed_time, "finished": time.time()}, f)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(temp_file, marker_file)
+
+
+@contextlib.contextmanager
+def job_lock(state_dir, job):
+	"""
+	Non-blocking exclusive lock of a job, shared by runners on the same (POSIX) file system.
+	Yields True if the lock is acquired, False if another runner holds it.
+	"""
+	lock_file = open(os.path.join(state_dir, "%s.lock" % job["name"]), "a")
+	try:
+		try:
+			fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+		except OSError:
+			yield False
+			return
+		try:
+			yield True
+		finally:
+			fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+	finally:
+		lock_file.close()
+
+
+def run_manifest(manifest_file, run_job):
+	"""
+	Run every job of the manifest that is not done yet, in manifest order.
+	Jobs locked by other runners are skipped, so several runners can share one manifest.
+	:param run_job: function called with job config, returns the list of files it wrote
+	:return: dict with number of done, skipped (done before), locked and failed jobs
+	"""
+	jobs = load_manifest(manifest_file)
+	state_dir = state_directory(manifest_file)
+	summary = {"done": 0, "skipped": 0, "locked": 0, "failed": 0}
+
+	for job in jobs:
+		if is_job_done(state_dir, job):
+			summary["skipped"] += 1
+			continue
+		with job_lock(state_dir, job) as acquired:
+			if not acquired:
+				summary["locked"] += 1
+				continue
+			# another runner may have finished it between the check and the lock
+			if is_job_done(state_dir, job):
+				summary["skipped"] += 1
+				continue
+			manifest_logger.info("Start job %s" % job["name"])
+			start_time = time.time()
+			try:
+				output_files = run_job(job["config"])
+				elapsed_time = time.time() - start_time
+				mark_job_done(state_dir, job, elapsed_time, output_files)
+			except Exception:
+				manifest_logger.exception("Job %s failed" % job["name"])
+				summary["failed"] += 1
+				continue
+			summary["done"] += 1
+			manifest_logger.info("Finished job %s in %.3f sec" % (job["name"], elapsed_time))
+
+	manifest_logger.info("Sweep %s : %d done, %d skipped, %d locked by other runners, %d failed" % (
+		manifest_file, summary["done"], summary["skipped"], summary["locked"], summary["failed"]))
+	return summary
@@ -0,0 +1,272 @@
+"""
+Recording stand-in of the pyoptix API used by this repository, for measuring host side overhead without a GPU.
+Every call, allocation and upload is counted in `recorder`. Programs are not compiled and launch only writes
+synthetic data to the transient histogram.
+Used by utils/host_overhead_utils.py, which puts this directory first on sys.path.
+"""
+import itertools
+import time
+from collections import Counter
+import numpy as np
+
+
+class CallRecorder:
+	def __init__(self):
+		self.reset()
+
+	def reset(self):
+		self.calls = Counter()
+		self.n_allocations = 0
+		self.allocated_bytes = 0
+		self.uploaded_bytes = 0
+		self.downloaded_bytes = 0
+		self.variable_bytes = 0
+		self.n_launches = 0
+		self.launch_time = 0.0
+
+	def call(self, name):
+		self.calls[name] += 1
+
+	def snapshot(self):
+		return {
+			"calls": Counter(self.calls),
+			"n_allocations": self.n_allocations,
+			"allocated_bytes": self.allocated_bytes,
+			"uploaded_bytes": self.uploaded_bytes,
+			"downloaded_bytes": self.downloaded_bytes,
+			"variable_bytes": self.variable_bytes,
+			"n_launches": self.n_launches,
+			"launch_time": self.launch_time
+		}
+
+
+recorder = CallRecorder()
+object_ids = itertools.count(1)
+
+
+def record_variable(owner, value):
+	recorder.call("%s.__setitem__" % owner)
+	if isinstance(value, np.ndarray):
+		recorder.variable_bytes += value.nbytes
+
+
+class ScopedObject:
+	"""
+	Object with named variables (context, geometry, geometry instance, material).
+	"""
+	def __init__(self):
+		self.variables = {}
+
+	def __setitem__(self, key, value):
+		record_variable(type(self).__name__, value)
+		self.variables[key] = value
+
+	def __getitem__(self, key):
+		return self.variables[key]
+
+	def __contains__(self, key):
+		return key in self.variables
+
+
+class Buffer:
+	def __init__(self, array, buffer_type, drop_last_dim):
+		self.array = array
+		self.buffer_type = buffer_type
+		self.drop_last_dim = drop_last_dim
+		self.id = next(object_ids)
+		recorder.n_allocations += 1
+		recorder.allocated_bytes += array.nbytes
+
+	@classmethod
+	def from_array(cls, array, dtype=None, buffer_type='io', drop_last_dim=False):
+		recorder.call("Buffer.from_array")
+		array = np.array(array, dtype=dtype)
+		recorder.uploaded_bytes += array.nbytes
+		return cls(array, buffer_type, drop_last_dim)
+
+	@classmethod
+	def empty(cls, shape, dtype=np.float32, buffer_type='io', drop_last_dim=False):
+		recorder.call("Buffer.empty")
+		return cls(np.zeros(shape, dtype=dtype), buffer_type, drop_last_dim)
+
+	def copy_from_array(self, array):
+		recorder.call("Buffer.copy_from_array")
+		array = np.asarray(array)
+		recorder.uploaded_bytes += array.nbytes
+		np.copyto(self.array, array.reshape(self.array.shape), casting="unsafe")
+
+	def copy_to_array(self, array):
+		recorder.call("Buffer.copy_to_array")
+		recorder.downloaded_bytes += self.array.nbytes
+		np.copyto(array, self.array.reshape(array.shape), casting="unsafe")
+
+	def to_array(self):
+		recorder.call("Buffer.to_array")
+		recorder.downloaded_bytes += self.array.nbytes
+		return self.array.copy()
+
+	def get_id(self):
+		return self.id
+
+
+def sample_bin_weights(completed_sample_number, samples_per_pass, n_bins):
+	# sum over samples of per sample weights (each summing to 1) that only depend on the sample index
+	sample_index = completed_sample_number + 1 + np.arange(samples_per_pass, dtype=np.int64)
+	weights = 1.0 + (sample_index[:, None] * 2654435761 + np.arange(n_bins, dtype=np.int64)[None] * 40503) % 97
+	return (weights / weights.sum(axis=1, keepdims=True)).sum(axis=0)
+
+
+class Context(ScopedObject):
+	def __init__(self):
+		recorder.call("Context.__init__")
+		super().__init__()
+
+	def set_ray_type_count(self, count):
+		recorder.call("Context.set_ray_type_count")
+
+	def set_entry_point_count(self, count):
+		recorder.call("Context.set_entry_point_count")
+
+	def set_ray_generation_program(self, entry_point_index, program):
+		recorder.call("Context.set_ray_generation_program")
+
+	def set_exception_program(self, entry_point_index, program):
+		recorder.call("Context.set_exception_program")
+
+	def set_miss_program(self, ray_type_index, program):
+		recorder.call("Context.set_miss_program")
+
+	def validate(self):
+		recorder.call("Context.validate")
+
+	def compile(self):
+		recorder.call("Context.compile")
+
+	def launch(self, entry_point_index, width, height=1):
+		"""
+		Adds width * height per sample to every histogram column, spread over the bins with weights that depend
+		only on the sample index (completed_sample_number + 1, ...), so a normalized histogram sums to 1 per column
+		and split or resumed renders can be compared with a single run. Output buffer pixels get samples_per_pass,
+		added or overwritten like path_trace_camera does.
+		"""
+		recorder.call("Context.launch")
+		start_time = time.perf_counter()
+		samples_per_pass = int(self.variables.get("samples_per_pass", np.array(1)))
+		histogram = self.variables.get("transient_radiance_histogram", None)
+		if histogram is not None:
+			histogram.array += width * height * sample_bin_weights(
+				int(self.variables.get("completed_sample_number", np.array(0))), samples_per_pass,
+				histogram.array.shape[1])[:, None]
+		output_buffer = self.variables.get("output_buffer", None)
+		if output_buffer is not None:
+			if int(self.variables.get("accumulate_output_buffer", np.array(1))):
+				output_buffer.array += samples_per_pass
+			else:
+				output_buffer.array[...] = samples_per_pass
+		recorder.n_launches += 1
+		recorder.launch_time += time.perf_counter() - start_time
+
+
+class Program:
+	def __init__(self, file_name, function_name):
+		recorder.call("Program.__init__")
+		self.file_name = file_name
+		self.function_name = function_name
+
+
+class Material(ScopedObject):
+	def __init__(self):
+		recorder.call("Material.__init__")
+		super().__init__()
+
+	def set_closest_hit_program(self, ray_type_index, program):
+		recorder.call("Material.set_closest_hit_program")
+
+	def set_any_hit_program(self, ray_type_index, program):
+		recorder.call("Material.set_any_hit_program")
+
+
+class Geometry(ScopedObject):
+	def __init__(self, bounding_box_program=None, intersection_program=None):
+		recorder.call("Geometry.__init__")
+		super().__init__()
+		self.primitive_count = 0
+
+	def set_primitive_count(self, count):
+		recorder.call("Geometry.set_primitive_count")
+		self.primitive_count = count
+
+
+class GeometryInstance(ScopedObject):
+	def __init__(self, geometry=None, materials=None):
+		recorder.call("GeometryInstance.__init__")
+		super().__init__()
+		self.geometry = geometry
+
+
+class Acceleration:
+	def __init__(self, builder="NoAccel", traverser=None):
+		recorder.call("Acceleration.__init__")
+		self.dirty = True
+
+	def mark_dirty(self):
+		recorder.call("Acceleration.mark_dirty")
+		self.dirty = True
+
+
+class Group:
+	def __init__(self, children=None):
+		recorder.call("%s.__init__" % type(self).__name__)
+		self.children = list(children or [])
+		self.acceleration = None
+
+	def set_acceleration(self, acceleration):
+		recorder.call("%s.set_acceleration" % type(self).__name__)
+		self.acceleration = acceleration
+
+	def add_child(self, child):
+		recorder.call("%s.add_child" % type(self).__name__)
+		self.children.append(child)
+
+
+class GeometryGroup(Group):
+	pass
+
+
+class Transform(Group):
+	def set_matrix(self, transpose, matrix):
+		recorder.call("Transform.set_matrix")
+		self.matrix = np.array(matrix, dtype=np.float32)
+
+	def set_motion_range(self, time_begin, time_end):
+		recorder.call("Transform.set_motion_range")
+
+	def set_motion_border_mode(self, begin_mode, end_mode):
+		recorder.call("Transform.set_motion_border_mode")
+
+	def set_motion_keys(self, n_keys, key_type, keys):
+		recorder.call("Transform.set_motion_keys")
+
+
+class TextureSampler:
+	def __init__(self, buffer, **kwargs):
+		recorder.call("TextureSampler.__init__")
+		self.buffer = buffer
+		self.id = next(object_ids)
+
+	def get_id(self):
+		return self.id
+
+
+class Compiler:
+	keep_device_function = True
+	program_directories = []
+
+	@classmethod
+	def add_program_directory(cls, directory):
+		recorder.call("Compiler.add_program_directory")
+		cls.program_directories.append(directory)
+
+	@classmethod
+	def clean(cls):
+		recorder.call("Compiler.clean")
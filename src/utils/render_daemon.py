@@ -0,0 +1,219 @@
+import asyncio
+import base64
+import io
+import itertools
+import json
+import os
+import socket
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from utils.logging_utils import load_logger
+
+daemon_logger = load_logger("Render daemon")
+
+# maximum size of a single request / response line
+MAX_LINE_BYTES = 1 << 28
+
+
+def parse_address(address):
+	"""
+	"unix:/path/to/socket" or "/path/to/socket" for a Unix socket, "host:port" or "port" for localhost TCP.
+	:return: ("unix", path) or ("tcp", (host, port))
+	"""
+	if address.startswith("unix:"):
+		return "unix", address[len("unix:"):]
+	if address.startswith("/"):
+		return "unix", address
+	if ":" in address:
+		host, port = address.rsplit(":", 1)
+		return "tcp", (host, int(port))
+	return "tcp", ("127.0.0.1", int(address))
+
+
+def encode_array(array):
+	buffer = io.BytesIO()
+	np.save(buffer, array)
+	return base64.b64encode(buffer.getvalue()).decode()
+
+
+def decode_array(text):
+	return np.load(io.BytesIO(base64.b64decode(text)))
+
+
+class RenderDaemon:
+	"""
+	Keeps a warm renderer and serves render jobs over a local socket with a JSON lines protocol.
+	Requests
+		{"type": "render", "id": any, "priority": 0, "config": {...}, "return_result": false}
+			: config overrides the base config (scene, rx / tx pose, spp, output_file_name ...).
+			  Lower priority runs first, jobs of the same priority run in arrival order.
+			  Outputs are written to output_file_name if given, the histogram is sent back if return_result.
+		{"type": "status"} : queue length, running job, completed jobs and throughput
+		{"type": "shutdown"}
+	Each render request gets a {"status": "queued"} line and later a {"status": "done" | "failed"} line.
+	A connection may send further requests before its jobs are done (responses carry the job id).
+	Jobs run one by one on a single render thread, so the event loop keeps serving status requests.
+	"""
+	def __init__(self, run_job, address="127.0.0.1:8770", base_config=None):
+		"""
+		:param run_job: function called with a job config on the render thread, returns render result dict
+		"""
+		self.run_job = run_job
+		self.address = address
+		self.base_config = base_config or {}
+		self.queue = None
+		self.sequence = itertools.count()
+		self.render_executor = ThreadPoolExecutor(max_workers=1)
+		self.running_job = None
+		self.n_completed = 0
+		self.n_failed = 0
+		self.busy_time = 0.0
+		self.start_time = time.time()
+		self.stopped = None
+		# future -> id of queued or running jobs
+		self.pending = {}
+
+	def status(self):
+		elapsed_time = time.time() - self.start_time
+		return {
+			"queue_length": self.queue.qsize() if self.queue is not None else 0,
+			"running": self.running_job,
+			"completed": self.n_completed,
+			"failed": self.n_failed,
+			"uptime": elapsed_time,
+			"busy_ratio": self.busy_time / max(elapsed_time, 1e-12),
+			"throughput_jobs_per_sec": self.n_completed / max(elapsed_time, 1e-12)
+		}
+
+	async def _send(self, writer, write_lock, message):
+		# responses of concurrent requests of a connection must not interleave
+		async with write_lock:
+			writer.write((json.dumps(message, default=str) + "\n").encode())
+			await writer.drain()
+
+	async def _respond_when_done(self, writer, write_lock, done):
+		try:
+			await self._send(writer, write_lock, await done)
+		except (ConnectionResetError, BrokenPipeError):
+			pass
+
+	async def _handle_client(self, reader, writer):
+		write_lock = asyncio.Lock()
+		responses = []
+		try:
+			while not reader.at_eof():
+				line = await reader.readline()
+				if not line:
+					break
+				try:
+					request = json.loads(line)
+				except ValueError as e:
+					await self._send(writer, write_lock, {"status": "error", "message": "invalid json : %s" % e})
+					continue
+
+				request_type = request.get("type", "render")
+				if request_type == "status":
+					await self._send(writer, write_lock, {"status": "ok", **self.status()})
+				elif request_type == "shutdown":
+					await self._send(writer, write_lock, {"status": "ok"})
+					self.stopped.set()
+				elif request_type == "render":
+					job_id = request.get("id", None)
+					done = asyncio.get_running_loop().create_future()
+					self.pending[done] = job_id
+					await self.queue.put((request.get("priority", 0), next(self.sequence), request, done))
+					await self._send(writer, write_lock, {"id": job_id, "status": "queued", "queue_length": self.queue.qsize()})
+					# respond when the job is finished, meanwhile the next requests of this client are read
+					responses.append(asyncio.ensure_future(self._respond_when_done(writer, write_lock, done)))
+				else:
+					await self._send(writer, write_lock, {"status": "error", "message": "unknown request type %s" % request_type})
+			# client may close its sending side and still wait for the results
+			await asyncio.gather(*responses)
+		except (ConnectionResetError, BrokenPipeError):
+			pass
+		finally:
+			writer.close()
+
+	async def _render_loop(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			_, _, request, done = await self.queue.get()
+			job_id = request.get("id", None)
+			config = {**self.base_config, **request.get("config", {})}
+			self.running_job = job_id
+			start_time = time.time()
+			try:
+				result = await loop.run_in_executor(self.render_executor, self.run_job, config)
+				response = {"id": job_id, "status": "done", "elapsed_time": time.time() - start_time,
+							"output_file_name": config.get("output_file_name", None)}
+				if request.get("return_result", False):
+					response["transient_histogram"] = encode_array(result["transient_histogram"])
+					response["transient_bounce_labels"] = result.get("transient_bounce_labels", None)
+				self.n_completed += 1
+			except Exception as e:
+				daemon_logger.exception("Job %s failed" % job_id)
+				response = {"id": job_id, "status": "failed", "message": str(e)}
+				self.n_failed += 1
+			self.busy_time += time.time() - start_time
+			self.running_job = None
+			self.pending.pop(done, None)
+			if not done.done():
+				done.set_result(response)
+			daemon_logger.info("Job %s %s in %.3f sec, %d queued" % (job_id, response["status"], time.time() - start_time, self.queue.qsize()))
+
+	async def serve(self):
+		self.queue = asyncio.PriorityQueue()
+		self.stopped = asyncio.Event()
+		address_type, address = parse_address(self.address)
+		if address_type == "unix":
+			if os.path.exists(address):
+				os.remove(address)
+			server = await asyncio.start_unix_server(self._handle_client, path=address, limit=MAX_LINE_BYTES)
+		else:
+			server = await asyncio.start_server(self._handle_client, host=address[0], port=address[1], limit=MAX_LINE_BYTES)
+		daemon_logger.info("Render daemon listening on %s" % self.address)
+
+		render_task = asyncio.ensure_future(self._render_loop())
+		async with server:
+			await self.stopped.wait()
+			render_task.cancel()
+			# clients waiting for unfinished jobs get an answer, so their connections close
+			for done, job_id in self.pending.items():
+				if not done.done():
+					done.set_result({"id": job_id, "status": "failed", "message": "render daemon stopped"})
+			self.pending.clear()
+		self.render_executor.shutdown(wait=True)
+		if address_type == "unix" and os.path.exists(address):
+			os.remove(address)
+		daemon_logger.info("Render daemon stopped : %s" % json.dumps(self.status(), default=str))
+
+	def run(self):
+		asyncio.run(self.serve())
+
+
+def send_request(address, request, timeout=None):
+	"""
+	Blocking client : send a request and return its final response (skipping the "queued" line of render jobs).
+	"""
+	address_type, address = parse_address(address)
+	if address_type == "unix":
+		client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	else:
+		client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+	client.settimeout(timeout)
+	client.connect(address)
+	try:
+		client.sendall((json.dumps(request) + "\n").encode())
+		stream = client.makefile("r")
+		while True:
+			line = stream.readline()
+			if not line:
+				raise ConnectionError("Render daemon closed the connection")
+			response = json.loads(line)
+			if response.get("status") != "queued":
+				if "transient_histogram" in response:
+					response["transient_histogram"] = decode_array(response["transient_histogram"])
+				return response
+	finally:
+		client.close()
@@ -0,0 +1,120 @@
+import math
+import time
+import numpy as np
+from core.utils.light_utils import build_light_cdf, sample_light_index, triangle_areas, luminance, envmap_direction, \
+	sample_envmap
+
+
+def equal_time_variance(estimator, time_budget, rng, batch_size=4096):
+	"""
+	Run an estimator for a fixed host time, so strategies with different cost per sample are compared fairly.
+	:param estimator: function (rng, n) -> (n,) per sample estimates
+	:param time_budget: seconds per estimator
+	:return: dict of mean, per sample variance, number of samples and variance of the mean after time_budget
+	"""
+	total, total_square, n_samples = 0.0, 0.0, 0
+	start_time = time.perf_counter()
+	while n_samples == 0 or time.perf_counter() - start_time < time_budget:
+		estimates = estimator(rng, batch_size)
+		total += float(estimates.sum())
+		total_square += float(np.square(estimates).sum())
+		n_samples += batch_size
+	mean = total / n_samples
+	variance = max(total_square / n_samples - mean * mean, 0.0)
+	return {"mean": mean, "variance": variance, "n_samples": n_samples, "mean_variance": variance / n_samples}
+
+
+def point_light_scene(n_lights, rng, power_range=1e4):
+	"""
+	Point lights above a shading point at the origin (normal +z), power spread log uniformly over power_range.
+	:return: (n_lights, 3) positions, (n_lights,) power, (n_lights,) irradiance of each light at the shading point
+	"""
+	positions = rng.uniform([-4, -4, -1], [4, 4, 4], (n_lights, 3))
+	power = np.exp(rng.uniform(0, math.log(power_range), n_lights))
+	distance_square = np.square(positions).sum(axis=1)
+	cos_theta = np.maximum(positions[:, 2], 0) / np.sqrt(distance_square)
+	irradiance = power / (4 * math.pi) * cos_theta / distance_square
+	return positions, power, irradiance
+
+
+def light_selection_estimator(irradiance, weight):
+	"""
+	Next event estimation of the irradiance of point lights, one light chosen with probability proportional to weight.
+	"""
+	cdf = build_light_cdf(weight)
+
+	def estimate(rng, n):
+		index, pmf = sample_light_index(cdf, rng.random(n))
+		return irradiance[index] / pmf
+	return estimate
+
+
+def mesh_light_scene(n_triangles, rng, size_range=100.0):
+	"""
+	Right triangles of log uniform size in the plane z = 1 facing down, above a shading point at the origin (normal +z).
+	:return: (3 * n_triangles, 3) vertices, (n_triangles, 3) indices
+	"""
+	corner = np.column_stack([rng.uniform(-3, 3, (n_triangles, 2)), np.ones(n_triangles)])
+	size = 0.02 * np.exp(rng.uniform(0, math.log(size_range), n_triangles))
+	vertices = np.stack([corner, corner + size[:, None] * [0, 1, 0], corner + size[:, None] * [1, 0, 0]], axis=1)
+	return vertices.reshape((-1, 3)), np.arange(3 * n_triangles).reshape((-1, 3))
+
+
+def triangle_selection_estimator(vertices, indices, weight, radiance=1.0):
+	"""
+	Next event estimation of the irradiance of a mesh emitter : triangle chosen with probability proportional
+	to weight, then a uniform point on it (area pdf pmf / triangle area).
+	"""
+	triangles = np.asarray(vertices, dtype=np.float64)[np.asarray(indices)]
+	areas = triangle_areas(vertices, indices)
+	normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+	normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-30)
+	cdf = build_light_cdf(weight)
+
+	def estimate(rng, n):
+		index, pmf = sample_light_index(cdf, rng.random(n))
+		u1, u2 = rng.random(n), rng.random(n)
+		# uniform barycentric coordinates
+		b0 = 1 - np.sqrt(u1)
+		b1 = u2 * np.sqrt(u1)
+		triangle = triangles[index]
+		point = b0[:, None] * triangle[:, 0] + b1[:, None] * triangle[:, 1] + (1 - b0 - b1)[:, None] * triangle[:, 2]
+		distance_square = np.square(point).sum(axis=1)
+		direction = point / np.sqrt(distance_square)[:, None]
+		cos_surface = np.maximum(direction[:, 2], 0)
+		cos_light = np.abs((direction * normals[index]).sum(axis=1))
+		return radiance * cos_surface * cos_light / distance_square * areas[index] / pmf
+	return estimate
+
+
+def envmap_image(height, width, rng, sun_radiance=1e4):
+	"""
+	Dim noisy sky with a small bright sun, seen by a surface with normal +z.
+	:return: (height, width, 3) float32 equirectangular image
+	"""
+	image = rng.uniform(0.05, 0.2, (height, width, 3))
+	# u = 0.9 : phi = 0.8 pi, local direction z = -sin(theta) cos(phi) > 0
+	image[height // 5:height // 5 + 2, width * 9 // 10:width * 9 // 10 + 2] = sun_radiance
+	return image.astype(np.float32)
+
+
+def envmap_irradiance_estimator(image, tables=None):
+	"""
+	Irradiance from an environment map at a surface with normal +z (local direction of envmap_direction),
+	directions sampled with the importance sampling tables or uniformly over the sphere if tables is None.
+	"""
+	height, width = image.shape[:2]
+	pixel_luminance = luminance(image)
+
+	def estimate(rng, n):
+		if tables is None:
+			u = rng.random(n)
+			v = np.arccos(1 - 2 * rng.random(n)) / math.pi
+			pdf = np.full(n, 1 / (4 * math.pi))
+		else:
+			u, v, pdf = sample_envmap(tables[0], tables[1], rng.random(n), rng.random(n))
+		radiance = pixel_luminance[np.clip((v * height).astype(np.int64), 0, height - 1),
+								   np.clip((u * width).astype(np.int64), 0, width - 1)]
+		cos_theta = np.maximum(envmap_direction(u, v)[:, 2], 0)
+		return np.where(pdf > 0, radiance * cos_theta / np.maximum(pdf, 1e-30), 0.0)
+	return estimate
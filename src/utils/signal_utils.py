@@ -0,0 +1,168 @@
+import numpy as np
+import os
+import scipy.fft as sp_fft
+from utils.logging_utils import load_logger
+
+signal_logger = load_logger("Signal processing")
+
+# default speed of sound in air (m/s)
+DEFAULT_SPEED_OF_SOUND = 343.0
+
+
+def transient_bin_spacing(transient_dist_min, transient_dist_max, transient_bin_num, speed_of_sound=DEFAULT_SPEED_OF_SOUND):
+	"""
+	Time spacing of transient histogram bins.
+	Histogram bins are defined on path length, so they are converted to time with speed of sound.
+	:return: bin spacing in seconds
+	"""
+	return (transient_dist_max - transient_dist_min) / transient_bin_num / speed_of_sound
+
+
+def transient_time_axis(transient_dist_min, transient_dist_max, transient_bin_num, speed_of_sound=DEFAULT_SPEED_OF_SOUND):
+	"""
+	Start time of each transient histogram bin.
+	:return: (transient_bin_num,) time in seconds
+	"""
+	dt = transient_bin_spacing(transient_dist_min, transient_dist_max, transient_bin_num, speed_of_sound)
+	return transient_dist_min / speed_of_sound + dt * np.arange(transient_bin_num)
+
+
+def make_waveform(spec, sample_spacing):
+	"""
+	Create transmit waveform sampled at the histogram bin spacing.
+	Supported specs
+		{"type": "lfm", "f_start": Hz, "f_stop": Hz, "duration": sec, "window": "tukey" | "hann" | None}
+		{"type": "cw", "frequency": Hz, "duration": sec, "window": ...}
+		{"type": "file", "path": npy file already sampled at the bin spacing}
+		{"type": "samples", "values": list}
+	:param spec: waveform spec dict
+	:param sample_spacing: sample spacing in seconds
+	:return: (n,) float64 or complex128 waveform
+	"""
+	waveform_type = spec.get("type", "lfm")
+	if waveform_type == "file":
+		return np.load(spec["path"])
+	if waveform_type == "samples":
+		return np.asarray(spec["values"])
+
+	duration = spec["duration"]
+	n_samples = max(int(round(duration / sample_spacing)), 1)
+	t = np.arange(n_samples) * sample_spacing
+	if waveform_type == "lfm":
+		f_start = spec["f_start"]
+		f_stop = spec["f_stop"]
+		chirp_rate = (f_stop - f_start) / duration
+		waveform = np.cos(2 * np.pi * (f_start * t + 0.5 * chirp_rate * t * t))
+	elif waveform_type == "cw":
+		waveform = np.cos(2 * np.pi * spec["frequency"] * t)
+	else:
+		raise NotImplementedError("Waveform type %s is not implemented" % waveform_type)
+
+	window = spec.get("window", "tukey")
+	if window == "tukey":
+		from scipy.signal.windows import tukey
+		waveform *= tukey(n_samples, spec.get("tukey_alpha", 0.1))
+	elif window == "hann":
+		waveform *= np.hanning(n_samples)
+	return waveform
+
+
+def waveform_center_frequency(spec):
+	"""
+	Center frequency of waveform spec, used for baseband demodulation if not given.
+	"""
+	waveform_type = spec.get("type", "lfm")
+	if waveform_type == "lfm":
+		return 0.5 * (spec["f_start"] + spec["f_stop"])
+	elif waveform_type == "cw":
+		return spec["frequency"]
+	return spec.get("center_frequency", 0.0)
+
+
+def _chunk_size(n_pings, n_fft, n_columns, max_chunk_bytes):
+	# complex128 spectrum of one ping dominates memory
+	bytes_per_ping = n_fft * n_columns * 16 * 2
+	return int(np.clip(max_chunk_bytes // max(bytes_per_ping, 1), 1, max(n_pings, 1)))
+
+
+def process_transients(histograms, waveform, sample_spacing, convolve=True, matched_filter=True,
+					   demodulate=True, center_frequency=0.0, time_offset=0.0, sum_bounces=False,
+					   max_chunk_bytes=1 << 30, workers=-1, output=None):
+	"""
+	Convolve rendered impulse responses with the transmit waveform, apply matched filter and
+	demodulate to complex baseband. All steps are done with single forward / inverse FFT per chunk.
+	:param histograms: (n_pings, n_bins, n_bounces) or (n_bins, n_bounces) histograms
+	:param waveform: (n,) transmit waveform sampled at sample_spacing
+	:param sample_spacing: bin spacing in seconds
+	:param convolve: convolve with waveform (simulated received signal)
+	:param matched_filter: correlate with waveform (pulse compression)
+	:param demodulate: return complex baseband signal, otherwise analytic signal
+	:param center_frequency: carrier frequency used for demodulation in Hz
+	:param time_offset: time of the first bin in seconds (phase reference of demodulation)
+	:param sum_bounces: sum over bounce axis before processing
+	:param max_chunk_bytes: memory budget of a single chunk
+	:param workers: number of FFT threads (-1 : all cores)
+	:param output: optional preallocated complex output array
+	:return: complex64 array of shape (n_pings, n_bins, n_bounces or 1)
+	"""
+	histograms = np.asarray(histograms)
+	single = histograms.ndim == 2
+	if single:
+		histograms = histograms[None]
+	if sum_bounces:
+		histograms = np.sum(histograms, axis=2, keepdims=True)
+
+	n_pings, n_bins, n_columns = histograms.shape
+	waveform = np.asarray(waveform)
+	n_waveform = waveform.shape[0]
+	n_fft = sp_fft.next_fast_len(n_bins + 2 * n_waveform - 2, real=True)
+
+	# combined transfer function, computed once
+	waveform_spectrum = sp_fft.fft(waveform, n_fft, workers=workers)
+	transfer = np.ones(n_fft, dtype=np.complex128)
+	if convolve:
+		transfer *= waveform_spectrum
+	if matched_filter:
+		transfer *= np.conj(waveform_spectrum)
+
+	# analytic signal only keeps non-negative frequencies, so real FFT of the input is enough
+	n_half = n_fft // 2 + 1
+	analytic_mask = np.full(n_half, 2.0)
+	analytic_mask[0] = 1
+	if n_fft % 2 == 0:
+		analytic_mask[-1] = 1
+	transfer = (transfer[:n_half] * analytic_mask)[:, None]
+
+	if demodulate:
+		t = time_offset + sample_spacing * np.arange(n_bins)
+		carrier = np.exp(-2j * np.pi * center_frequency * t).astype(np.complex64)[:, None]
+
+	if output is None:
+		output = np.empty((n_pings, n_bins, n_columns), dtype=np.complex64)
+
+	chunk = _chunk_size(n_pings, n_fft, n_columns, max_chunk_bytes)
+	for start in range(0, n_pings, chunk):
+		block = histograms[start:start + chunk].astype(np.float64)
+		spectrum = np.zeros((block.shape[0], n_fft, n_columns), dtype=np.complex128)
+		spectrum[:, :n_half] = sp_fft.rfft(block, n_fft, axis=1, workers=workers) * transfer
+		signal = sp_fft.ifft(spectrum, axis=1, workers=workers, overwrite_x=True)[:, :n_bins]
+		if demodulate:
+			signal *= carrier
+		output[start:start + chunk] = signal
+
+	signal_logger.info("Processed %d pings (%d bins, %d columns) in chunks of %d pings, FFT size %d" %
+					   (n_pings, n_bins, n_columns, chunk, n_fft))
+	return output[0] if single else output
+
+
+def save_processed_transients(output_file_name, signals, suffix="_baseband"):
+	"""
+	Save processed result next to the rendered histogram, keeping the sweep layout.
+	:param output_file_name: file name of rendered histogram
+	:param suffix: suffix appended to the file name
+	:return: saved file name
+	"""
+	root, _ = os.path.splitext(output_file_name)
+	file_name = "%s%s.npy" % (root, suffix)
+	np.save(file_name, signals)
+	return file_name
@@ -0,0 +1,180 @@
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+from utils.logging_utils import load_logger
+
+writer_logger = load_logger("Output writer")
+
+
+class OutputWriter:
+	"""
+	Writes outputs on worker threads so that the render loop can launch the next pass while files are
+	encoded and written. Every file is written to a temporary file in the target directory, optionally
+	fsynced, then renamed, so readers never see partial files.
+	The queue is bounded : submitting blocks when it is full (backpressure on the render loop).
+	n_workers = 0 writes synchronously on the calling thread.
+	Write errors of the workers are raised by the next flush() or close().
+	"""
+	def __init__(self, n_workers=2, max_queue_size=8, fsync=True):
+		self.n_workers = n_workers
+		self.fsync = fsync
+		self.job_queue = queue.Queue(maxsize=max(max_queue_size, 1))
+		self.stats_lock = threading.Lock()
+		self.n_files = 0
+		self.n_bytes = 0
+		self.write_time = 0.0
+		self.wait_time = 0.0
+		self.max_queue_depth = 0
+		# errors since the last flush, and total number of errors
+		self.errors = []
+		self.n_errors = 0
+		self.start_time = time.time()
+
+		self.workers = [threading.Thread(target=self._work, daemon=True) for _ in range(n_workers)]
+		for worker in self.workers:
+			worker.start()
+
+	def submit(self, file_path, write_function):
+		"""
+		Queue a write.
+		:param file_path: final file path
+		:param write_function: function writing the content to a binary file object
+		"""
+		if self.n_workers == 0:
+			self._write(file_path, write_function)
+			return
+		start_time = time.time()
+		self.job_queue.put((file_path, write_function))
+		with self.stats_lock:
+			self.wait_time += time.time() - start_time
+			self.max_queue_depth = max(self.max_queue_depth, self.job_queue.qsize())
+
+	def save_npy(self, file_path, array):
+		# same naming as np.save
+		if not file_path.endswith(".npy"):
+			file_path += ".npy"
+		self.submit(file_path, lambda f: np.save(f, array))
+
+	def save_npz(self, file_path, compressed=False, **arrays):
+		if not file_path.endswith(".npz"):
+			file_path += ".npz"
+		save_function = np.savez_compressed if compressed else np.savez
+		self.submit(file_path, lambda f: save_function(f, **arrays))
+
+	def save_json(self, file_path, obj):
+		self.submit(file_path, lambda f: f.write(json.dumps(obj).encode()))
+
+	def save_png(self, file_path, image):
+		"""
+		:param image: float image in [0, 1]
+		"""
+		def write(f):
+			from PIL import Image
+			from utils.image_utils import convert_image_to_uint
+			Image.fromarray(convert_image_to_uint(image)).save(f, format="PNG")
+		if not file_path.endswith(".png"):
+			file_path += ".png"
+		self.submit(file_path, write)
+
+	def save_exr(self, file_path, image):
+		"""
+		:param image: float32 RGB image
+		"""
+		def write(f):
+			import cv2 as cv
+			success, encoded = cv.imencode(".exr", cv.cvtColor(np.asarray(image, dtype=np.float32), cv.COLOR_RGB2BGR))
+			if not success:
+				raise IOError("Failed to encode %s" % file_path)
+			f.write(encoded.tobytes())
+		if not file_path.endswith(".exr"):
+			file_path += ".exr"
+		self.submit(file_path, write)
+
+	def _write(self, file_path, write_function):
+		start_time = time.time()
+		dirname = os.path.dirname(file_path)
+		if dirname != "" and not os.path.exists(dirname):
+			os.makedirs(dirname, exist_ok=True)
+		temp_file = "%s.%d.%d.tmp" % (file_path, os.getpid(), threading.get_ident())
+		try:
+			with open(temp_file, "wb") as f:
+				write_function(f)
+				f.flush()
+				if self.fsync:
+					os.fsync(f.fileno())
+				n_bytes = f.tell()
+			os.replace(temp_file, file_path)
+		except BaseException:
+			if os.path.exists(temp_file):
+				os.remove(temp_file)
+			raise
+		with self.stats_lock:
+			self.n_files += 1
+			self.n_bytes += n_bytes
+			self.write_time += time.time() - start_time
+
+	def _work(self):
+		while True:
+			job = self.job_queue.get()
+			try:
+				if job is None:
+					return
+				file_path, write_function = job
+				try:
+					self._write(file_path, write_function)
+				except Exception as e:
+					writer_logger.exception("Failed to write %s" % file_path)
+					with self.stats_lock:
+						self.errors.append((file_path, e))
+						self.n_errors += 1
+			finally:
+				self.job_queue.task_done()
+
+	def stats(self):
+		"""
+		:return: dict with queue depth, number of files / bytes, write throughput and render loop wait time
+		"""
+		with self.stats_lock:
+			return {
+				"queue_depth": self.job_queue.qsize(),
+				"max_queue_depth": self.max_queue_depth,
+				"n_files": self.n_files,
+				"n_bytes": self.n_bytes,
+				"write_throughput": self.n_bytes / max(self.write_time, 1e-12),
+				"wait_time": self.wait_time,
+				"n_errors": self.n_errors
+			}
+
+	def _raise_errors(self):
+		# raise (and forget) write errors since the last flush
+		with self.stats_lock:
+			errors = self.errors
+			self.errors = []
+		if len(errors) > 0:
+			raise IOError("Failed to write %d files, first : %s (%s)" % (len(errors), errors[0][0], errors[0][1]))
+
+	def flush(self):
+		"""
+		Wait until every queued write is finished.
+		Raises IOError if a write failed since the last flush, so callers never treat failed outputs as written.
+		"""
+		if self.n_workers > 0:
+			self.job_queue.join()
+		self._raise_errors()
+
+	def close(self):
+		if self.n_workers > 0:
+			self.job_queue.join()
+		for _ in self.workers:
+			self.job_queue.put(None)
+		for worker in self.workers:
+			worker.join()
+		stats = self.stats()
+		writer_logger.info("Wrote %d files (%.3f MB) at %.3f MB/s per worker, max queue depth %d, render loop waited %.3f sec, %d errors" % (
+			stats["n_files"], stats["n_bytes"] / 1e6, stats["write_throughput"] / 1e6, stats["max_queue_depth"],
+			stats["wait_time"], stats["n_errors"]
+		))
+		self._raise_errors()